@@ -0,0 +1,355 @@
+"""
+Module de métriques pour les appels aux fournisseurs d'IA.
+
+Ce module définit des compteurs, des jauges et des histogrammes étiquetés (fournisseur, modèle,
+contexte d'appel) pour mesurer la latence, le temps jusqu'au premier token, les tokens
+consommés, les nouvelles tentatives et les erreurs. Les métriques sont exposées au
+format texte Prometheus ou en JSON par la route /metrics.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Contexte d'appel courant ('exercise', 'evaluation', 'qcm'...)
+_call_site = contextvars.ContextVar("ai_call_site", default="unknown")
+
+# Enregistrement de l'appel en cours (renseigné par les fournisseurs et par retry.py)
+_current_call = contextvars.ContextVar("ai_current_call", default=None)
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 45, 60, 90)
+TOKEN_BUCKETS = (50, 100, 200, 400, 600, 800, 1000, 1250, 1500, 2000, 3000, 4000)
+
+
+class Counter:
+    """Compteur cumulatif étiqueté."""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str]):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Incrémente le compteur pour les étiquettes données."""
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """Retourne les valeurs courantes sous forme de (étiquettes, valeur)."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labels, key)), value) for key, value in items]
+
+    def render(self) -> List[str]:
+        """Rend la métrique au format texte Prometheus."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.TYPE}"]
+        for labels, value in self.samples():
+            lines.append(f"{self.name}{_format_labels(labels)} {value:.17g}")
+        return lines
+
+    def to_dict(self) -> Dict:
+        """Retourne le compteur sous forme sérialisable en JSON."""
+        return {
+            "type": self.TYPE,
+            "description": self.description,
+            "samples": [{"labels": labels, "value": value} for labels, value in self.samples()]
+        }
+
+
+class Gauge(Counter):
+    """Jauge étiquetée (valeur instantanée qui peut augmenter ou diminuer)."""
+
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """Fixe la valeur de la jauge pour les étiquettes données."""
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """Diminue la jauge pour les étiquettes données."""
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Histogramme étiqueté à seuils fixes."""
+
+    def __init__(self, name: str, description: str, labels: Sequence[str],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Pour chaque combinaison d'étiquettes : [compte par seuil..., +Inf], somme, total
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Ajoute une observation pour les étiquettes données."""
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[Tuple[Dict[str, str], List[int], float, int]]:
+        """Retourne (étiquettes, comptes cumulés par seuil, somme, total)."""
+        with self._lock:
+            items = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        result = []
+        for key, counts, total_sum, count in items:
+            cumulative, running = [], 0
+            for c in counts:
+                running += c
+                cumulative.append(running)
+            result.append((dict(zip(self.labels, key)), cumulative, total_sum, count))
+        return result
+
+    def render(self) -> List[str]:
+        """Rend l'histogramme au format texte Prometheus."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, cumulative, total_sum, count in self.samples():
+            for bound, value in zip(list(self.buckets) + ["+Inf"], cumulative):
+                bucket_labels = dict(labels, le=f"{bound:g}" if bound != "+Inf" else bound)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {value}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total_sum:.17g}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+    def to_dict(self) -> Dict:
+        """Retourne l'histogramme sous forme sérialisable en JSON."""
+        samples = []
+        for labels, cumulative, total_sum, count in self.samples():
+            samples.append({
+                "labels": labels,
+                "buckets": dict(zip([f"{b:g}" for b in self.buckets] + ["+Inf"], cumulative)),
+                "sum": total_sum,
+                "count": count,
+                "mean": total_sum / count if count else None
+            })
+        return {"type": "histogram", "description": self.description, "samples": samples}
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Formate des étiquettes pour le format texte Prometheus."""
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par le processus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Enregistre une métrique (ou retourne celle déjà enregistrée sous ce nom)."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """Rend toutes les métriques au format texte Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict:
+        """Retourne toutes les métriques sous forme sérialisable en JSON."""
+        with self._lock:
+            metrics = list(self._metrics.items())
+        return {name: metric.to_dict() for name, metric in metrics}
+
+
+registry = MetricsRegistry()
+
+_AI_LABELS = ("provider", "model", "call_site")
+
+AI_REQUESTS = registry.register(Counter(
+    "ai_requests_total", "Appels aux fournisseurs d'IA par résultat", _AI_LABELS + ("outcome",)))
+AI_LATENCY = registry.register(Histogram(
+    "ai_request_latency_seconds", "Durée totale des appels (nouvelles tentatives comprises)", _AI_LABELS))
+AI_TIME_TO_FIRST_TOKEN = registry.register(Histogram(
+    "ai_time_to_first_token_seconds",
+    "Temps jusqu'au premier token (jusqu'aux en-têtes de la réponse hors streaming)", _AI_LABELS))
+AI_PROMPT_TOKENS = registry.register(Counter(
+    "ai_prompt_tokens_total", "Tokens de prompt consommés", _AI_LABELS))
+AI_PROMPT_ESTIMATED_TOKENS = registry.register(Histogram(
+    "ai_prompt_estimated_tokens", "Taille estimée des prompts envoyés (message système compris)",
+    _AI_LABELS, TOKEN_BUCKETS))
+AI_COMPLETION_TOKENS = registry.register(Counter(
+    "ai_completion_tokens_total", "Tokens générés", _AI_LABELS))
+AI_COMPLETION_TOKENS_HISTOGRAM = registry.register(Histogram(
+    "ai_completion_tokens", "Distribution des tokens générés par appel", _AI_LABELS, TOKEN_BUCKETS))
+AI_TRUNCATED = registry.register(Counter(
+    "ai_truncated_total", "Réponses coupées par la limite max_tokens", _AI_LABELS))
+AI_RETRIES = registry.register(Counter(
+    "ai_retries_total", "Nouvelles tentatives envoyées", _AI_LABELS))
+AI_ERRORS = registry.register(Counter(
+    "ai_errors_total", "Tentatives en erreur par code HTTP ou type d'erreur", _AI_LABELS + ("status",)))
+AI_COALESCED = registry.register(Counter(
+    "ai_coalesced_total", "Appels servis par une requête identique déjà en cours", _AI_LABELS))
+
+
+class AICallRecord:
+    """Informations collectées pendant un appel à un fournisseur d'IA."""
+
+    def __init__(self, provider: str, model: str, call_site: str):
+        self.provider = provider
+        self.model = model
+        self.call_site = call_site
+        self.start = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.estimated_prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.truncated = False
+        self.retries = 0
+        self.success = False
+
+    @property
+    def labels(self) -> Dict[str, str]:
+        """Étiquettes communes à toutes les métriques de l'appel."""
+        return {"provider": self.provider, "model": self.model, "call_site": self.call_site}
+
+
+@contextmanager
+def call_site(name: str):
+    """
+    Définit le contexte des appels d'IA effectués dans le bloc.
+
+    Args:
+        name: Nom du contexte ('exercise', 'evaluation', 'qcm'...)
+    """
+    token = _call_site.set(name)
+    try:
+        yield
+    finally:
+        _call_site.reset(token)
+
+
+def current_call() -> Optional[AICallRecord]:
+    """Retourne l'enregistrement de l'appel d'IA en cours, s'il y en a un."""
+    return _current_call.get()
+
+
+@contextmanager
+def observe_call(provider: str, model: str):
+    """
+    Mesure un appel à un fournisseur d'IA et publie ses métriques à la fin du bloc.
+
+    Le bloc reçoit l'enregistrement de l'appel et doit positionner `record.success`
+    quand l'appel aboutit.
+
+    Args:
+        provider: Nom du fournisseur
+        model: Nom du modèle
+    """
+    record = AICallRecord(provider, model or "", _call_site.get())
+    token = _current_call.set(record)
+    try:
+        yield record
+    finally:
+        _current_call.reset(token)
+        labels = record.labels
+        AI_LATENCY.observe(time.monotonic() - record.start, **labels)
+        AI_REQUESTS.inc(outcome="success" if record.success else "error", **labels)
+        if record.first_token is not None:
+            AI_TIME_TO_FIRST_TOKEN.observe(record.first_token, **labels)
+        if record.prompt_tokens is not None:
+            AI_PROMPT_TOKENS.inc(record.prompt_tokens, **labels)
+        if record.estimated_prompt_tokens is not None:
+            AI_PROMPT_ESTIMATED_TOKENS.observe(record.estimated_prompt_tokens, **labels)
+        if record.completion_tokens is not None:
+            AI_COMPLETION_TOKENS.inc(record.completion_tokens, **labels)
+            AI_COMPLETION_TOKENS_HISTOGRAM.observe(record.completion_tokens, **labels)
+        if record.truncated:
+            AI_TRUNCATED.inc(**labels)
+
+
+def record_coalesced(provider: str, model: str) -> None:
+    """Compte un appel servi par le résultat d'une requête identique déjà en cours."""
+    AI_COALESCED.inc(provider=provider, model=model or "", call_site=_call_site.get())
+
+
+def record_attempt_error(status) -> None:
+    """Compte une tentative en erreur (code HTTP ou type d'erreur) pour l'appel en cours."""
+    record = current_call()
+    if record is not None:
+        AI_ERRORS.inc(status=status, **record.labels)
+
+
+def record_retry() -> None:
+    """Compte une nouvelle tentative pour l'appel en cours."""
+    record = current_call()
+    if record is not None:
+        record.retries += 1
+        AI_RETRIES.inc(**record.labels)
+
+
+def record_first_token(attempt_start: float, elapsed: Optional[float] = None) -> None:
+    """
+    Enregistre l'arrivée du premier token pour l'appel en cours.
+
+    Args:
+        attempt_start: Instant (time.monotonic) de l'envoi de la tentative réussie
+        elapsed: Durée jusqu'aux en-têtes de la réponse, si connue (sinon maintenant)
+    """
+    record = current_call()
+    if record is not None and record.first_token is None:
+        arrival = attempt_start + elapsed if elapsed is not None else time.monotonic()
+        record.first_token = arrival - record.start
+
+
+def record_usage(prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                 truncated: bool = False) -> None:
+    """
+    Enregistre la consommation de tokens rapportée par l'API pour l'appel en cours.
+
+    Args:
+        prompt_tokens: Nombre de tokens du prompt
+        completion_tokens: Nombre de tokens générés
+        truncated: True si la génération a été coupée par max_tokens
+    """
+    record = current_call()
+    if record is not None:
+        record.prompt_tokens = prompt_tokens
+        record.completion_tokens = completion_tokens
+        record.truncated = truncated
+
+
+def record_openai_usage(result: Dict) -> None:
+    """Enregistre la consommation d'une réponse au format OpenAI (LocalAI, Mistral)."""
+    usage = result.get("usage") or {}
+    choices = result.get("choices") or [{}]
+    record_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                 choices[0].get("finish_reason") == "length")
+
+
+def record_gemini_usage(result: Dict) -> None:
+    """Enregistre la consommation d'une réponse au format Gemini."""
+    usage = result.get("usageMetadata") or {}
+    candidates = result.get("candidates") or [{}]
+    record_usage(usage.get("promptTokenCount"), usage.get("candidatesTokenCount"),
+                 candidates[0].get("finishReason") == "MAX_TOKENS")
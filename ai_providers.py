@@ -11,8 +11,18 @@ import requests
 import json
 import time
 import logging
+import threading
+import contextvars
 import mistral
-from typing import Dict, Any, Optional, Union
+import ai_metrics
+from singleflight import SingleFlight, make_key
+from prompt_budget import estimate_tokens
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from retry import send_with_retry, get_cancel_event, set_cancel_event, CircuitOpenError
+from rate_limit import RateLimitExceededError
+from streaming import iter_openai_text, iter_gemini_text
+from typing import Dict, Any, Callable, Iterator, Optional, Tuple, Union
 
 load_dotenv()  # Charge les variables d'environnement depuis .env
 
@@ -34,21 +44,51 @@ class Config:
     """Configuration des différents fournisseurs d'IA."""
     
     # LocalAI
-    LOCALAI_URL = "http://127.0.0.1:8080/v1/chat/completions"
-    LOCALAI_MODEL = "mistral-7b-instruct-v0.3"
+    LOCALAI_URL = os.getenv("LOCALAI_URL", "http://127.0.0.1:8080/v1/chat/completions")
+    LOCALAI_MODEL = os.getenv("LOCALAI_MODEL", "mistral-7b-instruct-v0.3")
     
-    # Gemini
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        raise ValueError("La clé API Gemini n'est pas configurée. Veuillez définir GEMINI_API_KEY dans .env")
+    # Gemini (clé vérifiée à la première utilisation, voir Config.require)
     GEMINI_MODEL = "gemini-2.0-flash"
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/models")
     
-    # Mistral
-    MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-    if not MISTRAL_API_KEY:
-        raise ValueError("La clé API Mistral n'est pas configurée. Veuillez définir MISTRAL_API_KEY dans .env")
-    MISTRAL_URL = "https://codestral.mistral.ai/v1/chat/completions"
+    # Mistral (clé vérifiée à la première utilisation, voir Config.require)
+    MISTRAL_URL = os.getenv("MISTRAL_URL", "https://codestral.mistral.ai/v1/chat/completions")
     MISTRAL_MODEL = "codestral-latest"
+    
+    # Fournisseur automatique (requêtes couvertes)
+    AUTO_PRIMARY = os.getenv("AUTO_PRIMARY_PROVIDER", "mistral")
+    AUTO_SECONDARY = os.getenv("AUTO_SECONDARY_PROVIDER", "gemini")
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 5))
+    # Délai utilisé tant que les latences observées sont trop peu nombreuses
+    HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", 2))
+    HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", 16))
+    
+    # Regroupement des requêtes identiques simultanées
+    SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+    
+    # Vérification de l'état des fournisseurs
+    HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 5))
+    
+    @staticmethod
+    def require(name: str, label: str) -> str:
+        """
+        Lit une clé API obligatoire au moment où elle est utilisée.
+        
+        Args:
+            name: Nom de la variable d'environnement
+            label: Nom du fournisseur pour le message d'erreur
+            
+        Returns:
+            La valeur de la variable
+            
+        Raises:
+            ValueError: Si la variable n'est pas définie
+        """
+        value = os.getenv(name)
+        if not value:
+            raise ValueError(f"La clé API {label} n'est pas configurée. Veuillez définir {name} dans .env")
+        return value
 
 
 class APIError(Exception):
@@ -73,12 +113,174 @@ class APIError(Exception):
         return f"<h1>Erreur</h1><p>{self}</p>"
 
 
+# Préfixe commun à tous les messages d'erreur renvoyés par les fournisseurs
+ERROR_HTML_PREFIX = "<h1>Erreur</h1>"
+
+
+def is_error_response(text: str) -> bool:
+    """Indique si un texte renvoyé par un fournisseur est un message d'erreur."""
+    return not text or text.lstrip().startswith(ERROR_HTML_PREFIX)
+
+
+class LatencyTracker:
+    """Conserve les latences récentes des appels réussis, par fournisseur."""
+    
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, provider_name: str, latency: float) -> None:
+        """Enregistre la latence (en secondes) d'un appel réussi."""
+        with self._lock:
+            samples = self._samples.get(provider_name)
+            if samples is None:
+                samples = self._samples[provider_name] = deque(maxlen=self.window)
+            samples.append(latency)
+    
+    def percentile(self, provider_name: str, percentile: float, 
+                   min_samples: int = 1) -> Optional[float]:
+        """
+        Retourne un percentile des latences observées pour un fournisseur.
+        
+        Args:
+            provider_name: Nom du fournisseur d'IA
+            percentile: Percentile souhaité (entre 0 et 100)
+            min_samples: Nombre minimum d'observations nécessaires
+            
+        Returns:
+            La latence en secondes, ou None s'il n'y a pas assez d'observations
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(provider_name, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+
+# Latences observées par tous les fournisseurs du processus
+latency_tracker = LatencyTracker()
+
+# Requêtes identiques en cours, partagées entre threads et workers
+single_flight = SingleFlight()
+
+
 # Classe de base pour les fournisseurs d'IA
 class AIProvider:
     """Classe de base pour tous les fournisseurs d'IA."""
     
+    name = "ai"
+    
+    def estimate_prompt_tokens(self, prompt: str) -> int:
+        """Estime la taille (en tokens) d'un prompt envoyé avec le message système."""
+        return estimate_tokens(f"{SYSTEM_MESSAGE}\n\n{prompt}", getattr(self, "model", ""))
+    
     def generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
-                     temperature: float = DEFAULT_TEMPERATURE) -> str:
+                     temperature: float = DEFAULT_TEMPERATURE, **kwargs) -> str:
+        """
+        Génère du texte en publiant les métriques de l'appel (latence, tokens, erreurs).
+        
+        Voir `generate_text_with_usage`, qui retourne aussi la taille estimée du prompt.
+        
+        Returns:
+            Le texte généré par l'API
+        """
+        return self.generate_text_with_usage(prompt, max_tokens, temperature, **kwargs)[0]
+    
+    def generate_text_with_usage(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                                 temperature: float = DEFAULT_TEMPERATURE, **kwargs) -> Tuple[str, int]:
+        """
+        Génère du texte en publiant les métriques de l'appel (latence, tokens, erreurs).
+        
+        Les appels identiques simultanés (même fournisseur, modèle, prompt et paramètres)
+        sont regroupés en un seul appel à l'API dont le résultat est partagé, sauf les
+        appels annulables (requêtes couvertes du fournisseur "auto") : leur annulation ne
+        doit pas être transmise aux autres appelants.
+        
+        Args:
+            prompt: Le prompt à envoyer à l'API
+            max_tokens: Nombre maximum de tokens à générer
+            temperature: Température pour la génération
+            **kwargs: Paramètres propres au fournisseur (retry_count, retry_delay...)
+            
+        Returns:
+            Un tuple (texte généré par l'API, taille estimée du prompt en tokens)
+        """
+        model = getattr(self, "model", "")
+        prompt_tokens = self.estimate_prompt_tokens(prompt)
+        
+        def call() -> str:
+            start = time.monotonic()
+            with ai_metrics.observe_call(self.name, model) as record:
+                record.estimated_prompt_tokens = prompt_tokens
+                text = self._generate_text(prompt, max_tokens, temperature, **kwargs)
+                record.success = not is_error_response(text)
+            if record.success:
+                latency_tracker.record(self.name, time.monotonic() - start)
+            return text
+        
+        if not Config.SINGLEFLIGHT_ENABLED or get_cancel_event() is not None:
+            return call(), prompt_tokens
+        
+        key = make_key(self.name, model, prompt, temperature, max_tokens)
+        text, shared = single_flight.do(key, call, lambda result: not is_error_response(result))
+        if shared:
+            ai_metrics.record_coalesced(self.name, model)
+        return text, prompt_tokens
+    
+    def stream_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                    temperature: float = DEFAULT_TEMPERATURE, **kwargs) -> Iterator[str]:
+        """
+        Génère du texte en streaming en publiant les métriques de l'appel.
+        
+        Le temps jusqu'au premier token publié est celui du premier fragment reçu. Les
+        fournisseurs sans streaming renvoient le texte complet en un seul fragment. Les
+        appels en streaming ne sont pas regroupés avec les appels identiques.
+        
+        Args:
+            prompt: Le prompt à envoyer à l'API
+            max_tokens: Nombre maximum de tokens à générer
+            temperature: Température pour la génération
+            **kwargs: Paramètres propres au fournisseur (retry_count, retry_delay...)
+            
+        Returns:
+            Un itérateur sur les fragments du texte généré
+        """
+        model = getattr(self, "model", "")
+        prompt_tokens = self.estimate_prompt_tokens(prompt)
+        
+        # Le flux s'exécute dans sa propre copie du contexte : l'enregistrement de l'appel
+        # reste cohérent quel que soit le contexte depuis lequel l'itération reprend
+        context = contextvars.copy_context()
+        chunks = self._observed_stream(prompt, max_tokens, temperature, model, prompt_tokens, **kwargs)
+        try:
+            while True:
+                try:
+                    chunk = context.run(next, chunks)
+                except StopIteration:
+                    return
+                yield chunk
+        finally:
+            context.run(chunks.close)
+    
+    def _observed_stream(self, prompt: str, max_tokens: int, temperature: float, 
+                         model: str, prompt_tokens: int, **kwargs) -> Iterator[str]:
+        """Flux du fournisseur mesuré par les métriques de l'appel."""
+        with ai_metrics.observe_call(self.name, model) as record:
+            record.estimated_prompt_tokens = prompt_tokens
+            first = True
+            for chunk in self._stream_text(prompt, max_tokens, temperature, **kwargs):
+                if first:
+                    first = False
+                    record.first_token = time.monotonic() - record.start
+                    record.success = not is_error_response(chunk)
+                yield chunk
+        if record.success:
+            latency_tracker.record(self.name, time.monotonic() - record.start)
+    
+    def _generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                      temperature: float = DEFAULT_TEMPERATURE) -> str:
         """
         Méthode à implémenter par les classes enfants.
         
@@ -92,6 +294,45 @@ class AIProvider:
         """
         raise NotImplementedError("Cette méthode doit être implémentée par les classes enfants")
     
+    def _stream_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                     temperature: float = DEFAULT_TEMPERATURE, **kwargs) -> Iterator[str]:
+        """
+        Flux de texte, à redéfinir par les fournisseurs qui savent diffuser leur réponse.
+        
+        Par défaut, le texte complet est renvoyé en un seul fragment.
+        """
+        yield self._generate_text(prompt, max_tokens, temperature, **kwargs)
+    
+    def _stream_response(self, open_stream: Callable[[], requests.Response], 
+                         iter_text: Callable[[requests.Response], Iterator[str]], 
+                         provider_name: str) -> Iterator[str]:
+        """
+        Lit un flux de réponse en gérant les erreurs de manière uniforme.
+        
+        Une erreur avant le premier fragment produit le message d'erreur HTML habituel ;
+        une coupure en cours de flux termine simplement le texte.
+        
+        Args:
+            open_stream: Fonction qui envoie la requête et retourne la réponse en streaming
+            iter_text: Fonction qui extrait les fragments de texte de la réponse
+            provider_name: Nom du fournisseur d'IA
+        """
+        started = False
+        try:
+            response = open_stream()
+            # Fermer la réponse dans tous les cas pour rendre la connexion au pool
+            with response:
+                if response.status_code != 200:
+                    raise APIError("Erreur lors de la génération du texte", response.status_code, response.text)
+                for text in iter_text(response):
+                    started = True
+                    yield text
+        except Exception as e:
+            if started:
+                logger.warning(f"Flux {provider_name} interrompu: {e}")
+            else:
+                yield self._handle_api_error(e, provider_name)
+    
     def evaluate_code(self, code: str, enonce: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
                      temperature: float = DEFAULT_TEMPERATURE) -> str:
         """
@@ -106,51 +347,75 @@ class AIProvider:
         Returns:
             L'évaluation du code
         """
-        prompt = get_evaluation_prompt(code, enonce)
-        return self.generate_text(prompt, max_tokens, temperature)
+        return self.generate_text(self.evaluation_prompt(code, enonce), max_tokens, temperature)
     
-    def _handle_api_error(self, e: Exception, provider_name: str, attempts: int, 
-                         retry_count: int) -> Optional[str]:
+    def evaluation_prompt(self, code: str, enonce: str) -> str:
+        """Construit le prompt d'évaluation, réduit au budget de tokens du modèle de ce fournisseur."""
+        return get_evaluation_prompt(code, enonce, getattr(self, "model", None))
+    
+    def check_health(self, timeout: float = Config.HEALTH_CHECK_TIMEOUT) -> None:
+        """
+        Vérifie que le fournisseur est configuré et joignable (sans générer de texte).
+        
+        Args:
+            timeout: Délai maximal de la vérification en secondes
+            
+        Raises:
+            ValueError: Si le fournisseur n'est pas configuré
+            APIError: Si le fournisseur répond avec une erreur
+            requests.exceptions.RequestException: Si le fournisseur est injoignable
+        """
+    
+    @staticmethod
+    def _check_response(response: requests.Response) -> None:
+        """Lève une APIError si la réponse d'une vérification n'est pas un succès."""
+        if response.status_code != 200:
+            raise APIError("Vérification de l'état échouée", response.status_code)
+    
+    def _handle_api_error(self, e: Exception, provider_name: str) -> str:
         """
         Gère les erreurs d'API de manière uniforme.
         
         Args:
             e: L'exception levée
             provider_name: Nom du fournisseur d'IA
-            attempts: Nombre de tentatives actuelles
-            retry_count: Nombre maximum de tentatives
             
         Returns:
-            Message d'erreur formaté en HTML si c'est la dernière tentative, None sinon
+            Message d'erreur formaté en HTML
         """
         if isinstance(e, requests.exceptions.Timeout):
             logger.warning(f"Timeout lors de la requête à {provider_name}")
-            if attempts == retry_count:
-                return f"<h1>Erreur</h1><p>Erreur: Le serveur {provider_name} met trop de temps à répondre. Veuillez réessayer plus tard.</p>"
+            return f"<h1>Erreur</h1><p>Erreur: Le serveur {provider_name} met trop de temps à répondre. Veuillez réessayer plus tard.</p>"
+        elif isinstance(e, (CircuitOpenError, RateLimitExceededError)):
+            logger.warning(str(e))
+            return f"<h1>Erreur</h1><p>{e}</p>"
         elif isinstance(e, APIError):
             logger.error(f"Erreur API {provider_name}: {e}")
-            if attempts == retry_count:
-                return e.to_html()
+            return e.to_html()
         else:
             logger.error(f"Exception lors de la requête à {provider_name}: {str(e)}")
-            if attempts == retry_count:
-                return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte: {str(e)}</p>"
-        
-        return None
+            return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte: {str(e)}</p>"
 
 
 # Fournisseur LocalAI
 class LocalAIProvider(AIProvider):
     """Fournisseur d'IA utilisant LocalAI."""
     
+    name = "localai"
+    
     def __init__(self, url: str = Config.LOCALAI_URL, model: str = Config.LOCALAI_MODEL):
         self.url = url
         self.model = model
     
-    def generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
-                     temperature: float = DEFAULT_TEMPERATURE, 
-                     retry_count: int = DEFAULT_RETRY_COUNT, 
-                     retry_delay: int = DEFAULT_RETRY_DELAY) -> str:
+    def check_health(self, timeout: float = Config.HEALTH_CHECK_TIMEOUT) -> None:
+        """Vérifie que le serveur LocalAI répond sur /health."""
+        base_url = self.url.replace('/v1/chat/completions', '')
+        self._check_response(requests.get(f"{base_url}/health", timeout=timeout))
+    
+    def _generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                      temperature: float = DEFAULT_TEMPERATURE, 
+                       retry_count: int = DEFAULT_RETRY_COUNT, 
+                      retry_delay: int = DEFAULT_RETRY_DELAY) -> str:
         """
         Génère du texte en utilisant l'API LocalAI.
         
@@ -159,73 +424,84 @@ class LocalAIProvider(AIProvider):
             max_tokens: Nombre maximum de tokens à générer
             temperature: Température pour la génération
             retry_count: Nombre de tentatives en cas d'échec
-            retry_delay: Délai entre les tentatives en secondes
+            retry_delay: Délai de base entre les tentatives en secondes (attente exponentielle)
             
         Returns:
             Le texte généré par l'API
         """
-        attempts = 0
+        try:
+            # Envoyer la requête à l'API (avec nouvelles tentatives et disjoncteur)
+            response = self._send(prompt, max_tokens, temperature, retry_count, retry_delay)
+            
+            # Vérifier si la requête a réussi
+            if response.status_code != 200:
+                raise APIError("Erreur lors de la génération du texte", response.status_code, response.text)
+            
+            result = response.json()
+            ai_metrics.record_openai_usage(result)
+            # Extraire le texte généré
+            return result["choices"][0]["message"]["content"]
         
-        while attempts <= retry_count:
-            try:
-                # Préparer les données pour l'API
-                data = {
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": SYSTEM_MESSAGE},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "max_tokens": max_tokens,
-                    "temperature": temperature
-                }
-                
-                # Envoyer la requête à l'API
-                response = requests.post(self.url, json=data, timeout=60)
-                
-                # Vérifier si la requête a réussi
-                if response.status_code == 200:
-                    result = response.json()
-                    # Extraire le texte généré
-                    generated_text = result["choices"][0]["message"]["content"]
-                    return generated_text
-                else:
-                    logger.error(f"Erreur lors de la requête à LocalAI: {response.status_code}")
-                    logger.error(f"Détails: {response.text}")
-                    
-                    # Si c'est la dernière tentative, lever une exception
-                    if attempts == retry_count:
-                        raise APIError(
-                            "Erreur lors de la génération du texte", 
-                            response.status_code, 
-                            response.text
-                        )
-                    
-                    # Sinon, attendre et réessayer
-                    time.sleep(retry_delay)
-                    attempts += 1
-                    
-            except Exception as e:
-                error_message = self._handle_api_error(e, "LocalAI", attempts, retry_count)
-                if error_message and attempts == retry_count:
-                    return error_message
-                
-                time.sleep(retry_delay)
-                attempts += 1
+        except Exception as e:
+            return self._handle_api_error(e, "LocalAI")
+    
+    def _stream_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                     temperature: float = DEFAULT_TEMPERATURE, 
+                     retry_count: int = DEFAULT_RETRY_COUNT, 
+                     retry_delay: int = DEFAULT_RETRY_DELAY) -> Iterator[str]:
+        """Génère du texte en streaming avec l'API LocalAI (format OpenAI)."""
+        return self._stream_response(
+            lambda: self._send(prompt, max_tokens, temperature, retry_count, retry_delay, stream=True),
+            iter_openai_text, "LocalAI")
+    
+    def _send(self, prompt: str, max_tokens: int, temperature: float, retry_count: int, 
+              retry_delay: int, stream: bool = False) -> requests.Response:
+        """Envoie une requête de génération (avec quota, nouvelles tentatives et disjoncteur)."""
+        # Préparer les données pour l'API
+        data = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if stream:
+            data["stream"] = True
+        
+        return send_with_retry(
+            "LocalAI",
+            lambda: requests.post(self.url, json=data, timeout=60, stream=stream),
+            retry_count, retry_delay, tokens=self.estimate_prompt_tokens(prompt) + max_tokens
+        )
 
 
 # Fournisseur Gemini
 class GeminiProvider(AIProvider):
     """Fournisseur d'IA utilisant l'API Gemini de Google."""
     
-    def __init__(self, api_key: str = Config.GEMINI_API_KEY, model: str = Config.GEMINI_MODEL):
-        self.api_key = api_key
+    name = "gemini"
+    
+    def __init__(self, api_key: Optional[str] = None, model: str = Config.GEMINI_MODEL):
+        self._api_key = api_key
         self.model = model
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta/models"
+        self.base_url = Config.GEMINI_BASE_URL
     
-    def generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
-                     temperature: float = DEFAULT_TEMPERATURE, 
-                     retry_count: int = DEFAULT_RETRY_COUNT, 
-                     retry_delay: int = DEFAULT_RETRY_DELAY) -> str:
+    @property
+    def api_key(self) -> str:
+        """Clé API Gemini, lue dans l'environnement si elle n'a pas été fournie."""
+        return self._api_key or Config.require("GEMINI_API_KEY", "Gemini")
+    
+    def check_health(self, timeout: float = Config.HEALTH_CHECK_TIMEOUT) -> None:
+        """Vérifie la clé API en consultant la fiche du modèle (aucun token consommé)."""
+        url = f"{self.base_url}/{self.model}?key={self.api_key}"
+        self._check_response(requests.get(url, timeout=timeout))
+    
+    def _generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                      temperature: float = DEFAULT_TEMPERATURE, 
+                       retry_count: int = DEFAULT_RETRY_COUNT, 
+                      retry_delay: int = DEFAULT_RETRY_DELAY) -> str:
         """
         Génère du texte en utilisant l'API Gemini.
         
@@ -234,85 +510,99 @@ class GeminiProvider(AIProvider):
             max_tokens: Nombre maximum de tokens à générer
             temperature: Température pour la génération
             retry_count: Nombre de tentatives en cas d'échec
-            retry_delay: Délai entre les tentatives en secondes
+            retry_delay: Délai de base entre les tentatives en secondes (attente exponentielle)
             
         Returns:
             Le texte généré par l'API
         """
-        attempts = 0
+        try:
+            # Envoi de la requête POST (avec nouvelles tentatives et disjoncteur)
+            response = self._send(prompt, max_tokens, temperature, retry_count, retry_delay)
+            
+            # Vérification de la réponse
+            if response.status_code != 200:
+                raise APIError("Erreur lors de la génération du texte", response.status_code, response.text)
+            
+            # Extraction du texte de la réponse
+            result = response.json()
+            ai_metrics.record_gemini_usage(result)
+            return result['candidates'][0]['content']['parts'][0]['text']
         
+        except Exception as e:
+            return self._handle_api_error(e, "Gemini")
+    
+    def _stream_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                     temperature: float = DEFAULT_TEMPERATURE, 
+                     retry_count: int = DEFAULT_RETRY_COUNT, 
+                     retry_delay: int = DEFAULT_RETRY_DELAY) -> Iterator[str]:
+        """Génère du texte en streaming avec l'API Gemini (streamGenerateContent)."""
+        return self._stream_response(
+            lambda: self._send(prompt, max_tokens, temperature, retry_count, retry_delay, stream=True),
+            iter_gemini_text, "Gemini")
+    
+    def _send(self, prompt: str, max_tokens: int, temperature: float, retry_count: int, 
+              retry_delay: int, stream: bool = False) -> requests.Response:
+        """Envoie une requête de génération (avec quota, nouvelles tentatives et disjoncteur)."""
         # Construire le prompt complet avec le message système
         full_prompt = f"{SYSTEM_MESSAGE}\n\n{prompt}"
         
-        while attempts <= retry_count:
-            try:
-                # URL de l'API Gemini
-                url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
-                
-                # Corps de la requête
-                payload = {
-                    "contents": [{
-                        "parts": [{
-                            "text": full_prompt
-                        }]
-                    }],
-                    "generationConfig": {
-                        "temperature": temperature,
-                        "maxOutputTokens": max_tokens
-                    }
-                }
-                
-                # En-têtes de la requête
-                headers = {
-                    "Content-Type": "application/json"
-                }
-                
-                # Envoi de la requête POST
-                response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=60)
-                
-                # Vérification de la réponse
-                if response.status_code == 200:
-                    # Extraction du texte de la réponse
-                    result = response.json()
-                    return result['candidates'][0]['content']['parts'][0]['text']
-                else:
-                    logger.error(f"Erreur lors de la requête à Gemini: {response.status_code}")
-                    logger.error(f"Détails: {response.text}")
-                    
-                    # Si c'est la dernière tentative, lever une exception
-                    if attempts == retry_count:
-                        raise APIError(
-                            "Erreur lors de la génération du texte", 
-                            response.status_code, 
-                            response.text
-                        )
-                    
-                    # Sinon, attendre et réessayer
-                    time.sleep(retry_delay)
-                    attempts += 1
-            
-            except Exception as e:
-                error_message = self._handle_api_error(e, "Gemini", attempts, retry_count)
-                if error_message and attempts == retry_count:
-                    return error_message
-                
-                time.sleep(retry_delay)
-                attempts += 1
+        # Corps de la requête
+        payload = {
+            "contents": [{
+                "parts": [{
+                    "text": full_prompt
+                }]
+            }],
+            "generationConfig": {
+                "temperature": temperature,
+                "maxOutputTokens": max_tokens
+            }
+        }
+        
+        # En-têtes de la requête
+        headers = {
+            "Content-Type": "application/json"
+        }
+        
+        # URL de l'API Gemini (événements SSE pour le streaming)
+        if stream:
+            url = f"{self.base_url}/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+        else:
+            url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
+        
+        return send_with_retry(
+            "Gemini",
+            lambda: requests.post(url, headers=headers, data=json.dumps(payload), timeout=60, stream=stream),
+            retry_count, retry_delay, tokens=self.estimate_prompt_tokens(prompt) + max_tokens
+        )
 
 
 # Fournisseur Mistral
 class MistralProvider(AIProvider):
     """Fournisseur d'IA utilisant l'API Mistral."""
     
-    def __init__(self, api_key: str = Config.MISTRAL_API_KEY, 
+    name = "mistral"
+    
+    def __init__(self, api_key: Optional[str] = None, 
                 url: str = Config.MISTRAL_URL, 
                 model: str = Config.MISTRAL_MODEL):
-        self.api_key = api_key
+        self._api_key = api_key
         self.url = url
         self.model = model
     
-    def generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
-                     temperature: float = DEFAULT_TEMPERATURE) -> str:
+    @property
+    def api_key(self) -> str:
+        """Clé API Mistral, lue dans l'environnement si elle n'a pas été fournie."""
+        return self._api_key or mistral.get_api_key()
+    
+    def check_health(self, timeout: float = Config.HEALTH_CHECK_TIMEOUT) -> None:
+        """Vérifie la clé API en listant les modèles disponibles (aucun token consommé)."""
+        url = self.url.replace('/chat/completions', '/models')
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        self._check_response(requests.get(url, headers=headers, timeout=timeout))
+    
+    def _generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                      temperature: float = DEFAULT_TEMPERATURE) -> str:
         """
         Génère du texte en utilisant l'API Mistral.
         
@@ -326,21 +616,113 @@ class MistralProvider(AIProvider):
         """
         return mistral.generate_text(prompt, max_tokens, temperature)
     
-    def evaluate_code(self, code: str, enonce: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
-                     temperature: float = DEFAULT_TEMPERATURE) -> str:
+    def _stream_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                     temperature: float = DEFAULT_TEMPERATURE) -> Iterator[str]:
+        """Génère du texte en streaming avec l'API Mistral."""
+        return mistral.stream_text(prompt, max_tokens, temperature)
+
+
+# Fournisseur automatique avec requêtes couvertes
+class HedgedProvider(AIProvider):
+    """
+    Fournisseur "auto" qui couvre les requêtes lentes par un second fournisseur.
+    
+    La requête part vers le fournisseur principal. Si aucune réponse valide n'est
+    arrivée après le p95 de ses latences observées (ou si elle échoue), une requête
+    couverte part vers le fournisseur secondaire. La première réponse valide est
+    retenue et l'autre requête est annulée.
+    """
+    
+    name = "auto"
+    
+    _executor = ThreadPoolExecutor(max_workers=Config.HEDGE_MAX_WORKERS, 
+                                   thread_name_prefix="hedged-request")
+    
+    def __init__(self, primary: Optional[AIProvider] = None, 
+                 secondary: Optional[AIProvider] = None):
+        self.primary = primary or get_ai_provider(Config.AUTO_PRIMARY)
+        self.secondary = secondary or get_ai_provider(Config.AUTO_SECONDARY)
+    
+    def hedge_delay(self, provider: Optional[AIProvider] = None) -> float:
+        """Délai (en secondes) avant d'envoyer la requête couverte (après `provider`, le principal par défaut)."""
+        provider = provider or self.primary
+        delay = latency_tracker.percentile(provider.name, Config.HEDGE_PERCENTILE, 
+                                           Config.HEDGE_MIN_SAMPLES)
+        return Config.HEDGE_DEFAULT_DELAY if delay is None else delay
+    
+    def _submit(self, provider: AIProvider, cancel_event: threading.Event, 
+                prompt: str, max_tokens: int, temperature: float):
+        """Soumet un appel au fournisseur dans un thread annulable."""
+        def call() -> str:
+            set_cancel_event(cancel_event)
+            try:
+                return provider.generate_text(prompt, max_tokens, temperature)
+            finally:
+                set_cancel_event(None)
+        # Copier le contexte pour conserver le contexte d'appel des métriques
+        return self._executor.submit(contextvars.copy_context().run, call)
+    
+    def _generate_text(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                      temperature: float = DEFAULT_TEMPERATURE) -> str:
         """
-        Évalue le code Python soumis par rapport à un énoncé.
+        Génère du texte avec le premier fournisseur qui répond correctement.
         
         Args:
-            code: Le code Python à évaluer
-            enonce: L'énoncé de l'exercice
+            prompt: Le prompt à envoyer à l'API
             max_tokens: Nombre maximum de tokens à générer
             temperature: Température pour la génération
             
         Returns:
-            L'évaluation du code
+            Le texte généré, ou le message d'erreur du fournisseur principal si les deux échouent
         """
-        return mistral.evaluate_code(code, enonce, max_tokens, temperature)
+        from provider_health import health_checker
+        
+        cancel_events = {}
+        providers = {}
+        primary, secondary = self.primary, self.secondary
+        # Commencer par le secondaire si le principal est connu comme indisponible
+        if not health_checker.is_available(primary.name) and health_checker.is_available(secondary.name):
+            primary, secondary = secondary, primary
+        
+        def launch(provider: AIProvider):
+            event = threading.Event()
+            future = self._submit(provider, event, prompt, max_tokens, temperature)
+            cancel_events[future] = event
+            providers[future] = provider
+            return future
+        
+        primary_future = launch(primary)
+        pending = {primary_future}
+        errors = {}
+        timeout = self.hedge_delay(primary)
+        hedged = False
+        
+        while pending:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    text = self._handle_api_error(e, providers[future].name)
+                if not is_error_response(text):
+                    # Annuler les requêtes encore en cours
+                    for other in pending:
+                        cancel_events[other].set()
+                        other.cancel()
+                    if future is not primary_future:
+                        logger.info(f"Réponse couverte retenue depuis {providers[future].name}")
+                    return text
+                errors[future] = text
+            
+            # Requête couverte si le principal est lent ou en échec
+            if not hedged:
+                hedged = True
+                logger.info(f"Requête couverte envoyée à {secondary.name}")
+                pending.add(launch(secondary))
+            timeout = None
+        
+        return errors.get(primary_future) or next(iter(errors.values()))
 
 
 # Fonction pour obtenir le fournisseur d'IA approprié
@@ -349,12 +731,14 @@ def get_ai_provider(provider_name: str = "localai") -> AIProvider:
     Retourne l'instance du fournisseur d'IA approprié.
     
     Args:
-        provider_name: Le nom du fournisseur d'IA ('localai', 'gemini' ou 'mistral')
+        provider_name: Le nom du fournisseur d'IA ('localai', 'gemini', 'mistral' ou 'auto')
         
     Returns:
         Une instance du fournisseur d'IA
     """
-    if provider_name.lower() == "gemini":
+    if provider_name.lower() == "auto":
+        return HedgedProvider()
+    elif provider_name.lower() == "gemini":
         return GeminiProvider()
     elif provider_name.lower() == "mistral":
         return MistralProvider()
@@ -7,6 +7,7 @@ et d'évaluer les solutions soumises par les élèves.
 
 import os
 import sys
+import click
 
 # Configuration de matplotlib pour le mode non-interactif
 try:
@@ -19,7 +20,7 @@ from flask import Flask, render_template, request, redirect, url_for, flash, ses
 from models import db, User
 from werkzeug.security import check_password_hash
 from routes import main, data_editor, ged, notebook, defis
-from routes import qcm_generator
+from routes import qcm_generator, metrics, catalog
 from app.routes import admin_routes
 
 # Configuration de l'application
@@ -40,6 +41,23 @@ def init_db_command():
     db.create_all()
     print("Base de données initialisée avec succès")
 
+# Commandes CLI d'import et d'export du catalogue des exercices en base
+@app.cli.command("catalog-import")
+@click.argument("path", default=os.path.join('exercices', 'data.json'))
+def catalog_import_command(path):
+    """Importe un fichier au format data.json dans les tables du catalogue"""
+    from exercise_db import SQLExerciseStore
+    count = SQLExerciseStore().import_json(path)
+    print(f"{count} exercices importés depuis {path}")
+
+@app.cli.command("catalog-export")
+@click.argument("path", default=os.path.join('exercices', 'data.json'))
+def catalog_export_command(path):
+    """Exporte les tables du catalogue au format data.json"""
+    from exercise_db import SQLExerciseStore
+    count = SQLExerciseStore().export_json(path)
+    print(f"{count} exercices exportés vers {path}")
+
 # Initialisation des routes
 main.init_routes(app)
 data_editor.init_routes(app)
@@ -47,6 +65,8 @@ ged.init_routes(app)
 notebook.init_routes(app)
 defis.init_routes(app)
 qcm_generator.init_routes(app)
+metrics.init_routes(app)
+catalog.init_routes(app)
 
 admin_routes.init_routes(app)
 
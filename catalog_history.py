@@ -0,0 +1,175 @@
+"""
+Module d'historique des versions du catalogue des exercices.
+
+Chaque modification du catalogue est enregistrée dans un journal en ajout seul
+(exercices/history/deltas.jsonl) sous forme de delta compact : la liste des opérations
+JSON Patch qui transforment la version précédente en la nouvelle, et l'empreinte des
+données obtenues. Un instantané complet est écrit toutes les CATALOG_SNAPSHOT_INTERVAL
+versions, ainsi que lorsque les données remplacées ne sont pas celles de la dernière
+entrée du journal (modification faite hors de l'application, arrêt brutal...). Une
+version passée est reconstruite à partir de l'instantané qui la précède et des deltas
+suivants ; deux versions peuvent être comparées et le catalogue ramené à une version
+antérieure (ce qui crée une nouvelle version, l'historique n'est jamais réécrit).
+"""
+
+import os
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import jsonio
+from exercise_store import FileLock, atomic_write
+from json_patch import apply_patch, diff
+
+logger = logging.getLogger(__name__)
+
+# Paramètres de l'historique (valeurs de .env si disponibles)
+CATALOG_HISTORY_DIR = os.getenv("CATALOG_HISTORY_DIR", os.path.join('exercices', 'history'))
+CATALOG_SNAPSHOT_INTERVAL = int(os.getenv("CATALOG_SNAPSHOT_INTERVAL", 50))
+
+
+class HistoryError(LookupError):
+    """Exception levée quand une version demandée n'est pas disponible dans l'historique."""
+
+
+def data_digest(data: Any) -> str:
+    """Empreinte des données d'une version du catalogue."""
+    return hashlib.sha1(jsonio.dumps(data, compact=True)).hexdigest()
+
+
+class CatalogHistory:
+    """
+    Journal des versions du catalogue (deltas JSON Patch et instantanés périodiques).
+
+    Args:
+        directory: Répertoire de l'historique
+        snapshot_interval: Nombre de versions entre deux instantanés complets
+    """
+
+    def __init__(self, directory: str = CATALOG_HISTORY_DIR,
+                 snapshot_interval: int = CATALOG_SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.log_path = os.path.join(directory, 'deltas.jsonl')
+        self._lock = FileLock(os.path.join(directory, '.lock'))
+
+    def _snapshot_path(self, version: int) -> str:
+        return os.path.join(self.directory, f'snapshot-{version}.json')
+
+    def _last_entry(self) -> Optional[Dict[str, Any]]:
+        """Lit la dernière entrée du journal sans parcourir tout le fichier."""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                position = f.tell()
+                tail = b''
+                while position > 0:
+                    step = min(4096, position)
+                    position -= step
+                    f.seek(position)
+                    tail = f.read(step) + tail
+                    lines = tail.rstrip(b'\n').split(b'\n')
+                    if len(lines) > 1 or position == 0:
+                        return jsonio.loads(lines[-1]) if lines[-1] else None
+        except (OSError, ValueError):
+            return None
+        return None
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with open(self.log_path, 'ab') as f:
+            f.write(jsonio.dumps(entry, compact=True) + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_snapshot(self, version: int, data: Dict[str, Any], digest: str) -> None:
+        atomic_write(self._snapshot_path(version), jsonio.dumps(data, compact=True))
+        self._append({'version': version, 'time': datetime.now().isoformat(timespec='seconds'),
+                      'snapshot': True, 'digest': digest})
+
+    def record(self, old_version: int, new_version: int,
+               old_data: Optional[Dict[str, Any]], new_data: Dict[str, Any]) -> None:
+        """
+        Enregistre une nouvelle version du catalogue.
+
+        Si les données remplacées ne sont pas celles de la dernière entrée du journal
+        (autre version ou autre empreinte), elles sont d'abord enregistrées en instantané :
+        le delta de la nouvelle version part toujours de données connues du journal.
+
+        Args:
+            old_version: Version remplacée
+            new_version: Nouvelle version
+            old_data: Données de la version remplacée (None si inconnues)
+            new_data: Données de la nouvelle version
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        new_digest = data_digest(new_data)
+        with self._lock:
+            if old_data is None:
+                # Version précédente inconnue : la nouvelle version repart d'un instantané
+                self._write_snapshot(new_version, new_data, new_digest)
+                return
+            last = self._last_entry()
+            old_digest = data_digest(old_data)
+            if last is None or last.get('version') != old_version or last.get('digest') != old_digest:
+                self._write_snapshot(old_version, old_data, old_digest)
+            if new_version % self.snapshot_interval == 0:
+                self._write_snapshot(new_version, new_data, new_digest)
+                return
+            self._append({'version': new_version, 'base': old_version,
+                          'time': datetime.now().isoformat(timespec='seconds'),
+                          'ops': diff(old_data, new_data), 'digest': new_digest})
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Retourne les entrées du journal (version, date, nombre d'opérations ou instantané)."""
+        entries = []
+        try:
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = jsonio.loads(line)
+                    except ValueError:
+                        continue
+                    entries.append({'version': entry.get('version'), 'time': entry.get('time'),
+                                    'snapshot': bool(entry.get('snapshot')),
+                                    'operations': len(entry.get('ops', []))})
+        except OSError:
+            pass
+        return entries
+
+    def rebuild(self, version: int) -> Dict[str, Any]:
+        """
+        Reconstruit les données d'une version du catalogue.
+
+        Raises:
+            HistoryError: Si la version n'est pas dans l'historique
+        """
+        chain: List[Dict[str, Any]] = []
+        try:
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = jsonio.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get('version', 0) > version:
+                        continue
+                    if entry.get('snapshot'):
+                        chain = [entry]
+                    elif chain and entry.get('base') == chain[-1]['version']:
+                        chain.append(entry)
+        except OSError:
+            pass
+        if not chain or chain[-1]['version'] != version:
+            raise HistoryError(f"Version {version} absente de l'historique")
+        data = jsonio.load(self._snapshot_path(chain[0]['version']))
+        for entry in chain[1:]:
+            data = apply_patch(data, entry['ops'])
+        return data
+
+    def diff(self, from_version: int, to_version: int) -> List[Dict[str, Any]]:
+        """Retourne les opérations JSON Patch qui mènent d'une version à une autre."""
+        return diff(self.rebuild(from_version), self.rebuild(to_version))
+
+
+catalog_history = CatalogHistory()
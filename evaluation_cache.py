@@ -0,0 +1,193 @@
+"""
+Module de cache des évaluations de code.
+
+Les élèves soumettent souvent à nouveau un code qui ne diffère que par les espaces, les
+commentaires ou le nom des variables. Ce module calcule une empreinte normalisée du code
+(arbre syntaxique sans commentaires ni docstrings, avec renommage optionnel des variables
+locales) associée à une empreinte de l'énoncé, et conserve l'évaluation obtenue pour la
+resservir aux soumissions équivalentes.
+"""
+
+import io
+import os
+import ast
+import time
+import hashlib
+import tokenize
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ai_metrics import registry, Counter
+
+# Paramètres du cache (valeurs de .env si disponibles)
+EVALUATION_CACHE_SIZE = int(os.getenv("EVALUATION_CACHE_SIZE", 2000))
+EVALUATION_CACHE_TTL = float(os.getenv("EVALUATION_CACHE_TTL", 7 * 24 * 3600))
+EVALUATION_CACHE_RENAME = os.getenv("EVALUATION_CACHE_RENAME", "false").lower() in ("1", "true", "yes")
+
+EVALUATION_CACHE_REQUESTS = registry.register(Counter(
+    "evaluation_cache_requests_total", "Consultations du cache des évaluations par résultat", ("result",)))
+
+
+class _LocalRenamer(ast.NodeTransformer):
+    """Renomme les paramètres et variables locales des fonctions dans leur ordre d'apparition."""
+
+    def visit_FunctionDef(self, node):
+        # Paramètres puis noms affectés dans la fonction (fonctions imbriquées comprises)
+        local_names = {}
+        for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
+            local_names.setdefault(arg.arg, f"_v{len(local_names)}")
+        for extra in (node.args.vararg, node.args.kwarg):
+            if extra is not None:
+                local_names.setdefault(extra.arg, f"_v{len(local_names)}")
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                local_names.setdefault(child.id, f"_v{len(local_names)}")
+        # Les noms déclarés global ou nonlocal ne sont pas locaux
+        for child in ast.walk(node):
+            if isinstance(child, (ast.Global, ast.Nonlocal)):
+                for name in child.names:
+                    local_names.pop(name, None)
+
+        for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
+            arg.arg = local_names.get(arg.arg, arg.arg)
+        for extra in (node.args.vararg, node.args.kwarg):
+            if extra is not None:
+                extra.arg = local_names.get(extra.arg, extra.arg)
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and child.id in local_names:
+                child.id = local_names[child.id]
+
+        self.generic_visit(node)
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+def _strip_docstrings(tree: ast.AST) -> None:
+    """Supprime les docstrings des modules, classes et fonctions."""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if (body and isinstance(body[0], ast.Expr)
+                    and isinstance(body[0].value, ast.Constant)
+                    and isinstance(body[0].value.value, str)):
+                node.body = body[1:] or [ast.Pass()]
+
+
+def _normalize_tokens(code: str) -> str:
+    """Normalise un code non analysable : jetons sans commentaires ni mise en forme."""
+    ignored = (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE,
+               tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER)
+    parts = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type not in ignored:
+                parts.append(tok.string)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Code incomplet : conserver les jetons lus jusqu'à l'erreur
+        if not parts:
+            return " ".join(code.split())
+    return " ".join(parts)
+
+
+def code_fingerprint(code: str, rename_locals: bool = EVALUATION_CACHE_RENAME) -> str:
+    """
+    Calcule l'empreinte normalisée d'un code Python.
+
+    Deux codes qui ne diffèrent que par les espaces, les commentaires, les docstrings
+    (et, si `rename_locals` est vrai, le nom des variables locales des fonctions) ont la
+    même empreinte.
+
+    Args:
+        code: Le code Python
+        rename_locals: Si True, renomme les paramètres et variables locales des fonctions
+
+    Returns:
+        L'empreinte SHA-256 hexadécimale du code normalisé
+    """
+    try:
+        tree = ast.parse(code)
+        _strip_docstrings(tree)
+        if rename_locals:
+            tree = _LocalRenamer().visit(tree)
+        normalized = "ast:" + ast.dump(tree, annotate_fields=False, include_attributes=False)
+    except (SyntaxError, ValueError):
+        normalized = "tokens:" + _normalize_tokens(code)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def statement_hash(enonce: str) -> str:
+    """Calcule l'empreinte d'un énoncé (espaces normalisés)."""
+    return hashlib.sha256(" ".join((enonce or "").split()).encode("utf-8")).hexdigest()
+
+
+class EvaluationCache:
+    """
+    Cache LRU des évaluations, avec durée de vie et statistiques.
+
+    Args:
+        max_entries: Nombre maximum d'évaluations conservées
+        ttl: Durée de vie d'une évaluation en secondes
+    """
+
+    def __init__(self, max_entries: int = EVALUATION_CACHE_SIZE, ttl: float = EVALUATION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(code: str, enonce: str, provider_name: str = "", model: str = "") -> str:
+        """
+        Construit la clé d'une soumission à partir du code et de l'énoncé.
+
+        Le fournisseur et le modèle font partie de la clé : changer de fournisseur ne
+        ressert pas une évaluation produite par un autre modèle.
+        """
+        return f"{provider_name}:{model}:{statement_hash(enonce)}:{code_fingerprint(code or '')}"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Retourne l'évaluation enregistrée pour une clé, ou None.
+
+        Args:
+            key: La clé de la soumission (voir `make_key`)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        EVALUATION_CACHE_REQUESTS.inc(result="miss" if entry is None else "hit")
+        return None if entry is None else entry[0]
+
+    def put(self, key: str, evaluation: str) -> None:
+        """Enregistre l'évaluation d'une soumission."""
+        with self._lock:
+            self._entries[key] = (evaluation, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """Retourne le nombre d'entrées, de succès, d'échecs et le taux de succès."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+# Cache partagé par les routes du processus
+evaluation_cache = EvaluationCache()
@@ -0,0 +1,180 @@
+"""
+Module du catalogue indexé des exercices.
+
+exercices/data.json est organisé en listes imbriquées (niveau scolaire, puis thèmes,
+puis niveaux de difficulté) qu'il fallait parcourir à chaque recherche. Le catalogue
+est construit une seule fois par version des données et fournit :
+- un index (niveau, thème, difficulté) pour trouver un exercice en temps constant,
+- la liste précalculée des thèmes de chaque niveau scolaire,
+- un index inversé des mots-clés des descriptions.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+CatalogKey = Tuple[str, str, int]
+
+# Mots trop courts ou trop fréquents pour être utiles dans l'index des mots-clés
+MIN_KEYWORD_LENGTH = 3
+STOP_WORDS = {
+    "les", "des", "une", "est", "dans", "pour", "par", "sur", "avec", "qui", "que",
+    "aux", "ses", "son", "sa", "leur", "leurs", "puis", "ecrire", "code", "programme",
+}
+
+
+class CatalogEntry(NamedTuple):
+    """Exercice du catalogue."""
+    niveau: str
+    theme: str
+    difficulte: int
+    description: str
+    debutant: bool
+
+    @property
+    def key(self) -> CatalogKey:
+        return (self.niveau, self.theme, self.difficulte)
+
+
+def normalize_keyword(word: str) -> str:
+    """Met un mot en minuscules et retire ses accents ("Écrire" -> "ecrire")."""
+    decomposed = unicodedata.normalize("NFKD", word.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def extract_keywords(text: str) -> Set[str]:
+    """
+    Extrait les mots-clés d'un texte.
+
+    Args:
+        text: Le texte (description ou recherche)
+
+    Returns:
+        L'ensemble des mots normalisés, sans les mots courts ni les mots vides
+    """
+    keywords = set()
+    for word in re.findall(r"\w+", text or ""):
+        keyword = normalize_keyword(word)
+        if len(keyword) >= MIN_KEYWORD_LENGTH and keyword not in STOP_WORDS and not keyword.isdigit():
+            keywords.add(keyword)
+    return keywords
+
+
+class ExerciseCatalog:
+    """
+    Catalogue en mémoire des exercices, indexé à partir des données de data.json.
+
+    Les données ne doivent pas être modifiées après la construction du catalogue : toute
+    modification du fichier donne lieu à un nouveau catalogue.
+
+    Args:
+        data: Les données des exercices ({niveau: [{"thème", "niveaux": [...]}]})
+        version: Numéro de version des données
+        digest: Empreinte du contenu des données (identique dans tous les workers)
+    """
+
+    def __init__(self, data: Dict[str, Any], version: int = 0, digest: str = ''):
+        self.data = data
+        self.version = version
+        self.digest = digest
+        self._entries: Dict[CatalogKey, CatalogEntry] = {}
+        self._themes: Dict[str, List[str]] = {}
+        self._difficulties: Dict[Tuple[str, str], List[int]] = {}
+        self._keywords: Dict[str, List[CatalogKey]] = defaultdict(list)
+
+        for niveau, themes in (data or {}).items():
+            self._themes[niveau] = []
+            for theme_data in themes or []:
+                theme = theme_data.get('thème', '')
+                if (niveau, theme) not in self._difficulties:
+                    self._themes[niveau].append(theme)
+                difficulties = self._difficulties.setdefault((niveau, theme), [])
+                for niveau_data in theme_data.get('niveaux', []):
+                    try:
+                        difficulte = int(niveau_data.get('niveau', 0))
+                    except (TypeError, ValueError):
+                        continue
+                    entry = CatalogEntry(niveau, theme, difficulte,
+                                         niveau_data.get('description', ''),
+                                         bool(niveau_data.get('debutant', False)))
+                    # En cas de doublon, la première entrée l'emporte (comme l'ancien parcours)
+                    if entry.key in self._entries:
+                        continue
+                    self._entries[entry.key] = entry
+                    difficulties.append(difficulte)
+                    for keyword in extract_keywords(f"{theme} {entry.description}"):
+                        self._keywords[keyword].append(entry.key)
+                difficulties.sort()
+        self._keywords = dict(self._keywords)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: CatalogKey) -> bool:
+        return key in self._entries
+
+    def get(self, niveau: str, theme: str, difficulte: Any) -> Optional[CatalogEntry]:
+        """
+        Retourne un exercice du catalogue.
+
+        Args:
+            niveau: Niveau scolaire
+            theme: Thème de l'exercice
+            difficulte: Niveau de difficulté (entier ou chaîne numérique)
+
+        Returns:
+            L'exercice, ou None s'il n'existe pas
+        """
+        try:
+            difficulte = int(difficulte)
+        except (TypeError, ValueError):
+            return None
+        return self._entries.get((niveau, theme, difficulte))
+
+    def niveaux(self) -> List[str]:
+        """Retourne les niveaux scolaires, dans l'ordre du fichier."""
+        return list(self._themes)
+
+    def has_niveau(self, niveau: str) -> bool:
+        return niveau in self._themes
+
+    def themes(self, niveau: str) -> List[str]:
+        """Retourne les thèmes d'un niveau scolaire, dans l'ordre du fichier."""
+        return self._themes.get(niveau, [])
+
+    def has_theme(self, niveau: str, theme: str) -> bool:
+        return (niveau, theme) in self._difficulties
+
+    def difficulties(self, niveau: str, theme: str) -> List[int]:
+        """Retourne les niveaux de difficulté d'un thème, par ordre croissant."""
+        return self._difficulties.get((niveau, theme), [])
+
+    def entries(self, niveau: Optional[str] = None) -> Iterator[CatalogEntry]:
+        """Parcourt les exercices du catalogue (ou ceux d'un niveau scolaire)."""
+        niveaux = [niveau] if niveau is not None else self.niveaux()
+        for current in niveaux:
+            for theme in self.themes(current):
+                for difficulte in self.difficulties(current, theme):
+                    yield self._entries[(current, theme, difficulte)]
+
+    def search(self, query: str, niveau: Optional[str] = None) -> List[CatalogEntry]:
+        """
+        Recherche les exercices dont le thème ou la description contient tous les mots-clés.
+
+        Args:
+            query: Les mots recherchés (casse et accents ignorés)
+            niveau: Limite la recherche à un niveau scolaire
+
+        Returns:
+            Les exercices correspondants, dans l'ordre du catalogue
+        """
+        keywords = extract_keywords(query)
+        if not keywords:
+            return []
+        postings = sorted((self._keywords.get(keyword, []) for keyword in keywords), key=len)
+        keys = set(postings[0])
+        for posting in postings[1:]:
+            keys.intersection_update(posting)
+        return [self._entries[key] for key in postings[0]
+                if key in keys and (niveau is None or key[0] == niveau)]
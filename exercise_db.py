@@ -0,0 +1,407 @@
+"""
+Module du catalogue des exercices stocké en base SQLite.
+
+Avec EXERCISE_BACKEND=sqlite, les niveaux scolaires, thèmes et exercices sont stockés
+dans des tables indexées (voir models.py) au lieu de exercices/data.json. Une
+modification de l'éditeur devient une mise à jour d'une seule ligne, et la lecture du
+catalogue ne reconstruit les données que lorsque le numéro de version de la base change.
+
+Le magasin offre la même interface que exercise_store.ExerciseStore, et l'import ou
+l'export au format de data.json permet de passer d'un stockage à l'autre :
+    flask catalog-import exercices/data.json
+    flask catalog-export exercices/data.json
+"""
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import create_engine, delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+import jsonio
+from models import db, CatalogueNiveau, CatalogueTheme, CatalogueExercice, CatalogueVersion
+from exercise_store import (CatalogError, VersionConflictError, atomic_write, changed_niveaux,
+                            record_history, validate_niveau)
+from json_patch import JsonPatchError, apply_patch
+
+logger = logging.getLogger(__name__)
+
+# Base de données du catalogue (par défaut celle de l'application)
+EXERCISE_DB_URL = os.getenv('EXERCISE_DB_URL', 'sqlite:///' + os.path.join('instance', 'ged.db'))
+
+_TABLES = [CatalogueNiveau.__table__, CatalogueTheme.__table__,
+           CatalogueExercice.__table__, CatalogueVersion.__table__]
+
+
+def _disable_pysqlite_begin(dbapi_connection, connection_record) -> None:
+    """Laisse SQLAlchemy émettre BEGIN au lieu de pysqlite (qui le retarde jusqu'à la première écriture)."""
+    dbapi_connection.isolation_level = None
+
+
+def _begin_sqlite(conn) -> None:
+    """Ouvre la transaction, en prenant immédiatement le verrou d'écriture pour un batch()."""
+    conn.exec_driver_sql('BEGIN IMMEDIATE' if conn.get_execution_options().get('sqlite_immediate') else 'BEGIN')
+
+
+class SQLExerciseStore:
+    """
+    Magasin des données des exercices stocké dans des tables SQL.
+
+    Fonctionne sans contexte d'application Flask (threads d'arrière-plan compris) :
+    le magasin utilise son propre moteur SQLAlchemy sur les tables définies dans models.py.
+
+    Args:
+        url: URL SQLAlchemy de la base de données
+    """
+
+    def __init__(self, url: str = EXERCISE_DB_URL):
+        self.url = url
+        self.engine = create_engine(url, connect_args={'timeout': 30} if url.startswith('sqlite') else {})
+        if self.engine.dialect.name == 'sqlite':
+            event.listen(self.engine, 'connect', _disable_pysqlite_begin)
+            event.listen(self.engine, 'begin', _begin_sqlite)
+        db.metadata.create_all(self.engine, tables=_TABLES)
+        self._local = threading.local()
+        self._cache_lock = threading.Lock()
+        self._data: Dict[str, Any] = {}
+        self._data_version: Optional[int] = None
+
+    # Lecture
+
+    @property
+    def version(self) -> int:
+        """Numéro de version du catalogue, incrémenté à chaque modification (de ce processus ou d'un autre)."""
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            # Dans un batch(), la ligne est verrouillée jusqu'à la fin de la transaction
+            return session.scalar(select(CatalogueVersion.version).with_for_update()) or 0
+        return self._read_version()
+
+    def _read_version(self) -> int:
+        """Lit le numéro de version (une requête, sans session ORM)."""
+        with self.engine.connect() as conn:
+            return conn.scalar(select(CatalogueVersion.version)) or 0
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Retourne les données au format de data.json (à ne pas modifier directement).
+
+        Les données ne sont reconstruites que si la version de la base a changé depuis
+        la lecture précédente ; pendant un batch(), les modifications en cours sont incluses.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            session.flush()
+            return self._build(session)
+        version = self._read_version()
+        if version == self._data_version:
+            return self._data
+        with self._cache_lock, Session(self.engine) as session:
+            # Relire la version dans la même session que les données
+            version = session.scalar(select(CatalogueVersion.version)) or 0
+            if version != self._data_version:
+                self._data = self._build(session)
+                self._data_version = version
+            return self._data
+
+    @staticmethod
+    def _build(session: Session) -> Dict[str, Any]:
+        """Reconstruit les données au format de data.json (trois requêtes)."""
+        data: Dict[str, Any] = {}
+        niveaux = {}
+        for niveau in session.scalars(select(CatalogueNiveau).order_by(CatalogueNiveau.position, CatalogueNiveau.id)):
+            niveaux[niveau.id] = data[niveau.nom] = []
+        themes = {}
+        for theme in session.scalars(select(CatalogueTheme).order_by(CatalogueTheme.position, CatalogueTheme.id)):
+            themes[theme.id] = {'thème': theme.nom, 'niveaux': []}
+            niveaux[theme.niveau_id].append(themes[theme.id])
+        for exercice in session.scalars(select(CatalogueExercice).order_by(CatalogueExercice.position, CatalogueExercice.id)):
+            themes[exercice.theme_id]['niveaux'].append({
+                'niveau': exercice.niveau,
+                'description': exercice.description,
+                'debutant': exercice.debutant
+            })
+        return data
+
+    # Écriture
+
+    @contextmanager
+    def batch(self) -> Iterator["SQLExerciseStore"]:
+        """
+        Regroupe plusieurs modifications dans une seule transaction.
+
+        La transaction prend le verrou d'écriture dès son ouverture (BEGIN IMMEDIATE sous
+        SQLite) : le numéro de version lu dans le bloc ne peut pas changer avant la fin
+        du bloc. Si une exception est levée, aucune des modifications n'est enregistrée.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            yield self
+            return
+        with self.engine.connect() as conn, \
+                Session(conn.execution_options(sqlite_immediate=True)) as session:
+            self._local.session = session
+            try:
+                with session.begin():
+                    yield self
+                    old_version = session.scalar(select(CatalogueVersion.version)) or 0
+                    self._bump_version(session)
+                    new_data = self._build(session)
+            finally:
+                self._local.session = None
+        old_data = self._data if self._data_version == old_version else None
+        with self._cache_lock:
+            if self._data_version is None or self._data_version < old_version + 1:
+                self._data, self._data_version = new_data, old_version + 1
+        record_history(old_version, old_version + 1, old_data, new_data)
+
+    @staticmethod
+    def _bump_version(session: Session) -> None:
+        if session.execute(update(CatalogueVersion).values(version=CatalogueVersion.version + 1)).rowcount == 0:
+            session.add(CatalogueVersion(version=1))
+
+    def _session(self) -> Session:
+        return self._local.session
+
+    def _get_niveau(self, niveau: str, message: str = 'Ce niveau scolaire n\'existe pas') -> CatalogueNiveau:
+        row = self._session().scalar(select(CatalogueNiveau).where(CatalogueNiveau.nom == niveau))
+        if row is None:
+            raise CatalogError(message)
+        return row
+
+    def _get_theme(self, niveau: str, theme: str) -> CatalogueTheme:
+        row = self._session().scalar(
+            select(CatalogueTheme).join(CatalogueNiveau)
+            .where(CatalogueNiveau.nom == niveau, CatalogueTheme.nom == theme))
+        if row is None:
+            self._get_niveau(niveau)
+            raise CatalogError('Ce thème n\'existe pas pour ce niveau scolaire')
+        return row
+
+    @staticmethod
+    def _next_position(session: Session, column, *criteria) -> int:
+        """Position qui suit la plus grande position des lignes sélectionnées (0 s'il n'y en a pas)."""
+        last = session.scalar(select(func.max(column)).where(*criteria))
+        return 0 if last is None else last + 1
+
+    def _write_themes(self, niveau_row: CatalogueNiveau, themes: List[Dict[str, Any]]) -> None:
+        """Enregistre les thèmes et exercices d'un niveau (les lignes existantes doivent être supprimées)."""
+        session = self._session()
+        niveau = niveau_row.nom
+        seen_themes = set()
+        for theme_position, theme_data in enumerate(themes):
+            nom = theme_data.get('thème', '')
+            if nom in seen_themes:
+                logger.warning(f"Thème en double ignoré: {niveau} / {nom}")
+                continue
+            seen_themes.add(nom)
+            theme_row = CatalogueTheme(niveau_id=niveau_row.id, nom=nom, position=theme_position)
+            session.add(theme_row)
+            session.flush()
+            seen_exercices = set()
+            for position, exercice in enumerate(theme_data.get('niveaux', [])):
+                try:
+                    difficulte = int(exercice.get('niveau', 0))
+                except (TypeError, ValueError):
+                    raise CatalogError(f'Niveau de difficulté invalide dans {niveau} / {nom}')
+                if difficulte in seen_exercices:
+                    logger.warning(f"Exercice en double ignoré: {niveau} / {nom} / {difficulte}")
+                    continue
+                seen_exercices.add(difficulte)
+                session.add(CatalogueExercice(
+                    theme_id=theme_row.id, niveau=difficulte, position=position,
+                    description=exercice.get('description', ''),
+                    debutant=bool(exercice.get('debutant', False))))
+
+    def _delete_themes(self, niveau_ids: List[int]) -> None:
+        """Supprime les thèmes et exercices des niveaux donnés."""
+        session = self._session()
+        theme_ids = select(CatalogueTheme.id).where(CatalogueTheme.niveau_id.in_(niveau_ids))
+        session.execute(delete(CatalogueExercice).where(CatalogueExercice.theme_id.in_(theme_ids)))
+        session.execute(delete(CatalogueTheme).where(CatalogueTheme.niveau_id.in_(niveau_ids)))
+
+    def replace(self, data: Dict[str, Any]) -> None:
+        """
+        Remplace toutes les données des exercices (import au format de data.json).
+
+        Raises:
+            CatalogError: Si les données n'ont pas la bonne structure
+        """
+        if not isinstance(data, dict):
+            raise CatalogError('Format de données invalide')
+        for niveau, themes in data.items():
+            validate_niveau(niveau, themes)
+        with self.batch():
+            session = self._session()
+            session.execute(delete(CatalogueExercice))
+            session.execute(delete(CatalogueTheme))
+            session.execute(delete(CatalogueNiveau))
+            for position, (niveau, themes) in enumerate(data.items()):
+                niveau_row = CatalogueNiveau(nom=niveau, position=position)
+                session.add(niveau_row)
+                session.flush()
+                self._write_themes(niveau_row, themes)
+
+    def rollback(self, version: int, base_version: Optional[int] = None) -> None:
+        """
+        Ramène les données à une version antérieure (enregistrée comme une nouvelle version).
+
+        Raises:
+            HistoryError: Si la version n'est pas dans l'historique
+            VersionConflictError: Si les données ont changé depuis base_version
+        """
+        from catalog_history import catalog_history
+        data = catalog_history.rebuild(version)
+        with self.batch():
+            if base_version is not None and base_version != self.version:
+                raise VersionConflictError(base_version, self.version)
+            self.replace(data)
+
+    def apply_patch(self, operations: List[Dict[str, Any]], base_version: Optional[int] = None) -> None:
+        """
+        Applique une liste d'opérations JSON Patch (RFC 6902) aux données, toutes ou aucune.
+
+        Seules les lignes des niveaux scolaires touchés par le patch sont réécrites.
+
+        Args:
+            operations: Les opérations ({"op", "path", "value"...})
+            base_version: Version des données sur laquelle le patch a été construit
+
+        Raises:
+            VersionConflictError: Si les données ont changé depuis base_version
+            CatalogError: Si le patch ne s'applique pas ou produit des données invalides
+        """
+        with self.batch():
+            session = self._session()
+            if base_version is not None and base_version != self.version:
+                raise VersionConflictError(base_version, self.version)
+            current = self.load()
+            try:
+                data = apply_patch(current, operations)
+            except JsonPatchError as e:
+                raise CatalogError(str(e))
+            if not isinstance(data, dict):
+                raise CatalogError('Format de données invalide')
+            changed = changed_niveaux(current, data)
+            for niveau in changed:
+                validate_niveau(niveau, data[niveau])
+
+            rows = {row.nom: row for row in session.scalars(select(CatalogueNiveau))}
+            removed = [rows.pop(niveau) for niveau in list(rows) if niveau not in data]
+            if removed:
+                self._delete_themes([row.id for row in removed])
+                session.execute(delete(CatalogueNiveau).where(CatalogueNiveau.id.in_([row.id for row in removed])))
+            self._delete_themes([rows[niveau].id for niveau in changed if niveau in rows])
+            for position, niveau in enumerate(data):
+                row = rows.get(niveau)
+                if row is None:
+                    row = rows[niveau] = CatalogueNiveau(nom=niveau, position=position)
+                    session.add(row)
+                    session.flush()
+                row.position = position
+                if niveau in changed:
+                    self._write_themes(row, data[niveau])
+
+    def add_niveau(self, niveau: str) -> None:
+        """
+        Ajoute un niveau scolaire vide.
+
+        Raises:
+            CatalogError: Si le niveau existe déjà
+        """
+        with self.batch():
+            session = self._session()
+            if session.scalar(select(CatalogueNiveau.id).where(CatalogueNiveau.nom == niveau)) is not None:
+                raise CatalogError('Ce niveau existe déjà')
+            session.add(CatalogueNiveau(nom=niveau, position=self._next_position(session, CatalogueNiveau.position)))
+
+    def add_theme(self, niveau: str, theme: str) -> None:
+        """
+        Ajoute un thème vide à un niveau scolaire.
+
+        Raises:
+            CatalogError: Si le niveau n'existe pas ou si le thème existe déjà
+        """
+        with self.batch():
+            session = self._session()
+            niveau_row = self._get_niveau(niveau, 'Ce niveau n\'existe pas')
+            if session.scalar(select(CatalogueTheme.id).where(
+                    CatalogueTheme.niveau_id == niveau_row.id, CatalogueTheme.nom == theme)) is not None:
+                raise CatalogError('Ce thème existe déjà pour ce niveau')
+            position = self._next_position(session, CatalogueTheme.position, CatalogueTheme.niveau_id == niveau_row.id)
+            session.add(CatalogueTheme(niveau_id=niveau_row.id, nom=theme, position=position))
+
+    def add_exercice(self, niveau: str, theme: str, difficulte: int, description: str,
+                     debutant: bool = False) -> None:
+        """
+        Ajoute un exercice à un thème (les exercices restent triés par difficulté).
+
+        Raises:
+            CatalogError: Si le niveau ou le thème n'existe pas, ou si la difficulté est déjà prise
+        """
+        with self.batch():
+            session = self._session()
+            theme_row = self._get_theme(niveau, theme)
+            if session.scalar(select(CatalogueExercice.id).where(
+                    CatalogueExercice.theme_id == theme_row.id, CatalogueExercice.niveau == difficulte)) is not None:
+                raise CatalogError('Ce niveau de difficulté existe déjà pour ce thème')
+            # La position suit la difficulté, comme le tri de la version JSON
+            session.execute(update(CatalogueExercice)
+                            .where(CatalogueExercice.theme_id == theme_row.id, CatalogueExercice.niveau > difficulte)
+                            .values(position=CatalogueExercice.position + 1))
+            position = self._next_position(session, CatalogueExercice.position,
+                                           CatalogueExercice.theme_id == theme_row.id,
+                                           CatalogueExercice.niveau < difficulte)
+            session.add(CatalogueExercice(theme_id=theme_row.id, niveau=difficulte, position=position,
+                                          description=description, debutant=bool(debutant)))
+
+    def update_exercice(self, niveau: str, theme: str, difficulte: int, description: str,
+                        debutant: Optional[bool] = None) -> None:
+        """
+        Met à jour la description (et éventuellement le statut débutant) d'un exercice.
+
+        Raises:
+            CatalogError: Si le niveau, le thème ou l'exercice n'existe pas
+        """
+        with self.batch():
+            theme_row = self._get_theme(niveau, theme)
+            values = {'description': description}
+            if debutant is not None:
+                values['debutant'] = bool(debutant)
+            result = self._session().execute(
+                update(CatalogueExercice)
+                .where(CatalogueExercice.theme_id == theme_row.id, CatalogueExercice.niveau == difficulte)
+                .values(**values))
+            if result.rowcount == 0:
+                raise CatalogError('Cet exercice n\'existe pas pour ce thème')
+
+    # Import / export
+
+    def import_json(self, path: str) -> int:
+        """
+        Importe un fichier au format de data.json (remplace le catalogue).
+
+        Returns:
+            Le nombre d'exercices importés
+        """
+        data = jsonio.load(path)
+        self.replace(data)
+        with Session(self.engine) as session:
+            return session.scalar(select(func.count(CatalogueExercice.id)))
+
+    def export_json(self, path: str) -> int:
+        """
+        Exporte le catalogue au format de data.json (écriture atomique).
+
+        Le fichier est indenté comme ceux écrits par l'éditeur : les données sont
+        identiques à celles importées, pas forcément la mise en forme.
+
+        Returns:
+            Le nombre d'exercices exportés
+        """
+        data = self.load()
+        atomic_write(path, jsonio.dumps(data))
+        return sum(len(t.get('niveaux', [])) for themes in data.values() for t in themes)
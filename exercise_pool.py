@@ -0,0 +1,324 @@
+"""
+Module de réserve d'énoncés d'exercices pré-générés.
+
+Les combinaisons (niveau, thème, niveau de difficulté) de exercices/data.json sont
+connues à l'avance. Un thread d'arrière-plan maintient pour chacune une réserve de N
+énoncés déjà générés, pendant les heures creuses ou avec un fournisseur local, afin que
+/generate-exercise puisse répondre immédiatement sans attendre l'IA.
+
+Les énoncés sont rangés par condensat du prompt de génération : modifier la description
+d'un exercice (ou les consignes du prompt) change la clé, et les énoncés devenus
+obsolètes ne sont plus servis puis sont supprimés au remplissage suivant.
+
+Lorsque fcntl est disponible (Linux, macOS), la réserve est un répertoire de fichiers
+partagé par tous les processus de la machine (workers gunicorn), protégé par un verrou
+fichier, et un seul processus à la fois la remplit. Sans fcntl (Windows), chaque
+processus garde sa propre réserve en mémoire.
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows : réserve propre à chaque processus
+    fcntl = None
+
+import jsonio
+from ai_providers import get_ai_provider, is_error_response
+from ai_metrics import call_site
+from prompts import get_exercise_prompt
+from utils import get_exercise_catalog
+
+logger = logging.getLogger(__name__)
+
+# Paramètres de la réserve (valeurs de .env si disponibles)
+EXERCISE_POOL_SIZE = int(os.getenv("EXERCISE_POOL_SIZE", 0))  # 0 désactive la réserve
+EXERCISE_POOL_PROVIDER = os.getenv("EXERCISE_POOL_PROVIDER", "localai")
+# Heures de remplissage "début-fin" (ex: "22-6"), vide pour remplir à toute heure
+EXERCISE_POOL_HOURS = os.getenv("EXERCISE_POOL_HOURS", "" if EXERCISE_POOL_PROVIDER == "localai" else "0-6")
+EXERCISE_POOL_INTERVAL = float(os.getenv("EXERCISE_POOL_INTERVAL", 300))
+EXERCISE_POOL_PAUSE = float(os.getenv("EXERCISE_POOL_PAUSE", 1))
+EXERCISE_POOL_DIR = os.getenv(
+    "EXERCISE_POOL_DIR", os.path.join(tempfile.gettempdir(), "pyteurcol-exercise-pool"))
+
+PoolKey = Tuple[str, str, int]
+
+_FILLER_LOCK = "filler.lock"
+_STORE_LOCK = "pool.lock"
+
+
+def pool_key(prompt: str) -> str:
+    """Retourne la clé de réserve d'un prompt de génération (condensat SHA-256 hexadécimal)."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def parse_hours(hours: str) -> Optional[Tuple[int, int]]:
+    """
+    Convertit une plage horaire "début-fin" en tuple d'heures.
+
+    Args:
+        hours: Plage horaire (ex: "22-6"), vide pour toute la journée
+
+    Returns:
+        Un tuple (début, fin) ou None pour toute la journée
+    """
+    if not hours or not hours.strip():
+        return None
+    start, end = hours.split("-", 1)
+    return int(start) % 24, int(end) % 24
+
+
+def in_hours(window: Optional[Tuple[int, int]], hour: int) -> bool:
+    """Indique si une heure appartient à une plage (éventuellement à cheval sur minuit)."""
+    if window is None:
+        return True
+    start, end = window
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+class ExercisePool:
+    """
+    Réserve d'énoncés pré-générés par entrée du catalogue.
+
+    Args:
+        size: Nombre d'énoncés à garder prêts pour chaque entrée
+        provider_name: Fournisseur d'IA utilisé pour le remplissage
+        hours: Plage horaire de remplissage ("début-fin", vide pour toute la journée)
+        shared_dir: Répertoire de la réserve partagée entre processus
+            (None pour une réserve en mémoire propre au processus courant)
+    """
+
+    def __init__(self, size: int = EXERCISE_POOL_SIZE, provider_name: str = EXERCISE_POOL_PROVIDER,
+                 hours: str = EXERCISE_POOL_HOURS, shared_dir: Optional[str] = EXERCISE_POOL_DIR):
+        self.size = size
+        self.provider_name = provider_name
+        self.window = parse_hours(hours)
+        self.shared_dir = shared_dir if fcntl is not None else None
+        self._pools: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._filler_file = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Verrouille la réserve entre threads et, si elle est partagée, entre processus."""
+        with self._lock:
+            if not self.shared_dir:
+                yield
+                return
+            os.makedirs(self.shared_dir, exist_ok=True)
+            with open(os.path.join(self.shared_dir, _STORE_LOCK), "a+") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.shared_dir, f"{key}.json")
+
+    def _load(self, key: str) -> List[str]:
+        """Lit les énoncés prêts d'une entrée (à appeler sous `_locked`)."""
+        if not self.shared_dir:
+            return self._pools.get(key, [])
+        try:
+            return jsonio.load(self._path(key))
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Réserve illisible pour {key}, entrée vidée: {e}")
+            return []
+
+    def _save(self, key: str, enonces: List[str]) -> None:
+        """Remplace les énoncés prêts d'une entrée (à appeler sous `_locked`)."""
+        if not self.shared_dir:
+            self._pools[key] = enonces
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(jsonio.dumps(enonces, compact=True))
+        os.replace(tmp_path, path)
+
+    def _keys(self) -> List[str]:
+        """Retourne les clés des entrées présentes dans la réserve (à appeler sous `_locked`)."""
+        if not self.shared_dir:
+            return list(self._pools)
+        return [name[:-len(".json")] for name in os.listdir(self.shared_dir) if name.endswith(".json")]
+
+    def _remove(self, key: str) -> None:
+        """Supprime une entrée de la réserve (à appeler sous `_locked`)."""
+        if not self.shared_dir:
+            self._pools.pop(key, None)
+            return
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def count(self, key: str) -> int:
+        """Retourne le nombre d'énoncés prêts pour une clé de réserve."""
+        with self._locked():
+            return len(self._load(key))
+
+    def pop(self, niveau: str, theme: str, difficulte: int, description: str,
+            debutant: bool = False) -> Optional[str]:
+        """
+        Retire un énoncé prêt pour une entrée du catalogue.
+
+        Args:
+            niveau: Niveau scolaire
+            theme: Thème de l'exercice
+            difficulte: Niveau de difficulté
+            description: Description actuelle de l'exercice
+            debutant: Si True, l'exercice est pour débutant
+
+        Returns:
+            Un énoncé pré-généré à partir de la description actuelle, ou None si la
+            réserve est vide
+        """
+        enonce = None
+        try:
+            key = pool_key(get_exercise_prompt(niveau, theme, int(difficulte), description, debutant))
+            with self._locked():
+                enonces = self._load(key)
+                if enonces:
+                    enonce = enonces.pop(0)
+                    self._save(key, enonces)
+        except (TypeError, ValueError):
+            pass
+        except OSError as e:
+            logger.warning(f"Réserve d'exercices indisponible: {e}")
+        if enonce is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return enonce
+
+    def push(self, key: str, enonce: str) -> None:
+        """Ajoute un énoncé généré à la réserve d'une clé."""
+        with self._locked():
+            self._save(key, self._load(key) + [enonce])
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne l'état de la réserve (énoncés prêts, entrées, et succès et échecs du processus)."""
+        with self._locked():
+            keys = self._keys()
+            ready = sum(len(self._load(key)) for key in keys)
+        return {"ready": ready, "entries": len(keys), "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def catalog_entries() -> Iterator[Tuple[PoolKey, str, bool]]:
+        """Parcourt les entrées du catalogue : ((niveau, thème, difficulté), description, débutant)."""
+        for entry in get_exercise_catalog().entries():
+            yield entry.key, entry.description, entry.debutant
+
+    def fill_once(self) -> int:
+        """
+        Complète une fois chaque entrée du catalogue jusqu'à la taille cible.
+
+        Returns:
+            Le nombre d'énoncés générés
+        """
+        provider = get_ai_provider(self.provider_name)
+        prompts = {}
+        for entry_key, description, debutant in self.catalog_entries():
+            prompt = get_exercise_prompt(entry_key[0], entry_key[1], entry_key[2], description, debutant)
+            prompts[pool_key(prompt)] = (entry_key, prompt)
+
+        # Supprimer les énoncés d'entrées disparues ou dont la description a changé
+        with self._locked():
+            stale = [key for key in self._keys() if key not in prompts]
+            for key in stale:
+                self._remove(key)
+        if stale:
+            logger.info(f"Réserve d'exercices : {len(stale)} entrée(s) obsolète(s) supprimée(s)")
+
+        generated = 0
+        for key, (entry_key, prompt) in prompts.items():
+            while self.count(key) < self.size:
+                if self._stop.is_set() or not in_hours(self.window, datetime.now().hour):
+                    return generated
+                with call_site('exercise_pool'):
+                    enonce = provider.generate_text(prompt)
+                if is_error_response(enonce):
+                    logger.warning(f"Échec du remplissage de la réserve pour {entry_key}")
+                    return generated
+                self.push(key, enonce)
+                generated += 1
+                self._stop.wait(EXERCISE_POOL_PAUSE)
+        return generated
+
+    def _become_filler(self) -> bool:
+        """
+        Tente de devenir le processus qui remplit la réserve partagée.
+
+        Le verrou est conservé jusqu'à la fin du processus : un autre worker ne prend le
+        relais que si celui-ci s'arrête.
+        """
+        if not self.shared_dir or self._filler_file is not None:
+            return True
+        try:
+            os.makedirs(self.shared_dir, exist_ok=True)
+            filler_file = open(os.path.join(self.shared_dir, _FILLER_LOCK), "a+")
+        except OSError as e:
+            logger.warning(f"Réserve d'exercices indisponible ({self.shared_dir}): {e}")
+            return False
+        try:
+            fcntl.flock(filler_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            filler_file.close()
+            return False
+        self._filler_file = filler_file
+        logger.info(f"Réserve d'exercices : remplissage assuré par le processus {os.getpid()}")
+        return True
+
+    def _run(self) -> None:
+        """Boucle du thread de remplissage."""
+        while not self._stop.is_set():
+            if in_hours(self.window, datetime.now().hour) and self._become_filler():
+                try:
+                    generated = self.fill_once()
+                    if generated:
+                        logger.info(f"Réserve d'exercices : {generated} énoncé(s) générés, {self.stats()}")
+                except Exception as e:
+                    logger.error(f"Erreur lors du remplissage de la réserve d'exercices: {e}")
+            self._stop.wait(EXERCISE_POOL_INTERVAL)
+
+    def start(self) -> bool:
+        """
+        Démarre le thread de remplissage si la réserve est activée.
+
+        Returns:
+            True si le thread a été démarré
+        """
+        if self.size <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="exercise-pool", daemon=True)
+        self._thread.start()
+        logger.info(f"Réserve d'exercices démarrée (taille={self.size}, fournisseur={self.provider_name})")
+        return True
+
+    def stop(self) -> None:
+        """Arrête le thread de remplissage et laisse le remplissage à un autre processus."""
+        self._stop.set()
+        if self._filler_file is not None:
+            self._filler_file.close()
+            self._filler_file = None
+
+
+# Réserve partagée par les routes du processus
+exercise_pool = ExercisePool()
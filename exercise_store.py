@@ -0,0 +1,456 @@
+"""
+Module d'écriture des données des exercices (exercices/data.json).
+
+Les modifications de l'éditeur passent par un magasin unique qui :
+- travaille sur le modèle en mémoire partagé avec le cache de lecture (utils),
+  en copiant uniquement les parties modifiées (les lecteurs ne voient jamais un
+  état intermédiaire),
+- verrouille le fichier pendant toute la modification, entre threads et entre workers,
+- écrit dans un fichier temporaire, le synchronise sur disque (fsync) puis le renomme
+  de façon atomique : un arrêt brutal laisse l'ancienne ou la nouvelle version, jamais
+  un fichier tronqué,
+- peut regrouper plusieurs modifications en une seule écriture (batch()),
+- publie un numéro de version que les lecteurs utilisent pour valider leurs caches.
+"""
+
+import os
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import jsonio
+import utils
+from json_patch import JsonPatchError, apply_patch
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogError(ValueError):
+    """Exception levée quand une modification du catalogue est invalide (niveau inconnu, doublon...)."""
+
+
+class VersionConflictError(CatalogError):
+    """Exception levée quand une modification porte sur une version du catalogue qui n'est plus la dernière."""
+
+    def __init__(self, base_version: int, current_version: int):
+        self.base_version = base_version
+        self.current_version = current_version
+        super().__init__(
+            f"Le catalogue a été modifié entre-temps (version {base_version}, "
+            f"version actuelle {current_version}). Rechargez la page avant de recommencer."
+        )
+
+
+def validate_niveau(niveau: str, themes: Any) -> None:
+    """
+    Vérifie la structure des thèmes d'un niveau scolaire.
+
+    Raises:
+        CatalogError: Si un thème ou un exercice n'a pas le format de data.json
+    """
+    if not isinstance(themes, list) or not all(isinstance(t, dict) for t in themes):
+        raise CatalogError(f'Format de données invalide pour le niveau {niveau}')
+    for theme_data in themes:
+        exercices = theme_data.get('niveaux', [])
+        if not isinstance(theme_data.get('thème'), str) or not isinstance(exercices, list):
+            raise CatalogError(f'Thème invalide pour le niveau {niveau}')
+        for exercice in exercices:
+            if (not isinstance(exercice, dict) or isinstance(exercice.get('niveau'), bool)
+                    or not isinstance(exercice.get('niveau'), int)):
+                raise CatalogError(f'Exercice invalide dans {niveau} / {theme_data.get("thème")}')
+
+
+def changed_niveaux(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """
+    Retourne les niveaux scolaires ajoutés ou modifiés entre deux versions des données.
+
+    Les données étant modifiées par copie sur écriture, un niveau inchangé garde la
+    même liste de thèmes (même identité) : la comparaison ne parcourt pas son contenu.
+    """
+    return [niveau for niveau, themes in new.items() if old.get(niveau) is not themes]
+
+
+class FileLock:
+    """
+    Verrou exclusif sur un fichier, partagé entre les processus (workers) et les threads.
+
+    Args:
+        path: Chemin du fichier de verrou (créé si nécessaire)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a+b')
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+            except Exception:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                self._file.close()
+                self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+def record_history(old_version: int, new_version: int,
+                   old_data: Optional[Dict[str, Any]], new_data: Dict[str, Any]) -> None:
+    """Enregistre une nouvelle version dans l'historique du catalogue (sans jamais faire échouer l'écriture)."""
+    from catalog_history import catalog_history
+    try:
+        catalog_history.record(old_version, new_version, old_data, new_data)
+    except Exception as e:
+        logger.error(f"Impossible d'enregistrer la version {new_version} dans l'historique: {str(e)}")
+
+
+def atomic_write(path: str, content: bytes) -> os.stat_result:
+    """
+    Remplace le contenu d'un fichier de façon atomique.
+
+    Le contenu est écrit dans un fichier temporaire du même répertoire, synchronisé sur
+    disque, puis renommé à la place du fichier d'origine.
+
+    Args:
+        path: Chemin du fichier
+        content: Nouveau contenu
+
+    Returns:
+        Le résultat de stat du fichier écrit
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Synchroniser le répertoire pour que le renommage survive à un arrêt brutal
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+    return st
+
+
+class ExerciseStore:
+    """
+    Magasin des données des exercices avec écriture atomique et verrouillée.
+
+    Args:
+        path: Chemin du fichier des exercices
+    """
+
+    def __init__(self, path: str = utils.EXERCISE_DATA_PATH):
+        self.path = path
+        self.version_path = path + '.version'
+        self._lock = FileLock(path + '.lock')
+        self._pending: Optional[Dict[str, Any]] = None
+        self._batch_depth = 0
+        self._owner: Optional[int] = None
+
+    @property
+    def version(self) -> int:
+        """Numéro de version des données, incrémenté à chaque modification (de ce processus ou d'un autre)."""
+        return utils.exercise_data_version()
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Retourne les données courantes (à ne pas modifier directement).
+
+        Pendant un batch(), les modifications non encore écrites sont incluses.
+        """
+        if self._batch_depth and self._owner == threading.get_ident() and self._pending is not None:
+            return self._pending
+        return utils.load_exercise_data()
+
+    @contextmanager
+    def batch(self) -> Iterator["ExerciseStore"]:
+        """
+        Regroupe plusieurs modifications en une seule écriture.
+
+        Le fichier reste verrouillé pendant tout le bloc. Si une exception est levée,
+        aucune des modifications du bloc n'est écrite.
+        """
+        with self._lock:
+            outer = self._batch_depth == 0
+            if outer:
+                self._pending = None
+                self._owner = threading.get_ident()
+            self._batch_depth += 1
+            try:
+                yield self
+                if outer and self._pending is not None:
+                    self._flush(self._pending)
+            finally:
+                self._batch_depth -= 1
+                if outer:
+                    self._pending = None
+                    self._owner = None
+
+    def _current(self) -> Dict[str, Any]:
+        """Données sur lesquelles appliquer la prochaine modification (fichier verrouillé)."""
+        if self._pending is not None:
+            return self._pending
+        return utils.load_exercise_data()
+
+    def _commit(self, data: Dict[str, Any]) -> None:
+        """Enregistre les nouvelles données, écrites à la sortie du batch le plus externe."""
+        self._pending = data
+
+    def _flush(self, data: Dict[str, Any]) -> int:
+        """Écrit les données dans le fichier et les publie dans le cache de lecture."""
+        content = jsonio.dumps(data)
+        old_version, old_data = self.version, utils.load_exercise_data()
+        version = max(utils.read_persisted_version(self.version_path)[0] or 0, old_version) + 1
+        # La version est écrite avant les données : après un arrêt entre les deux écritures,
+        # l'empreinte enregistrée ne correspond pas au fichier, qui reçoit une nouvelle version.
+        atomic_write(self.version_path, utils.format_persisted_version(version, utils.content_digest(content)))
+        st = atomic_write(self.path, content)
+        utils.publish_exercise_data(data, content, st, version)
+        logger.info(f"Données des exercices enregistrées (version {version})")
+        record_history(old_version, version, old_data, data)
+        return version
+
+    def adopt_external_change(self, last_version: int = 0) -> int:
+        """
+        Attribue un nouveau numéro de version à data.json modifié hors de l'application.
+
+        Appelé par le cache de lecture quand le contenu du fichier ne correspond pas à
+        l'empreinte du fichier de version. Sans nouvelle version, un patch construit sur
+        l'ancien contenu passerait la vérification de base_version.
+
+        Args:
+            last_version: Dernière version connue du cache de lecture
+
+        Returns:
+            Le numéro de version du contenu actuel du fichier
+        """
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                content = f.read()
+                st = os.fstat(f.fileno())
+            data = jsonio.loads(content)
+            digest = utils.content_digest(content)
+            version, persisted_digest = utils.read_persisted_version(self.version_path)
+            if persisted_digest != digest:
+                if version is not None:
+                    logger.warning(f"{self.path} modifié hors de l'application")
+                version = max(version or 0, last_version) + 1
+                atomic_write(self.version_path, utils.format_persisted_version(version, digest))
+                logger.info(f"Données des exercices enregistrées (version {version})")
+            utils.publish_exercise_data(data, content, st, version)
+            return version
+
+    def replace(self, data: Dict[str, Any]) -> None:
+        """
+        Remplace toutes les données des exercices.
+
+        Raises:
+            CatalogError: Si les données n'ont pas la bonne structure
+        """
+        if not isinstance(data, dict):
+            raise CatalogError('Format de données invalide')
+        for niveau, themes in data.items():
+            validate_niveau(niveau, themes)
+        with self.batch():
+            self._commit(data)
+
+    def rollback(self, version: int, base_version: Optional[int] = None) -> None:
+        """
+        Ramène les données à une version antérieure (enregistrée comme une nouvelle version).
+
+        Raises:
+            HistoryError: Si la version n'est pas dans l'historique
+            VersionConflictError: Si les données ont changé depuis base_version
+        """
+        from catalog_history import catalog_history
+        data = catalog_history.rebuild(version)
+        with self.batch():
+            if base_version is not None and base_version != self.version:
+                raise VersionConflictError(base_version, self.version)
+            self.replace(data)
+
+    def apply_patch(self, operations: List[Dict[str, Any]], base_version: Optional[int] = None) -> None:
+        """
+        Applique une liste d'opérations JSON Patch (RFC 6902) aux données, toutes ou aucune.
+
+        Seuls les niveaux scolaires touchés par le patch sont copiés et vérifiés.
+
+        Args:
+            operations: Les opérations ({"op", "path", "value"...})
+            base_version: Version des données sur laquelle le patch a été construit
+
+        Raises:
+            VersionConflictError: Si les données ont changé depuis base_version
+            CatalogError: Si le patch ne s'applique pas ou produit des données invalides
+        """
+        with self.batch():
+            if base_version is not None and base_version != self.version:
+                raise VersionConflictError(base_version, self.version)
+            current = self._current()
+            try:
+                data = apply_patch(current, operations)
+            except JsonPatchError as e:
+                raise CatalogError(str(e))
+            if not isinstance(data, dict):
+                raise CatalogError('Format de données invalide')
+            for niveau in changed_niveaux(current, data):
+                validate_niveau(niveau, data[niveau])
+            self._commit(data)
+
+    def add_niveau(self, niveau: str) -> None:
+        """
+        Ajoute un niveau scolaire vide.
+
+        Raises:
+            CatalogError: Si le niveau existe déjà
+        """
+        with self.batch():
+            data = self._current()
+            if niveau in data:
+                raise CatalogError('Ce niveau existe déjà')
+            data = dict(data)
+            data[niveau] = []
+            self._commit(data)
+
+    def add_theme(self, niveau: str, theme: str) -> None:
+        """
+        Ajoute un thème vide à un niveau scolaire.
+
+        Raises:
+            CatalogError: Si le niveau n'existe pas ou si le thème existe déjà
+        """
+        with self.batch():
+            data = self._current()
+            if niveau not in data:
+                raise CatalogError('Ce niveau n\'existe pas')
+            if any(t.get('thème') == theme for t in data[niveau]):
+                raise CatalogError('Ce thème existe déjà pour ce niveau')
+            data = dict(data)
+            data[niveau] = data[niveau] + [{'thème': theme, 'niveaux': []}]
+            self._commit(data)
+
+    def _edit_theme(self, data: Dict[str, Any], niveau: str, theme: str) -> Dict[str, Any]:
+        """
+        Copie le chemin jusqu'à un thème (niveau, liste des thèmes, thème et ses exercices).
+
+        Returns:
+            Le thème copié, modifiable sans affecter les lecteurs de l'ancienne version
+        """
+        if niveau not in data:
+            raise CatalogError('Ce niveau scolaire n\'existe pas')
+        for index, t in enumerate(data[niveau]):
+            if t.get('thème') == theme:
+                copy = dict(t)
+                copy['niveaux'] = [dict(n) for n in t.get('niveaux', [])]
+                themes = list(data[niveau])
+                themes[index] = copy
+                data[niveau] = themes
+                return copy
+        raise CatalogError('Ce thème n\'existe pas pour ce niveau scolaire')
+
+    def add_exercice(self, niveau: str, theme: str, difficulte: int, description: str,
+                     debutant: bool = False) -> None:
+        """
+        Ajoute un exercice à un thème (les exercices restent triés par difficulté).
+
+        Raises:
+            CatalogError: Si le niveau ou le thème n'existe pas, ou si la difficulté est déjà prise
+        """
+        with self.batch():
+            data = dict(self._current())
+            theme_data = self._edit_theme(data, niveau, theme)
+            if any(n.get('niveau') == difficulte for n in theme_data['niveaux']):
+                raise CatalogError('Ce niveau de difficulté existe déjà pour ce thème')
+            theme_data['niveaux'].append({
+                'niveau': difficulte,
+                'description': description,
+                'debutant': debutant
+            })
+            theme_data['niveaux'].sort(key=lambda x: x.get('niveau', 0))
+            self._commit(data)
+
+    def update_exercice(self, niveau: str, theme: str, difficulte: int, description: str,
+                        debutant: Optional[bool] = None) -> None:
+        """
+        Met à jour la description (et éventuellement le statut débutant) d'un exercice.
+
+        Raises:
+            CatalogError: Si le niveau, le thème ou l'exercice n'existe pas
+        """
+        with self.batch():
+            data = dict(self._current())
+            theme_data = self._edit_theme(data, niveau, theme)
+            for exercice in theme_data['niveaux']:
+                if exercice.get('niveau') == difficulte:
+                    exercice['description'] = description
+                    if debutant is not None:
+                        exercice['debutant'] = debutant
+                    break
+            else:
+                raise CatalogError('Cet exercice n\'existe pas pour ce thème')
+            self._commit(data)
+
+
+def create_exercise_store():
+    """Crée le magasin correspondant au stockage configuré (EXERCISE_BACKEND)."""
+    if utils.EXERCISE_BACKEND == 'sqlite':
+        from exercise_db import SQLExerciseStore
+        return SQLExerciseStore()
+    return ExerciseStore()
+
+
+exercise_store = create_exercise_store()
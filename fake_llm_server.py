@@ -0,0 +1,329 @@
+"""
+Serveur de substitution compatible OpenAI et Gemini pour les tests de charge hors ligne.
+
+Ce script simule les API utilisées par l'application (chat completions au format OpenAI
+pour LocalAI et Mistral, generateContent pour Gemini), streaming compris. La latence, le
+débit de tokens, le taux d'erreur et les rafales de 429 sont paramétrables, et un germe
+aléatoire rend les scénarios reproductibles.
+
+Utilisation :
+    python fake_llm_server.py --port 8090 --latency 0.5 --token-rate 50 --error-rate 0.05
+
+Puis, dans .env :
+    LOCALAI_URL=http://127.0.0.1:8090/v1/chat/completions
+    MISTRAL_URL=http://127.0.0.1:8090/v1/chat/completions
+    GEMINI_BASE_URL=http://127.0.0.1:8090/v1beta/models
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Texte de remplissage des réponses (découpé en tokens d'un mot)
+FILLER_WORDS = (
+    "Cet exercice permet de manipuler les notions vues en cours . Complète les zones "
+    "marquées dans le squelette de code puis vérifie ton résultat avec les exemples ."
+).split()
+
+
+class FakeLLMSettings:
+    """Paramètres de simulation partagés par toutes les requêtes."""
+
+    def __init__(self, args):
+        self.latency = args.latency
+        self.jitter = args.jitter
+        self.token_rate = args.token_rate
+        self.completion_tokens = args.completion_tokens
+        self.error_rate = args.error_rate
+        self.burst_every = args.burst_every
+        self.burst_length = args.burst_length
+        self.retry_after = args.retry_after
+        self.random = random.Random(args.seed)
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    def next_outcome(self):
+        """
+        Détermine le sort de la requête suivante de manière reproductible.
+
+        Returns:
+            Un tuple (code HTTP, latence en secondes)
+        """
+        with self.lock:
+            index = self.request_count
+            self.request_count += 1
+            latency = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            failed = self.random.random() < self.error_rate
+        if self.burst_every and index % self.burst_every < self.burst_length:
+            return 429, 0.0
+        if failed:
+            return 500, latency
+        return 200, latency
+
+
+def build_completion(prompt, max_tokens, settings):
+    """
+    Construit le texte de la réponse simulée.
+
+    Les prompts de QCM reçoivent un tableau JSON valide pour que le pipeline de
+    génération des questions puisse être testé de bout en bout.
+
+    Returns:
+        La liste des tokens de la réponse
+    """
+    if '"question"' in prompt and '"options"' in prompt:
+        theme = re.search(r'thème "([^"]+)"', prompt)
+        theme = theme.group(1) if theme else "Python"
+        questions = [{
+            "question": f"Question {i + 1} sur {theme} ?",
+            "options": ["Réponse A", "Réponse B", "Réponse C", "Réponse D"],
+            "correct": "Réponse A",
+            "explanation": f"Explication de la question {i + 1}."
+        } for i in range(3)]
+        text = json.dumps(questions, ensure_ascii=False, indent=2)
+        return re.findall(r"\s*\S+", text)
+
+    count = max(1, min(max_tokens, settings.completion_tokens))
+    words = ["<h1>Exercice</h1><p>"] + [FILLER_WORDS[i % len(FILLER_WORDS)] + " " for i in range(count - 2)] + ["</p>"]
+    return words[:count]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Gestionnaire HTTP des API simulées."""
+
+    server_version = "FakeLLM/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def settings(self):
+        return self.server.settings
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status):
+        headers = {"Retry-After": str(self.settings.retry_after)} if status == 429 else None
+        message = "Rate limit exceeded" if status == 429 else "Internal server error"
+        self._send_json(status, {"error": {"code": status, "message": message}}, headers)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _send_event(self, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _token_delay(self):
+        return 1.0 / self.settings.token_rate if self.settings.token_rate > 0 else 0.0
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return {}
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path in ("/health", "/readyz"):
+            self._send_json(200, {"status": "ok"})
+        elif path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+        elif path.startswith("/v1beta/models/"):
+            self._send_json(200, {"name": path[len("/v1beta/"):], "displayName": "Fake model"})
+        elif path == "/stats":
+            self._send_json(200, {"requests": self.settings.request_count})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self._read_json()
+        if url.path == "/v1/chat/completions":
+            self._chat_completions(body)
+            return
+        match = re.match(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)$", url.path)
+        if match:
+            self._gemini(body, match.group(1), match.group(2) == "streamGenerateContent",
+                         parse_qs(url.query).get("alt") == ["sse"])
+            return
+        self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def _chat_completions(self, body):
+        status, latency = self.settings.next_outcome()
+        if status != 200:
+            time.sleep(latency)
+            self._send_error(status)
+            return
+
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        model = body.get("model", "fake-model")
+        tokens = build_completion(prompt, int(body.get("max_tokens") or 1500), self.settings)
+        finish_reason = "length" if len(tokens) >= int(body.get("max_tokens") or 1500) else "stop"
+        usage = {
+            "prompt_tokens": max(1, len(prompt) // 4),
+            "completion_tokens": len(tokens),
+            "total_tokens": max(1, len(prompt) // 4) + len(tokens)
+        }
+        created = int(time.time())
+        time.sleep(latency)
+
+        if body.get("stream"):
+            self._start_stream()
+            for i, token in enumerate(tokens):
+                self._send_event({
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": ({"role": "assistant"} if i == 0 else {}) | {"content": token},
+                                 "finish_reason": None}]
+                })
+                time.sleep(self._token_delay())
+            self._send_event({
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}], "usage": usage
+            })
+            self._send_event("[DONE]")
+            return
+
+        time.sleep(self._token_delay() * len(tokens))
+        self._send_json(200, {
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                         "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+    def _gemini(self, body, model, stream, sse):
+        status, latency = self.settings.next_outcome()
+        if status != 200:
+            time.sleep(latency)
+            self._send_error(status)
+            return
+
+        prompt = "\n".join(
+            str(part.get("text", ""))
+            for content in body.get("contents") or [] for part in content.get("parts") or []
+        )
+        max_tokens = int((body.get("generationConfig") or {}).get("maxOutputTokens") or 1500)
+        tokens = build_completion(prompt, max_tokens, self.settings)
+        finish_reason = "MAX_TOKENS" if len(tokens) >= max_tokens else "STOP"
+        usage = {
+            "promptTokenCount": max(1, len(prompt) // 4),
+            "candidatesTokenCount": len(tokens),
+            "totalTokenCount": max(1, len(prompt) // 4) + len(tokens)
+        }
+
+        def response(text, finish=None, with_usage=False):
+            candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+            if finish:
+                candidate["finishReason"] = finish
+            payload = {"candidates": [candidate], "modelVersion": model}
+            if with_usage:
+                payload["usageMetadata"] = usage
+            return payload
+
+        time.sleep(latency)
+
+        if stream and sse:
+            self._start_stream()
+            for i, token in enumerate(tokens):
+                last = i == len(tokens) - 1
+                self._send_event(response(token, finish_reason if last else None, last))
+                time.sleep(self._token_delay())
+            return
+
+        if stream:
+            # Sans alt=sse, Gemini renvoie un tableau JSON diffusé progressivement
+            self._start_stream()
+            self.wfile.write(b"[")
+            for i, token in enumerate(tokens):
+                last = i == len(tokens) - 1
+                chunk = json.dumps(response(token, finish_reason if last else None, last), ensure_ascii=False)
+                self.wfile.write((("," if i else "") + chunk).encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self._token_delay())
+            self.wfile.write(b"]")
+            return
+
+        time.sleep(self._token_delay() * len(tokens))
+        self._send_json(200, response("".join(tokens), finish_reason, True))
+
+
+def parse_args(argv=None):
+    """Analyse les arguments de la ligne de commande (valeurs par défaut lues dans l'environnement)."""
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Serveur de substitution OpenAI/Gemini pour les tests de charge.")
+    parser.add_argument("--host", default=env("FAKE_LLM_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(env("FAKE_LLM_PORT", 8090)))
+    parser.add_argument("--latency", type=float, default=float(env("FAKE_LLM_LATENCY", 0.5)),
+                        help="Latence avant le premier token, en secondes")
+    parser.add_argument("--jitter", type=float, default=float(env("FAKE_LLM_JITTER", 0.0)),
+                        help="Variation aléatoire de la latence, en secondes")
+    parser.add_argument("--token-rate", type=float, default=float(env("FAKE_LLM_TOKEN_RATE", 50)),
+                        help="Tokens générés par seconde (0 pour instantané)")
+    parser.add_argument("--completion-tokens", type=int, default=int(env("FAKE_LLM_COMPLETION_TOKENS", 300)),
+                        help="Longueur des réponses en tokens (bornée par max_tokens)")
+    parser.add_argument("--error-rate", type=float, default=float(env("FAKE_LLM_ERROR_RATE", 0.0)),
+                        help="Probabilité d'une erreur 500")
+    parser.add_argument("--burst-every", type=int, default=int(env("FAKE_LLM_BURST_EVERY", 0)),
+                        help="Période (en requêtes) des rafales de 429 (0 pour désactiver)")
+    parser.add_argument("--burst-length", type=int, default=int(env("FAKE_LLM_BURST_LENGTH", 0)),
+                        help="Nombre de 429 consécutifs au début de chaque période")
+    parser.add_argument("--retry-after", type=int, default=int(env("FAKE_LLM_RETRY_AFTER", 1)),
+                        help="Valeur de l'en-tête Retry-After des réponses 429")
+    parser.add_argument("--seed", type=int, default=int(env("FAKE_LLM_SEED", 0)),
+                        help="Germe aléatoire pour des scénarios reproductibles")
+    parser.add_argument("--quiet", action="store_true", help="Ne pas journaliser chaque requête")
+    return parser.parse_args(argv)
+
+
+def create_server(args):
+    """Crée le serveur HTTP avec les paramètres de simulation."""
+    server = ThreadingHTTPServer((args.host, args.port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.settings = FakeLLMSettings(args)
+    server.quiet = args.quiet
+    return server
+
+
+def main(argv=None):
+    """Fonction principale du script."""
+    args = parse_args(argv)
+    server = create_server(args)
+    print(f"Serveur de substitution à l'écoute sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,62 @@
 """
 Script pour générer des questions QCM pour tous les niveaux.
 
-Ce script utilise le module qcm_generator pour générer des questions QCM
-pour tous les niveaux et les ajouter au fichier JSON.
+Ce script utilise le module qcm_generator pour générer en parallèle des questions QCM
+pour chaque couple (niveau, thème) et les ajouter aux fichiers JSON par niveau.
 """
 
 import sys
-from qcm_generator import add_questions_to_level, THEMES
+import argparse
+from qcm_generator import bulk_generate_questions, question_store, THEMES
+
+def print_progress(done, total, level, theme, count, error):
+    """Affiche l'avancement de la génération."""
+    status = f"erreur: {error}" if error else f"{count} question(s)"
+    print(f"[{done}/{total}] {level} / {theme} : {status}")
 
 def main():
     """Fonction principale du script."""
-    # Générer des questions pour chaque niveau
-    for level in THEMES.keys():
-        print(f"Génération de questions pour {level}...")
-        count = add_questions_to_level(level, count=10)
-        print(f"  {count} questions ajoutées.")
+    parser = argparse.ArgumentParser(description="Génère des questions QCM pour tous les niveaux.")
+    parser.add_argument('--levels', nargs='*', choices=list(THEMES.keys()),
+                        help="Niveaux à compléter (tous par défaut)")
+    parser.add_argument('--rounds', type=int, default=1,
+                        help="Nombre de générations par couple (niveau, thème)")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Nombre maximum d'appels simultanés à l'IA")
+    parser.add_argument('--provider', default=None,
+                        help="Fournisseur d'IA (localai, gemini, mistral ou auto)")
+    args = parser.parse_args()
+    
+    duplicates = []
+    report = bulk_generate_questions(
+        levels=args.levels,
+        rounds=args.rounds,
+        concurrency=args.concurrency,
+        ai_provider_name=args.provider,
+        progress=print_progress,
+        duplicates=duplicates
+    )
+    
+    # Laisser se terminer un éventuel compactage des journaux de questions
+    question_store.wait()
+    
+    # Afficher le nombre de questions ajoutées par thème
+    total = 0
+    for level, themes in report.items():
+        level_total = sum(themes.values())
+        total += level_total
+        print(f"\n{level} : {level_total} question(s) ajoutée(s)")
+        for theme, count in themes.items():
+            print(f"  - {theme} : {count}")
+    print(f"\nTotal : {total} question(s) ajoutée(s).")
+    
+    # Afficher les quasi-doublons écartés
+    if duplicates:
+        print(f"\n{len(duplicates)} quasi-doublon(s) écarté(s) :")
+        for level, duplicate in duplicates:
+            print(f"  - [{level}] {duplicate.question} ~ {duplicate.duplicate_of} ({duplicate.similarity:.0%})")
+    
+    return 0 if total else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
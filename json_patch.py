@@ -0,0 +1,238 @@
+"""
+Module d'application de modifications JSON Patch (RFC 6902).
+
+Les opérations sont appliquées sans modifier le document d'origine : seuls les objets
+et listes situés sur le chemin d'une modification sont copiés (copie superficielle),
+le reste du document est partagé avec la nouvelle version. Le coût d'un patch dépend
+donc de la taille de la modification et non de celle du document, et un objet dont
+l'identité n'a pas changé (`is`) n'a pas été modifié.
+
+La fonction diff() calcule inversement le patch qui mène d'un document à un autre.
+
+Exemple :
+    [{"op": "replace", "path": "/Troisième/0/niveaux/1/description", "value": "..."},
+     {"op": "add", "path": "/Troisième/0/niveaux/-", "value": {"niveau": 6, ...}}]
+"""
+
+from typing import Any, Callable, Dict, List
+
+
+class JsonPatchError(ValueError):
+    """Exception levée quand un patch est mal formé ou ne s'applique pas au document."""
+
+
+def parse_pointer(path: Any) -> List[str]:
+    """
+    Découpe un pointeur JSON (RFC 6901) en liste de clés.
+
+    Args:
+        path: Le pointeur ("" pour la racine, "/a/0/b" sinon)
+
+    Returns:
+        La liste des clés, avec les échappements ~1 (/) et ~0 (~) décodés
+    """
+    if not isinstance(path, str) or (path and not path.startswith('/')):
+        raise JsonPatchError(f"Chemin invalide: {path!r}")
+    if not path:
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in path[1:].split('/')]
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    """Convertit une clé en indice de liste ("-" désigne la fin si allow_end)."""
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise JsonPatchError(f"Indice de liste invalide: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Indice hors limites: {index}")
+    return index
+
+
+def _child(container: Any, token: str) -> Any:
+    if isinstance(container, dict):
+        if token not in container:
+            raise JsonPatchError(f"Clé absente: {token!r}")
+        return container[token]
+    if isinstance(container, list):
+        return container[_index(container, token)]
+    raise JsonPatchError(f"Impossible de parcourir une valeur de type {type(container).__name__}")
+
+
+def get_value(document: Any, tokens: List[str]) -> Any:
+    """Retourne la valeur désignée par un chemin déjà découpé."""
+    value = document
+    for token in tokens:
+        value = _child(value, token)
+    return value
+
+
+def _update(container: Any, tokens: List[str], leaf: Callable[[Any, str], None]) -> Any:
+    """Copie les conteneurs du chemin et applique `leaf` au dernier (copie sur écriture)."""
+    if not isinstance(container, (dict, list)):
+        raise JsonPatchError(f"Impossible de modifier une valeur de type {type(container).__name__}")
+    copy = dict(container) if isinstance(container, dict) else list(container)
+    if len(tokens) == 1:
+        leaf(copy, tokens[0])
+    elif isinstance(copy, dict):
+        copy[tokens[0]] = _update(_child(container, tokens[0]), tokens[1:], leaf)
+    else:
+        index = _index(copy, tokens[0])
+        copy[index] = _update(copy[index], tokens[1:], leaf)
+    return copy
+
+
+def _add(document: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+
+    def leaf(container, token):
+        if isinstance(container, dict):
+            container[token] = value
+        else:
+            container.insert(_index(container, token, allow_end=True), value)
+    return _update(document, tokens, leaf)
+
+
+def _remove(document: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise JsonPatchError("Impossible de supprimer la racine du document")
+
+    def leaf(container, token):
+        if isinstance(container, dict):
+            if token not in container:
+                raise JsonPatchError(f"Clé absente: {token!r}")
+            del container[token]
+        else:
+            del container[_index(container, token)]
+    return _update(document, tokens, leaf)
+
+
+def _replace(document: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+
+    def leaf(container, token):
+        if isinstance(container, dict):
+            if token not in container:
+                raise JsonPatchError(f"Clé absente: {token!r}")
+            container[token] = value
+        else:
+            container[_index(container, token)] = value
+    return _update(document, tokens, leaf)
+
+
+def apply_operation(document: Any, operation: Dict[str, Any]) -> Any:
+    """
+    Applique une opération JSON Patch et retourne le nouveau document.
+
+    Raises:
+        JsonPatchError: Si l'opération est invalide ou échoue (y compris un "test" non vérifié)
+    """
+    if not isinstance(operation, dict):
+        raise JsonPatchError("Chaque opération doit être un objet")
+    op = operation.get('op')
+    tokens = parse_pointer(operation.get('path'))
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise JsonPatchError(f"L'opération {op} nécessite une valeur")
+
+    if op == 'add':
+        return _add(document, tokens, operation['value'])
+    if op == 'remove':
+        return _remove(document, tokens)
+    if op == 'replace':
+        return _replace(document, tokens, operation['value'])
+    if op in ('move', 'copy'):
+        source = parse_pointer(operation.get('from'))
+        value = get_value(document, source)
+        if op == 'move':
+            if tokens[:len(source)] == source and len(tokens) > len(source):
+                raise JsonPatchError("Impossible de déplacer une valeur dans l'un de ses enfants")
+            document = _remove(document, source)
+        return _add(document, tokens, value)
+    if op == 'test':
+        if get_value(document, tokens) != operation['value']:
+            raise JsonPatchError(f"Test non vérifié pour {operation.get('path')}")
+        return document
+    raise JsonPatchError(f"Opération inconnue: {op!r}")
+
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """
+    Applique une liste d'opérations JSON Patch (toutes ou aucune).
+
+    Args:
+        document: Le document d'origine (non modifié)
+        operations: Les opérations, appliquées dans l'ordre
+
+    Returns:
+        Le nouveau document, qui partage avec l'original toutes les parties non modifiées
+
+    Raises:
+        JsonPatchError: Si une opération échoue (le document d'origine reste inchangé)
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("Le patch doit être une liste d'opérations")
+    for operation in operations:
+        document = apply_operation(document, operation)
+    return document
+
+
+def escape_token(key: str) -> str:
+    """Échappe une clé pour l'utiliser dans un pointeur JSON (~ devient ~0, / devient ~1)."""
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def _same(old: Any, new: Any) -> bool:
+    return old is new or (type(old) is type(new) and old == new)
+
+
+def diff(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """
+    Calcule les opérations JSON Patch qui transforment `old` en `new`.
+
+    Les parties partagées entre les deux documents (même identité, cas des données
+    modifiées par copie sur écriture) ne sont pas parcourues. Dans les listes, le
+    début et la fin communs sont conservés et seul le milieu est remplacé.
+
+    Args:
+        old: Le document d'origine
+        new: Le document cible
+        path: Le pointeur JSON des documents (racine par défaut)
+
+    Returns:
+        La liste des opérations (vide si les documents sont égaux)
+    """
+    if old is new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = [{'op': 'remove', 'path': f"{path}/{escape_token(key)}"} for key in old if key not in new]
+        for key, value in new.items():
+            child = f"{path}/{escape_token(key)}"
+            if key not in old:
+                operations.append({'op': 'add', 'path': child, 'value': value})
+            else:
+                operations.extend(diff(old[key], value, child))
+        return operations
+    if isinstance(old, list) and isinstance(new, list):
+        start = 0
+        while start < len(old) and start < len(new) and _same(old[start], new[start]):
+            start += 1
+        end = 0
+        while (end < len(old) - start and end < len(new) - start
+               and _same(old[len(old) - 1 - end], new[len(new) - 1 - end])):
+            end += 1
+        old_middle = old[start:len(old) - end]
+        new_middle = new[start:len(new) - end]
+        operations = []
+        for offset in range(min(len(old_middle), len(new_middle))):
+            operations.extend(diff(old_middle[offset], new_middle[offset], f"{path}/{start + offset}"))
+        for _ in range(len(old_middle) - len(new_middle)):
+            operations.append({'op': 'remove', 'path': f"{path}/{start + len(new_middle)}"})
+        for offset in range(len(old_middle), len(new_middle)):
+            operations.append({'op': 'add', 'path': f"{path}/{start + offset}", 'value': new_middle[offset]})
+        return operations
+    if _same(old, new):
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
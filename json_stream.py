@@ -0,0 +1,113 @@
+"""
+Module d'analyse incrémentale et tolérante d'objets JSON dans un flux de texte.
+
+Les réponses de l'IA contiennent des objets JSON (questions de QCM par exemple) entourés
+de texte, parfois mal formés ou coupés par la limite de tokens. Ce module lit le texte
+au fil de l'eau et retourne chaque objet dès que son accolade fermante arrive : un
+objet invalide est écarté sans faire perdre les autres.
+"""
+
+import re
+import ast
+import json
+from typing import Any, Dict, List, Optional
+
+# Virgule superflue avant une accolade ou un crochet fermant
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+# Virgule manquante entre une valeur et la clé suivante ("a"\n "b": ...)
+_MISSING_COMMA_RE = re.compile(r'("|\]|\d|true|false|null)(\s*\n\s*)(")')
+
+
+def parse_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Analyse un objet JSON en corrigeant les défauts courants des réponses de l'IA.
+
+    Sont tolérés : les caractères de contrôle dans les chaînes, les virgules superflues
+    ou manquantes entre deux lignes, et la syntaxe Python (guillemets simples, True...).
+
+    Args:
+        text: Le texte de l'objet, de "{" à "}"
+
+    Returns:
+        Le dictionnaire obtenu, ou None si l'objet est irrécupérable
+    """
+    candidates = [text]
+    repaired = _MISSING_COMMA_RE.sub(r"\1,\2\3", _TRAILING_COMMA_RE.sub(r"\1", text))
+    if repaired != text:
+        candidates.append(repaired)
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate, strict=False)
+        except ValueError:
+            continue
+        return value if isinstance(value, dict) else None
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return value if isinstance(value, dict) else None
+
+
+class ObjectStreamParser:
+    """
+    Extrait les objets JSON d'un texte reçu par fragments.
+
+    Chaque objet est retourné dès que son accolade fermante est lue, y compris les
+    objets imbriqués (qui précèdent alors l'objet qui les contient). Le texte hors des
+    objets (explications, balises ```json, crochets du tableau) est ignoré.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._starts: List[int] = []
+        self._length = 0
+        self._in_string = False
+        self._escape = False
+        self.parsed = 0
+        self.invalid = 0
+
+    @property
+    def incomplete(self) -> bool:
+        """Indique si un objet commencé n'a pas été terminé (réponse coupée)."""
+        return bool(self._starts)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Ajoute un fragment de texte et retourne les objets terminés dans ce fragment.
+
+        Args:
+            chunk: Le fragment de texte reçu
+
+        Returns:
+            La liste des objets analysés avec succès, dans l'ordre de fermeture
+        """
+        objects = []
+        for char in chunk:
+            if not self._starts and char != "{":
+                continue
+            self._buffer.append(char)
+            self._length += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._starts.append(self._length - 1)
+            elif char == "}":
+                start = self._starts.pop()
+                value = parse_object("".join(self._buffer[start:]))
+                if value is None:
+                    self.invalid += 1
+                else:
+                    self.parsed += 1
+                    objects.append(value)
+                if not self._starts:
+                    self._buffer.clear()
+                    self._length = 0
+                    self._in_string = False
+        return objects
@@ -0,0 +1,193 @@
+"""
+Module de lecture et d'écriture JSON de l'application.
+
+Toutes les données du projet (catalogue des exercices, QCM, paramètres, notebooks,
+historique) sont stockées en JSON. Ce module utilise la bibliothèque la plus rapide
+disponible : orjson, sinon msgspec, sinon le module json de la bibliothèque standard.
+La variable d'environnement JSON_BACKEND (orjson, msgspec ou json) force un choix.
+
+Deux formats d'écriture :
+- indenté (2 espaces, caractères accentués conservés) pour les fichiers modifiables à
+  la main, identique à json.dump(..., indent=2, ensure_ascii=False),
+- compact (compact=True) pour les fichiers lus uniquement par l'application.
+
+Pour mesurer les performances sur les fichiers du projet :
+    python jsonio.py [fichiers...]
+"""
+
+import os
+import sys
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+JSONDecodeError = json.JSONDecodeError
+
+_requested = os.getenv("JSON_BACKEND", "").lower()
+
+orjson = msgspec = None
+if _requested in ("", "orjson"):
+    try:
+        import orjson
+    except ImportError:
+        pass
+if orjson is None and _requested in ("", "msgspec"):
+    try:
+        import msgspec
+    except ImportError:
+        pass
+
+BACKEND = "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+
+
+def _stdlib_dumps(value: Any, compact: bool = False, sort_keys: bool = False) -> bytes:
+    if compact:
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+    else:
+        text = json.dumps(value, ensure_ascii=False, indent=2, sort_keys=sort_keys)
+    return text.encode("utf-8")
+
+
+def _stdlib_loads(data: Union[str, bytes]) -> Any:
+    return json.loads(data)
+
+
+if orjson is not None:
+    def _dumps(value: Any, compact: bool = False, sort_keys: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(value, option=option)
+
+    _loads = orjson.loads
+
+elif msgspec is not None:
+    _encoder = msgspec.json.Encoder()
+    _sorted_encoder = msgspec.json.Encoder(order="sorted")
+    _decoder = msgspec.json.Decoder()
+
+    def _dumps(value: Any, compact: bool = False, sort_keys: bool = False) -> bytes:
+        data = (_sorted_encoder if sort_keys else _encoder).encode(value)
+        return data if compact else msgspec.json.format(data, indent=2)
+
+    def _loads(data: Union[str, bytes]) -> Any:
+        try:
+            return _decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise JSONDecodeError(str(e), data if isinstance(data, str) else "", 0) from None
+
+else:
+    _dumps = _stdlib_dumps
+    _loads = _stdlib_loads
+
+
+def dumps(value: Any, compact: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Sérialise une valeur en JSON (UTF-8).
+
+    Args:
+        value: La valeur à sérialiser
+        compact: True pour un JSON sans espaces (fichiers lus uniquement par l'application)
+        sort_keys: True pour trier les clés des objets
+
+    Returns:
+        Le JSON encodé en UTF-8
+    """
+    return _dumps(value, compact, sort_keys)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Analyse un texte JSON (str ou octets UTF-8).
+
+    Raises:
+        JSONDecodeError: Si le texte n'est pas du JSON valide
+    """
+    return _loads(data)
+
+
+def load(path: str) -> Any:
+    """
+    Lit un fichier JSON.
+
+    Raises:
+        OSError: Si le fichier ne peut pas être lu
+        JSONDecodeError: Si le contenu n'est pas du JSON valide
+    """
+    with open(path, "rb") as f:
+        return _loads(f.read())
+
+
+def dump(value: Any, path: str, compact: bool = False) -> None:
+    """
+    Écrit une valeur dans un fichier JSON.
+
+    Args:
+        value: La valeur à écrire
+        path: Chemin du fichier
+        compact: True pour un JSON sans espaces
+    """
+    data = _dumps(value, compact)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _measure(function: Callable[[], Any], budget: float = 0.2) -> float:
+    """Durée moyenne d'un appel en microsecondes (répété pendant `budget` secondes)."""
+    function()
+    count, start = 0, time.perf_counter()
+    while True:
+        function()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / count * 1e6
+
+
+def benchmark(paths: List[str]) -> List[Tuple[str, str, Dict[str, float]]]:
+    """
+    Mesure la lecture et l'écriture de fichiers JSON avec chaque bibliothèque disponible.
+
+    Args:
+        paths: Les fichiers à mesurer
+
+    Returns:
+        Pour chaque fichier et bibliothèque : (fichier, bibliothèque, temps en µs et tailles)
+    """
+    backends = [("json", _stdlib_loads, _stdlib_dumps)]
+    if BACKEND != "json":
+        backends.append((BACKEND, _loads, _dumps))
+    results = []
+    for path in paths:
+        with open(path, "rb") as f:
+            raw = f.read()
+        value = json.loads(raw)
+        for name, loads_fn, dumps_fn in backends:
+            results.append((path, name, {
+                "loads_us": _measure(lambda: loads_fn(raw)),
+                "dumps_us": _measure(lambda: dumps_fn(value)),
+                "dumps_compact_us": _measure(lambda: dumps_fn(value, True)),
+                "size": len(dumps_fn(value)),
+                "compact_size": len(dumps_fn(value, True)),
+            }))
+    return results
+
+
+def _default_benchmark_paths() -> List[str]:
+    paths = []
+    for directory, suffix in (("exercices", ".json"), ("notebooks", ".ipynb")):
+        if os.path.isdir(directory):
+            paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                         if name.endswith(suffix))
+    return paths
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or _default_benchmark_paths()
+    print(f"Bibliothèque utilisée : {BACKEND}")
+    print(f"{'fichier':45} {'lib':8} {'lecture':>10} {'écriture':>10} {'compact':>10} {'taille':>9} {'compacte':>9}")
+    for path, name, r in benchmark(files):
+        print(f"{path[-45:]:45} {name:8} {r['loads_us']:>8.1f}µs {r['dumps_us']:>8.1f}µs "
+              f"{r['dumps_compact_us']:>8.1f}µs {r['size']:>9} {r['compact_size']:>9}")
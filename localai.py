@@ -6,10 +6,7 @@ en utilisant l'API LocalAI.
 """
 
 import requests
-import json
-import time
 import logging
-from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 import os
 
@@ -40,7 +37,12 @@ if not LOCALAI_URL:
     raise ValueError("URL LocalAI non configurée. Veuillez définir LOCALAI_URL dans .env")
 
 def check_localai_connection():
-    """Vérifie que le serveur LocalAI est accessible"""
+    """
+    Vérifie que le serveur LocalAI est accessible.
+    
+    Raises:
+        ConnectionError: Si le serveur est injoignable ou répond avec une erreur
+    """
     try:
         response = requests.get(f"{LOCALAI_URL.replace('/v1/chat/completions', '')}/health", timeout=5)
         if response.status_code != 200:
@@ -55,9 +57,13 @@ def check_localai_connection():
             f"Erreur détaillée: {str(e)}"
         )
 
-# Vérifier la connexion au démarrage
-check_localai_connection()
+# La connexion n'est plus vérifiée à l'import : voir check_localai_connection()
+# et la surveillance en arrière-plan de provider_health
 
+import ai_metrics
+from retry import send_with_retry, CircuitOpenError
+from rate_limit import RateLimitExceededError
+from prompt_budget import estimate_tokens
 from prompts import SYSTEM_MESSAGE, get_evaluation_prompt, DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, DEFAULT_RETRY_COUNT, DEFAULT_RETRY_DELAY
 
 
@@ -96,55 +102,49 @@ def generate_text(prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS,
         raise ValueError("retry_delay doit être entre 1 et 10")
         
     logger.info(f"Début de génération avec max_tokens={max_tokens}, temperature={temperature}")
-    attempts = 0
+    # Préparer les données pour l'API
+    data = {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    
+    try:
+        # Envoyer la requête à l'API (avec nouvelles tentatives et disjoncteur)
+        response = send_with_retry(
+            "LocalAI",
+            lambda: requests.post(LOCALAI_URL, json=data, timeout=60),
+            retry_count, retry_delay,
+            tokens=estimate_tokens(f"{SYSTEM_MESSAGE}\n\n{prompt}", MODEL) + max_tokens
+        )
+        
+        # Vérifier si la requête a réussi
+        if response.status_code == 200:
+            result = response.json()
+            ai_metrics.record_openai_usage(result)
+            # Extraire le texte généré
+            generated_text = result["choices"][0]["message"]["content"]
+            return generated_text
+        
+        logger.error(f"Erreur lors de la requête à LocalAI: {response.status_code}")
+        logger.error(f"Détails: {response.text}")
+        return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte. Code: {response.status_code}. Veuillez réessayer plus tard.</p>"
     
-    while attempts <= retry_count:
-        try:
-            # Préparer les données pour l'API
-            data = {
-                "model": MODEL,
-                "messages": [
-                    {"role": "system", "content": SYSTEM_MESSAGE},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": max_tokens,
-                "temperature": temperature
-            }
-            
-            # Envoyer la requête à l'API
-            response = requests.post(LOCALAI_URL, json=data, timeout=60)
-            
-            # Vérifier si la requête a réussi
-            if response.status_code == 200:
-                result = response.json()
-                # Extraire le texte généré
-                generated_text = result["choices"][0]["message"]["content"]
-                return generated_text
-            else:
-                logger.error(f"Erreur lors de la requête à LocalAI: {response.status_code}")
-                logger.error(f"Détails: {response.text}")
-                
-                # Si c'est la dernière tentative, retourner un message d'erreur
-                if attempts == retry_count:
-                    return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte. Code: {response.status_code}. Veuillez réessayer plus tard.</p>"
-                
-                # Sinon, attendre et réessayer
-                time.sleep(retry_delay)
-                attempts += 1
-                
-        except requests.exceptions.Timeout:
-            logger.warning("Timeout lors de la requête à LocalAI")
-            if attempts == retry_count:
-                return "<h1>Erreur</h1><p>Erreur: Le serveur LocalAI met trop de temps à répondre. Veuillez réessayer plus tard.</p>"
-            time.sleep(retry_delay)
-            attempts += 1
-            
-        except Exception as e:
-            logger.error(f"Exception lors de la requête à LocalAI: {str(e)}")
-            if attempts == retry_count:
-                return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte: {str(e)}</p>"
-            time.sleep(retry_delay)
-            attempts += 1
+    except requests.exceptions.Timeout:
+        logger.warning("Timeout lors de la requête à LocalAI")
+        return "<h1>Erreur</h1><p>Erreur: Le serveur LocalAI met trop de temps à répondre. Veuillez réessayer plus tard.</p>"
+    
+    except (CircuitOpenError, RateLimitExceededError) as e:
+        logger.warning(str(e))
+        return f"<h1>Erreur</h1><p>{e}</p>"
+    
+    except Exception as e:
+        logger.error(f"Exception lors de la requête à LocalAI: {str(e)}")
+        return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte: {str(e)}</p>"
 
 
 def evaluate_code(code: str, enonce: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
@@ -166,5 +166,5 @@ def evaluate_code(code: str, enonce: str, max_tokens: int = DEFAULT_MAX_TOKENS,
         requests.exceptions.RequestException: En cas d'échec de la requête API
     """
     logger.info(f"Début d'évaluation de code (longueur: {len(code)} caractères)")
-    prompt = get_evaluation_prompt(code, enonce)
+    prompt = get_evaluation_prompt(code, enonce, MODEL)
     return generate_text(prompt, max_tokens, temperature)
@@ -6,10 +6,8 @@ en utilisant l'API Mistral Codestral.
 """
 
 import requests
-import json
-import time
 import logging
-from typing import Dict, Any, Optional
+from typing import Iterator
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -20,16 +18,30 @@ import os
 
 load_dotenv()  # Charge les variables d'environnement depuis .env
 
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-if not MISTRAL_API_KEY:
-    raise ValueError("La clé API Mistral n'est pas configurée. Veuillez définir MISTRAL_API_KEY dans .env")
-
-MISTRAL_URL = "https://codestral.mistral.ai/v1/chat/completions"
+MISTRAL_URL = os.getenv("MISTRAL_URL", "https://codestral.mistral.ai/v1/chat/completions")
 MISTRAL_MODEL = "codestral-latest"
 
+import ai_metrics
+from streaming import iter_openai_text
+from retry import send_with_retry, CircuitOpenError
+from rate_limit import RateLimitExceededError
+from prompt_budget import estimate_tokens
 from prompts import SYSTEM_MESSAGE, get_evaluation_prompt, DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, DEFAULT_RETRY_COUNT, DEFAULT_RETRY_DELAY
 
 
+def get_api_key() -> str:
+    """
+    Retourne la clé API Mistral, lue dans l'environnement au moment de l'appel.
+    
+    Raises:
+        ValueError: Si MISTRAL_API_KEY n'est pas définie
+    """
+    api_key = os.getenv("MISTRAL_API_KEY")
+    if not api_key:
+        raise ValueError("La clé API Mistral n'est pas configurée. Veuillez définir MISTRAL_API_KEY dans .env")
+    return api_key
+
+
 def generate_text(prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
                  temperature: float = DEFAULT_TEMPERATURE, 
                  retry_count: int = DEFAULT_RETRY_COUNT, 
@@ -42,66 +54,115 @@ def generate_text(prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS,
         max_tokens: Nombre maximum de tokens à générer
         temperature: Température pour la génération
         retry_count: Nombre de tentatives en cas d'échec
-        retry_delay: Délai entre les tentatives en secondes
+        retry_delay: Délai de base entre les tentatives en secondes (attente exponentielle)
         
     Returns:
         Le texte généré par l'API
     """
-    attempts = 0
+    try:
+        # Envoyer la requête à l'API (avec nouvelles tentatives et disjoncteur)
+        response = _send(prompt, max_tokens, temperature, retry_count, retry_delay)
+        
+        # Vérifier si la requête a réussi
+        if response.status_code == 200:
+            result = response.json()
+            ai_metrics.record_openai_usage(result)
+            # Extraire le texte généré
+            generated_text = result["choices"][0]["message"]["content"]
+            return generated_text
+        
+        return _status_error(response)
     
-    while attempts <= retry_count:
-        try:
-            # Préparer les données pour l'API
-            data = {
-                "model": MISTRAL_MODEL,
-                "messages": [
-                    {"role": "system", "content": SYSTEM_MESSAGE},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": max_tokens,
-                "temperature": temperature
-            }
-            
-            # En-têtes pour l'authentification
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {MISTRAL_API_KEY}"
-            }
-            
-            # Envoyer la requête à l'API
-            response = requests.post(MISTRAL_URL, headers=headers, json=data, timeout=60)
-            
-            # Vérifier si la requête a réussi
-            if response.status_code == 200:
-                result = response.json()
-                # Extraire le texte généré
-                generated_text = result["choices"][0]["message"]["content"]
-                return generated_text
-            else:
-                logger.error(f"Erreur lors de la requête à Mistral: {response.status_code}")
-                logger.error(f"Détails: {response.text}")
-                
-                # Si c'est la dernière tentative, retourner un message d'erreur
-                if attempts == retry_count:
-                    return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte. Code: {response.status_code}. Veuillez réessayer plus tard.</p>"
-                
-                # Sinon, attendre et réessayer
-                time.sleep(retry_delay)
-                attempts += 1
-                
-        except requests.exceptions.Timeout:
-            logger.warning("Timeout lors de la requête à Mistral")
-            if attempts == retry_count:
-                return "<h1>Erreur</h1><p>Erreur: Le serveur Mistral met trop de temps à répondre. Veuillez réessayer plus tard.</p>"
-            time.sleep(retry_delay)
-            attempts += 1
-            
-        except Exception as e:
-            logger.error(f"Exception lors de la requête à Mistral: {str(e)}")
-            if attempts == retry_count:
-                return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte: {str(e)}</p>"
-            time.sleep(retry_delay)
-            attempts += 1
+    except Exception as e:
+        return _exception_error(e)
+
+
+def stream_text(prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
+                temperature: float = DEFAULT_TEMPERATURE, 
+                retry_count: int = DEFAULT_RETRY_COUNT, 
+                retry_delay: int = DEFAULT_RETRY_DELAY) -> Iterator[str]:
+    """
+    Génère du texte en streaming avec l'API Mistral (Codestral).
+    
+    Les nouvelles tentatives ne concernent que l'ouverture du flux. Une erreur avant le
+    premier fragment produit le message d'erreur HTML habituel ; une coupure en cours de
+    flux termine simplement le texte.
+    
+    Args:
+        prompt: Le prompt à envoyer à l'API
+        max_tokens: Nombre maximum de tokens à générer
+        temperature: Température pour la génération
+        retry_count: Nombre de tentatives en cas d'échec
+        retry_delay: Délai de base entre les tentatives en secondes (attente exponentielle)
+        
+    Returns:
+        Un itérateur sur les fragments du texte généré
+    """
+    started = False
+    try:
+        response = _send(prompt, max_tokens, temperature, retry_count, retry_delay, stream=True)
+        # Fermer la réponse dans tous les cas pour rendre la connexion au pool
+        with response:
+            if response.status_code != 200:
+                yield _status_error(response)
+                return
+            for text in iter_openai_text(response):
+                started = True
+                yield text
+    except Exception as e:
+        if started:
+            logger.warning(f"Flux Mistral interrompu: {e}")
+        else:
+            yield _exception_error(e)
+
+
+def _send(prompt: str, max_tokens: int, temperature: float, retry_count: int, 
+          retry_delay: int, stream: bool = False) -> requests.Response:
+    """Envoie une requête de génération (avec quota, nouvelles tentatives et disjoncteur)."""
+    # Préparer les données pour l'API
+    data = {
+        "model": MISTRAL_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    if stream:
+        data["stream"] = True
+    
+    # En-têtes pour l'authentification
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {get_api_key()}"
+    }
+    
+    return send_with_retry(
+        "Mistral",
+        lambda: requests.post(MISTRAL_URL, headers=headers, json=data, timeout=60, stream=stream),
+        retry_count, retry_delay,
+        tokens=estimate_tokens(f"{SYSTEM_MESSAGE}\n\n{prompt}", MISTRAL_MODEL) + max_tokens
+    )
+
+
+def _status_error(response: requests.Response) -> str:
+    """Message d'erreur HTML pour une réponse HTTP en échec."""
+    logger.error(f"Erreur lors de la requête à Mistral: {response.status_code}")
+    logger.error(f"Détails: {response.text}")
+    return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte. Code: {response.status_code}. Veuillez réessayer plus tard.</p>"
+
+
+def _exception_error(e: Exception) -> str:
+    """Message d'erreur HTML pour une exception levée pendant la requête."""
+    if isinstance(e, requests.exceptions.Timeout):
+        logger.warning("Timeout lors de la requête à Mistral")
+        return "<h1>Erreur</h1><p>Erreur: Le serveur Mistral met trop de temps à répondre. Veuillez réessayer plus tard.</p>"
+    if isinstance(e, (CircuitOpenError, RateLimitExceededError)):
+        logger.warning(str(e))
+        return f"<h1>Erreur</h1><p>{e}</p>"
+    logger.error(f"Exception lors de la requête à Mistral: {str(e)}")
+    return f"<h1>Erreur</h1><p>Erreur lors de la génération du texte: {str(e)}</p>"
 
 
 def evaluate_code(code: str, enonce: str, max_tokens: int = DEFAULT_MAX_TOKENS, 
@@ -118,5 +179,5 @@ def evaluate_code(code: str, enonce: str, max_tokens: int = DEFAULT_MAX_TOKENS,
     Returns:
         L'évaluation du code
     """
-    prompt = get_evaluation_prompt(code, enonce)
+    prompt = get_evaluation_prompt(code, enonce, MISTRAL_MODEL)
     return generate_text(prompt, max_tokens, temperature)
@@ -43,3 +43,37 @@ class User(db.Model):
 
     def __repr__(self):
         return f"<User {self.username}>"
+
+
+# Catalogue des exercices (utilisé à la place de exercices/data.json quand EXERCISE_BACKEND=sqlite)
+class CatalogueNiveau(db.Model):
+    __tablename__ = 'catalogue_niveau'
+    id = db.Column(db.Integer, primary_key=True)
+    nom = db.Column(db.String(100), unique=True, nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)  # Ordre d'affichage
+
+
+class CatalogueTheme(db.Model):
+    __tablename__ = 'catalogue_theme'
+    __table_args__ = (db.UniqueConstraint('niveau_id', 'nom'),)
+    id = db.Column(db.Integer, primary_key=True)
+    niveau_id = db.Column(db.Integer, db.ForeignKey('catalogue_niveau.id', ondelete='CASCADE'), nullable=False)
+    nom = db.Column(db.String(255), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CatalogueExercice(db.Model):
+    __tablename__ = 'catalogue_exercice'
+    __table_args__ = (db.UniqueConstraint('theme_id', 'niveau'),)
+    id = db.Column(db.Integer, primary_key=True)
+    theme_id = db.Column(db.Integer, db.ForeignKey('catalogue_theme.id', ondelete='CASCADE'), nullable=False)
+    niveau = db.Column(db.Integer, nullable=False)  # Niveau de difficulté
+    description = db.Column(db.Text, nullable=False, default='')
+    debutant = db.Column(db.Boolean, nullable=False, default=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CatalogueVersion(db.Model):
+    __tablename__ = 'catalogue_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)  # Incrémentée à chaque modification
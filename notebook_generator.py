@@ -2,10 +2,11 @@
 Module pour générer des fichiers Jupyter Notebook (.ipynb) à partir d'exercices Python.
 """
 
-import json
 import os
 import re
 
+import jsonio
+
 def create_notebook(title, description, code, tests):
     """
     Crée un fichier Jupyter Notebook avec le contenu spécifié.
@@ -125,8 +126,7 @@ def save_notebook(notebook, filename):
     filepath = os.path.join('notebooks', f"{filename}.ipynb")
     
     # Écrire le fichier
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(notebook, f, ensure_ascii=False, indent=2)
+    jsonio.dump(notebook, filepath)
     
     return filepath
 
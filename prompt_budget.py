@@ -0,0 +1,325 @@
+"""
+Module de budget des prompts envoyés aux fournisseurs d'IA.
+
+Les prompts d'évaluation contiennent l'énoncé HTML complet produit par une génération
+précédente et le code de l'élève tel quel. Ce module fournit :
+- une estimation rapide du nombre de tokens d'un texte selon le modèle,
+- la conversion de l'énoncé HTML en texte compact,
+- la réduction d'un code trop long autour des fonctions utiles à l'évaluation.
+"""
+
+import re
+import ast
+import math
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Set
+
+# Nombre moyen de caractères par token selon la famille du modèle (textes français et code)
+CHARS_PER_TOKEN = {
+    "codestral": 3.2,
+    "mistral": 3.5,
+    "gemini": 4.0,
+}
+DEFAULT_CHARS_PER_TOKEN = 3.6
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\n[ \t]+")
+
+# Balises de bloc qui introduisent un retour à la ligne
+_BLOCK_TAGS = {"p", "div", "section", "article", "ul", "ol", "table", "tr", "pre",
+               "h1", "h2", "h3", "h4", "h5", "h6", "blockquote"}
+_IGNORED_TAGS = {"script", "style", "head"}
+
+OMITTED_MARKER = "# ... ({count} lignes omises)"
+# Corps d'une définition réduite : une instruction, pour que le code reste analysable
+COLLAPSED_BODY = "...  # ({count} lignes omises)"
+
+
+def chars_per_token(model: Optional[str] = None) -> float:
+    """Retourne le nombre moyen de caractères par token du modèle."""
+    name = (model or "").lower()
+    for family, ratio in CHARS_PER_TOKEN.items():
+        if family in name:
+            return ratio
+    return DEFAULT_CHARS_PER_TOKEN
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Estime le nombre de tokens d'un texte pour un modèle, sans tokenizer.
+
+    Chaque mot compte pour sa longueur divisée par le ratio du modèle (au moins un
+    token), chaque signe de ponctuation et chaque indentation pour un token.
+
+    Args:
+        text: Le texte à mesurer
+        model: Nom du modèle (détermine le ratio caractères/token)
+
+    Returns:
+        Le nombre estimé de tokens
+    """
+    if not text:
+        return 0
+    ratio = chars_per_token(model)
+    count = 0
+    for piece in _TOKEN_RE.findall(text):
+        if len(piece) > 1 and (piece[0].isalnum() or piece[0] == "_"):
+            count += math.ceil(len(piece) / ratio)
+        else:
+            count += 1
+    return count
+
+
+class _HTMLToText(HTMLParser):
+    """Convertit un énoncé HTML en texte compact (titres, listes et blocs de code conservés)."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._pre = 0
+        self._ignored = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _IGNORED_TAGS:
+            self._ignored += 1
+        elif tag == "pre":
+            self._pre += 1
+            self.parts.append("\n```\n")
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+            if tag[0] == "h" and tag[1:].isdigit():
+                self.parts.append("#" * int(tag[1:]) + " ")
+        elif tag == "li":
+            self.parts.append("\n- ")
+        elif tag == "br":
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _IGNORED_TAGS:
+            self._ignored = max(0, self._ignored - 1)
+        elif tag == "pre":
+            self._pre = max(0, self._pre - 1)
+            self.parts.append("\n```\n")
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._ignored:
+            return
+        if self._pre:
+            self.parts.append(data)
+        else:
+            self.parts.append(re.sub(r"\s+", " ", data))
+
+    def text(self) -> str:
+        """Texte obtenu, sans lignes vides consécutives (indentation conservée dans le code)."""
+        compact: List[str] = []
+        in_code = False
+        for line in "".join(self.parts).split("\n"):
+            line = line.rstrip() if in_code else line.strip()
+            if line == "```":
+                in_code = not in_code
+            if line or (compact and compact[-1]):
+                compact.append(line)
+        return "\n".join(compact).strip()
+
+
+def html_to_text(html: str) -> str:
+    """
+    Convertit un énoncé HTML en texte compact.
+
+    Les balises sont supprimées, les titres deviennent "#", les éléments de liste "-"
+    et les blocs <pre> sont conservés tels quels entre ```.
+
+    Args:
+        html: L'énoncé au format HTML (un texte brut est retourné presque inchangé)
+
+    Returns:
+        Le texte de l'énoncé
+    """
+    if not html or "<" not in html:
+        return (html or "").strip()
+    parser = _HTMLToText()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def truncate_text(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Tronque un texte à un budget de tokens, en coupant entre deux lignes.
+
+    Args:
+        text: Le texte à tronquer
+        max_tokens: Nombre maximum de tokens
+        model: Nom du modèle
+
+    Returns:
+        Le texte, suivi de "[...]" s'il a été tronqué
+    """
+    if estimate_tokens(text, model) <= max_tokens:
+        return text
+    kept, used = [], 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line, model) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept) + "\n[...]"
+
+
+def _referenced_names(text: str) -> Set[str]:
+    """Identifiants Python cités dans un texte (énoncé ou indice)."""
+    return set(re.findall(r"[A-Za-z_]\w*", text or ""))
+
+
+def _collapse(lines: List[str], node: ast.AST) -> List[str]:
+    """
+    Réduit une définition à sa signature (et à sa docstring si elle tient sur une ligne).
+
+    Le corps omis est remplacé par "..." suivi du nombre de lignes omises (docstring
+    comprise) : le code réduit reste du Python valide.
+    """
+    first = node.body[0]
+    if first.lineno == node.lineno:
+        # Corps sur la ligne de la définition : rien à réduire
+        return lines[node.lineno - 1:node.end_lineno]
+    body_start = first.lineno - 1
+    kept = lines[node.lineno - 1:body_start]
+    indent = re.match(r"\s*", lines[body_start]).group(0)
+    if (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant)
+            and isinstance(first.value.value, str) and first.lineno == first.end_lineno):
+        kept.append(lines[body_start])
+        body_start = first.end_lineno
+    omitted = node.end_lineno - body_start
+    if omitted > 0:
+        kept.append(indent + COLLAPSED_BODY.format(count=omitted))
+    return kept
+
+
+def _statement_blocks(lines: List[str]) -> List[List[str]]:
+    """
+    Découpe un code en blocs d'instructions de premier niveau.
+
+    Les lignes vides et les commentaires sont rattachés à l'instruction qui les suit. Un
+    code non analysable est découpé ligne par ligne.
+    """
+    try:
+        tree = ast.parse("\n".join(lines))
+    except (SyntaxError, ValueError):
+        return [[line] for line in lines]
+    blocks: List[List[str]] = []
+    position = 0
+    for node in tree.body:
+        if node.end_lineno > position:
+            blocks.append(lines[position:node.end_lineno])
+            position = node.end_lineno
+    if position < len(lines):
+        if blocks:
+            blocks[-1] = blocks[-1] + lines[position:]
+        else:
+            blocks.append(lines[position:])
+    return blocks
+
+
+def _keep_head_and_tail(lines: List[str], max_tokens: int, model: Optional[str]) -> List[str]:
+    """
+    Conserve le début et la fin d'un code dans le budget, en omettant le milieu.
+
+    Le code est coupé entre deux instructions de premier niveau : une définition est
+    conservée en entier ou omise en entier, et le code conservé reste analysable.
+    """
+    blocks = _statement_blocks(lines)
+    head, tail = [], []
+    head_lines = tail_lines = 0
+    used = estimate_tokens(OMITTED_MARKER, model)
+    i, j = 0, len(blocks) - 1
+    while i <= j:
+        # Alterner : deux lignes du début pour une de la fin
+        take_head = head_lines <= 2 * tail_lines
+        block = blocks[i] if take_head else blocks[j]
+        cost = sum(estimate_tokens(line, model) + 1 for line in block)
+        if used + cost > max_tokens:
+            break
+        used += cost
+        if take_head:
+            head.append(block)
+            head_lines += len(block)
+            i += 1
+        else:
+            tail.append(block)
+            tail_lines += len(block)
+            j -= 1
+    omitted = sum(len(block) for block in blocks[i:j + 1])
+    if omitted <= 0:
+        return lines
+    kept_head = [line for block in head for line in block]
+    kept_tail = [line for block in tail[::-1] for line in block]
+    return kept_head + [OMITTED_MARKER.format(count=omitted)] + kept_tail
+
+
+def trim_code(code: str, max_tokens: int, model: Optional[str] = None,
+              focus: Iterable[str] = ()) -> str:
+    """
+    Réduit un code trop long pour qu'il tienne dans un budget de tokens.
+
+    Les fonctions et classes citées dans `focus` (en général l'énoncé) sont conservées
+    en entier ; les autres sont réduites à leur signature, en commençant par les plus
+    longues. Si cela ne suffit pas (ou si le code n'est pas analysable), seuls le
+    début et la fin du code sont conservés.
+
+    Args:
+        code: Le code Python
+        max_tokens: Nombre maximum de tokens
+        model: Nom du modèle
+        focus: Textes dont les identifiants désignent les définitions utiles
+
+    Returns:
+        Le code, éventuellement réduit (les parties omises sont signalées en commentaire)
+    """
+    if not code or estimate_tokens(code, model) <= max_tokens:
+        return code
+
+    lines = code.split("\n")
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return "\n".join(_keep_head_and_tail(lines, max_tokens, model))
+
+    names = set()
+    for text in focus:
+        names |= _referenced_names(text)
+
+    definitions = [node for node in ast.walk(tree)
+                   if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+    # Définitions non citées, les plus longues d'abord
+    candidates = sorted((node for node in definitions if node.name not in names),
+                        key=lambda node: node.end_lineno - node.lineno, reverse=True)
+
+    collapsed: List[ast.AST] = []
+    result = lines
+    for node in candidates:
+        if any(outer.lineno <= node.lineno <= outer.end_lineno for outer in collapsed):
+            continue
+        collapsed.append(node)
+        result = _apply_collapses(lines, collapsed)
+        if estimate_tokens("\n".join(result), model) <= max_tokens:
+            return "\n".join(result)
+
+    return "\n".join(_keep_head_and_tail(result, max_tokens, model))
+
+
+def _apply_collapses(lines: List[str], nodes: List[ast.AST]) -> List[str]:
+    """Reconstruit le code en réduisant les définitions données à leur signature."""
+    result: List[str] = []
+    position = 0
+    for node in sorted(nodes, key=lambda node: node.lineno):
+        # Les décorateurs précèdent la ligne de la définition
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        if start < position:
+            continue
+        result.extend(lines[position:node.lineno - 1])
+        result.extend(_collapse(lines, node))
+        position = node.end_lineno
+    result.extend(lines[position:])
+    return result
@@ -3,7 +3,9 @@ Module centralisant tous les prompts utilisés par les différents fournisseurs
 """
 
 import os
+from typing import Optional
 from dotenv import load_dotenv
+from prompt_budget import html_to_text, truncate_text, trim_code
 
 # Charger les variables d'environnement depuis .env
 load_dotenv()
@@ -14,6 +16,10 @@ DEFAULT_TEMPERATURE = float(os.getenv("DEFAULT_TEMPERATURE", 0.7))
 DEFAULT_RETRY_COUNT = int(os.getenv("DEFAULT_RETRY_COUNT", 2))
 DEFAULT_RETRY_DELAY = int(os.getenv("DEFAULT_RETRY_DELAY", 1))
 
+# Budgets (en tokens estimés) de l'énoncé et du code dans les prompts d'évaluation
+EVALUATION_STATEMENT_MAX_TOKENS = int(os.getenv("EVALUATION_STATEMENT_MAX_TOKENS", 1200))
+EVALUATION_CODE_MAX_TOKENS = int(os.getenv("EVALUATION_CODE_MAX_TOKENS", 1500))
+
 # Instructions de formatage HTML communes
 HTML_FORMATTING_INSTRUCTIONS = """
 Utilise uniquement des balises HTML standard pour le formatage:
@@ -56,55 +62,55 @@ Quand tu évalues du code:
 {HTML_FORMATTING_INSTRUCTIONS}
 """
 
-def get_evaluation_prompt(code: str, enonce: str) -> str:
+def get_evaluation_prompt(code: str, enonce: str, model: Optional[str] = None) -> str:
     """
     Génère le prompt pour l'évaluation de code.
     
+    L'énoncé HTML est converti en texte compact et le code trop long est réduit autour
+    des fonctions citées dans l'énoncé, selon les budgets EVALUATION_*_MAX_TOKENS.
+    Les consignes de formatage HTML ne sont pas répétées : elles figurent déjà dans
+    SYSTEM_MESSAGE.
+    
     Args:
         code: Le code Python à évaluer
-        enonce: L'énoncé de l'exercice
+        enonce: L'énoncé de l'exercice (HTML ou texte)
+        model: Nom du modèle, pour l'estimation des tokens
         
     Returns:
         Le prompt formaté pour l'évaluation
     """
-    return f"""
-    Évalue le code Python suivant par rapport à l'énoncé donné:
-    
-    Énoncé:
-    {enonce}
-    
-    Code soumis:
-    ```python
-    {code}
-    ```
-    
-    IMPORTANT: Ton évaluation doit être formatée en HTML pur pour un affichage correct dans un navigateur.
-    
-    Ton évaluation doit toujours inclure:
-    1. Un titre principal avec <h1>Évaluation du code</h1>
-    2. Une section sur la conformité à l'énoncé avec <h2>Conformité à l'énoncé</h2>
-    3. Une section sur les erreurs potentielles avec <h2>Erreurs potentielles</h2>
-    4. Une section sur les suggestions d'amélioration avec <h2>Suggestions d'amélioration</h2>:
-       - Si le code ne fonctionne pas: fournir UNE seule suggestion principale
-       - Si le code fonctionne: fournir 3 suggestions maximum
-    
-    IMPORTANT: La section "Pour aller plus loin" avec <h2>Pour aller plus loin</h2> ne doit être incluse QUE si le code fonctionne correctement et répond à l'énoncé. Si le code contient des erreurs ou ne répond pas à l'énoncé, n'inclus PAS cette section.
-    
-    Utilise des émojis et des classes pour rendre ton évaluation plus visuelle:
-    - <span class="text-success">✅ Texte</span> pour les points positifs
-    - <span class="text-danger">❌ Texte</span> pour les erreurs ou problèmes
-    - <span class="text-info">💡 Texte</span> pour les suggestions
-    - <span class="text-primary">🚀 Texte</span> pour les conseils d'amélioration
-    
-    TRÈS IMPORTANT:
-    - NE DONNE JAMAIS LA SOLUTION COMPLÈTE à l'exercice
-    - Fournis uniquement des notions de cours et des pistes de réflexion
-    - Si tu dois donner un exemple de code, utilise un exemple différent de l'exercice ou montre seulement une petite partie de la solution
-    - Guide l'élève vers la bonne direction sans faire le travail à sa place
-    - Sois encourageant et constructif dans tes retours
+    enonce = truncate_text(html_to_text(enonce), EVALUATION_STATEMENT_MAX_TOKENS, model)
+    code = trim_code(code or "", EVALUATION_CODE_MAX_TOKENS, model, focus=[enonce])
     
-    {HTML_FORMATTING_INSTRUCTIONS}
-    """
+    return f"""Évalue le code Python suivant par rapport à l'énoncé donné:
+
+Énoncé:
+{enonce}
+
+Code soumis:
+```python
+{code}
+```
+
+Ton évaluation doit toujours inclure:
+1. Un titre principal avec <h1>Évaluation du code</h1>
+2. Une section sur la conformité à l'énoncé avec <h2>Conformité à l'énoncé</h2>
+3. Une section sur les erreurs potentielles avec <h2>Erreurs potentielles</h2>
+4. Une section sur les suggestions d'amélioration avec <h2>Suggestions d'amélioration</h2>:
+   - Si le code ne fonctionne pas: fournir UNE seule suggestion principale
+   - Si le code fonctionne: fournir 3 suggestions maximum
+
+IMPORTANT: La section "Pour aller plus loin" avec <h2>Pour aller plus loin</h2> ne doit être incluse QUE si le code fonctionne correctement et répond à l'énoncé. Si le code contient des erreurs ou ne répond pas à l'énoncé, n'inclus PAS cette section.
+
+Utilise les classes de couleur: text-success (✅) pour les points positifs, text-danger (❌) pour les erreurs, text-info (💡) pour les suggestions, text-primary (🚀) pour les conseils d'amélioration.
+
+TRÈS IMPORTANT:
+- NE DONNE JAMAIS LA SOLUTION COMPLÈTE à l'exercice
+- Fournis uniquement des notions de cours et des pistes de réflexion
+- Si tu dois donner un exemple de code, utilise un exemple différent de l'exercice ou montre seulement une petite partie de la solution
+- Guide l'élève vers la bonne direction sans faire le travail à sa place
+- Sois encourageant et constructif dans tes retours
+"""
 
 
 def get_exercise_prompt(niveau: str, theme: str, difficulte: int, description: str, debutant: bool = False) -> str:
@@ -300,17 +306,22 @@ def get_exercise_prompt(niveau: str, theme: str, difficulte: int, description: s
     {HTML_FORMATTING_INSTRUCTIONS}
     """
 
-def get_qcm_prompt(level, theme):
+def get_qcm_prompt(level, theme, avoid=None):
     """
     Génère un prompt pour la création de questions QCM.
     
     Args:
         level: Le niveau scolaire
         theme: Le thème des questions
+        avoid: Les énoncés de questions déjà générées, à ne pas reproduire
     
     Returns:
         Le prompt pour l'IA
     """
+    already_asked = ""
+    if avoid:
+        already_asked = "\n    - Ne reprends pas ces questions déjà posées, ni des reformulations :\n" + \
+            "\n".join(f"      * {question}" for question in avoid)
     return f"""
     Tu es un expert en programmation Python et en pédagogie. Tu dois créer des questions à choix multiples (QCM) pour des élèves de niveau {level} sur le thème "{theme}".
 
@@ -349,5 +360,5 @@ def get_qcm_prompt(level, theme):
     - Les questions doivent porter sur le thème "{theme}"
     - Les options doivent être plausibles mais une seule doit être correcte
     - L'explication doit être pédagogique et aider à comprendre pourquoi la réponse est correcte
-    - Respecte strictement le format JSON demandé
+    - Respecte strictement le format JSON demandé{already_asked}
     """
@@ -0,0 +1,145 @@
+"""
+Module de surveillance de l'état des fournisseurs d'IA.
+
+Les vérifications (serveur LocalAI joignable, clés API présentes et acceptées) sont faites
+par un thread d'arrière-plan et leur résultat est mis en cache. Le démarrage des workers
+ne dépend donc plus de la disponibilité des fournisseurs, et les routes consultent l'état
+connu sans attendre de réponse réseau.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from ai_providers import get_ai_provider, Config
+
+logger = logging.getLogger(__name__)
+
+# Paramètres de la surveillance (valeurs de .env si disponibles)
+HEALTH_CHECK_ENABLED = os.getenv("HEALTH_CHECK_ENABLED", "true").lower() in ("1", "true", "yes")
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", 60))
+HEALTH_CHECK_PROVIDERS = [name.strip() for name in
+                          os.getenv("HEALTH_CHECK_PROVIDERS", "localai,gemini,mistral").split(",")
+                          if name.strip()]
+
+# États possibles d'un fournisseur
+STATUS_UNKNOWN = "unknown"
+STATUS_UP = "up"
+STATUS_DOWN = "down"
+STATUS_UNCONFIGURED = "unconfigured"
+
+
+class HealthChecker:
+    """
+    Vérifie périodiquement l'état des fournisseurs d'IA et le met en cache.
+
+    Args:
+        providers: Noms des fournisseurs à surveiller
+        interval: Intervalle entre deux séries de vérifications en secondes
+        timeout: Délai maximal d'une vérification en secondes
+    """
+
+    def __init__(self, providers: Iterable[str] = HEALTH_CHECK_PROVIDERS,
+                 interval: float = HEALTH_CHECK_INTERVAL,
+                 timeout: float = Config.HEALTH_CHECK_TIMEOUT):
+        self.providers = list(providers)
+        self.interval = interval
+        self.timeout = timeout
+        self._statuses: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def check(self, provider_name: str) -> Dict[str, Any]:
+        """
+        Vérifie immédiatement un fournisseur et met son état en cache.
+
+        Args:
+            provider_name: Nom du fournisseur d'IA
+
+        Returns:
+            L'état du fournisseur (status, checked_at, latency, error)
+        """
+        start = time.monotonic()
+        error = None
+        try:
+            get_ai_provider(provider_name).check_health(self.timeout)
+            status = STATUS_UP
+        except ValueError as e:
+            status, error = STATUS_UNCONFIGURED, str(e)
+        except Exception as e:
+            status, error = STATUS_DOWN, str(e)
+
+        result = {
+            "status": status,
+            "checked_at": time.time(),
+            "latency": round(time.monotonic() - start, 3),
+            "error": error
+        }
+        with self._lock:
+            previous = self._statuses.get(provider_name, {}).get("status")
+            self._statuses[provider_name] = result
+        if previous != status:
+            log = logger.info if status == STATUS_UP else logger.warning
+            log(f"Fournisseur {provider_name} : {status}" + (f" ({error})" if error else ""))
+        return result
+
+    def check_all(self) -> Dict[str, Dict[str, Any]]:
+        """Vérifie tous les fournisseurs surveillés et retourne leurs états."""
+        for provider_name in self.providers:
+            if self._stop.is_set():
+                break
+            self.check(provider_name)
+        return self.statuses()
+
+    def status(self, provider_name: str) -> Dict[str, Any]:
+        """Retourne l'état connu d'un fournisseur, sans le vérifier."""
+        with self._lock:
+            cached = self._statuses.get(provider_name)
+        return dict(cached) if cached else {"status": STATUS_UNKNOWN, "checked_at": None,
+                                            "latency": None, "error": None}
+
+    def statuses(self) -> Dict[str, Dict[str, Any]]:
+        """Retourne l'état connu de tous les fournisseurs surveillés."""
+        return {name: self.status(name) for name in self.providers}
+
+    def is_available(self, provider_name: str) -> bool:
+        """
+        Indique si un fournisseur peut être sollicité.
+
+        Un fournisseur jamais vérifié est considéré comme disponible.
+        """
+        return self.status(provider_name)["status"] in (STATUS_UP, STATUS_UNKNOWN)
+
+    def _run(self) -> None:
+        """Boucle du thread de surveillance."""
+        while not self._stop.is_set():
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"Erreur lors de la vérification des fournisseurs: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> bool:
+        """
+        Démarre le thread de surveillance si elle est activée.
+
+        Returns:
+            True si le thread a été démarré
+        """
+        if not HEALTH_CHECK_ENABLED or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="provider-health", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """Arrête le thread de surveillance."""
+        self._stop.set()
+
+
+# Surveillance partagée par les routes du processus
+health_checker = HealthChecker()
@@ -0,0 +1,401 @@
+"""
+Module de la banque de questions QCM en mémoire.
+
+Les questions de chaque niveau scolaire sont lues dans exercices/<niveau>.json (ou
+exercices/autre.json si le fichier du niveau n'existe pas), complétées par le journal
+des modifications du niveau (exercices/<niveau>.jsonl, écrit par qcm_store.py),
+analysées une seule fois puis indexées par niveau et par thème. La banque est partagée
+en lecture seule par toutes les requêtes : un fichier n'est relu que si sa date de
+modification ou sa taille a changé (seules les nouvelles lignes du journal sont lues),
+et ces dates ne sont vérifiées qu'une fois toutes les QCM_BANK_REFRESH_INTERVAL
+secondes. Démarrer un défi ne fait donc aucune lecture de fichier.
+
+Les questions sont conservées sous une forme compacte (BankQuestion : chaînes
+internées, options en tuple, indice de la bonne réponse précalculé) et identifiées par
+une empreinte de leur contenu, stable d'un chargement à l'autre. Un tirage est décrit
+par les identifiants des questions et une graine : l'ordre des options en découle
+(permutations précalculées), ce qui permet de reconstruire un défi à partir de ces
+seules valeurs sans copier les questions.
+"""
+
+import os
+import sys
+import random
+import hashlib
+import logging
+import itertools
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import jsonio
+
+logger = logging.getLogger(__name__)
+
+# Paramètres de la banque (valeurs de .env si disponibles)
+QCM_DIR = os.getenv("QCM_DIR", "exercices")
+QCM_BANK_REFRESH_INTERVAL = float(os.getenv("QCM_BANK_REFRESH_INTERVAL", 1))
+
+# Au-delà de ce nombre d'options, la permutation est tirée au lieu d'être précalculée
+MAX_PRECOMPUTED_OPTIONS = 6
+
+Question = Dict[str, Any]
+
+
+class BankQuestion(NamedTuple):
+    """Question QCM sous forme compacte (options en tuple, indice de la bonne réponse)."""
+    id: str
+    question: str
+    options: Tuple[str, ...]
+    correct: int
+    explanation: str
+    theme: Optional[str]
+
+    def to_dict(self) -> Question:
+        """Retourne la question au format des fichiers JSON."""
+        question = {
+            'question': self.question,
+            'options': list(self.options),
+            'correct': self.options[self.correct],
+            'explanation': self.explanation
+        }
+        if self.theme is not None:
+            question['theme'] = self.theme
+        return question
+
+
+class DrawnQuestion(NamedTuple):
+    """Question tirée pour un défi, avec ses options dans l'ordre présenté à l'élève."""
+    id: str
+    question: str
+    options: Tuple[str, ...]
+    correct_index: int
+    explanation: str
+
+
+def question_id(question: str, options: Sequence[str], correct: str) -> str:
+    """Empreinte du contenu d'une question (identique tant que la question ne change pas)."""
+    content = '\x1f'.join([question, *options, correct])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+
+def compact_question(raw: Any) -> Optional[BankQuestion]:
+    """
+    Convertit une question lue dans un fichier en BankQuestion.
+
+    Returns:
+        La question compacte, ou None si elle n'a pas le format attendu
+    """
+    if not isinstance(raw, dict):
+        return None
+    text, options, correct = raw.get('question'), raw.get('options'), raw.get('correct')
+    if (not isinstance(text, str) or not isinstance(options, list) or len(options) < 2
+            or not all(isinstance(option, str) for option in options) or correct not in options):
+        return None
+    theme = raw.get('theme')
+    return BankQuestion(
+        id=question_id(text, options, correct),
+        question=text,
+        options=tuple(sys.intern(option) for option in options),
+        correct=options.index(correct),
+        explanation=str(raw.get('explanation') or ''),
+        theme=sys.intern(theme) if isinstance(theme, str) else None
+    )
+
+
+@lru_cache(maxsize=None)
+def _permutations(count: int) -> Tuple[Tuple[Tuple[int, ...], Tuple[int, ...]], ...]:
+    """Permutations de `count` options, chacune avec sa permutation inverse."""
+    return tuple((order, tuple(order.index(i) for i in range(count)))
+                 for order in itertools.permutations(range(count)))
+
+
+def shuffle_options(question: BankQuestion, draw: float) -> DrawnQuestion:
+    """
+    Mélange les options d'une question de façon déterministe.
+
+    Args:
+        question: La question
+        draw: Nombre aléatoire dans [0, 1) qui détermine l'ordre des options
+    """
+    count = len(question.options)
+    if count <= MAX_PRECOMPUTED_OPTIONS:
+        permutations = _permutations(count)
+        order, inverse = permutations[int(draw * len(permutations))]
+        correct_index = inverse[question.correct]
+    else:
+        order = tuple(random.Random(draw).sample(range(count), count))
+        correct_index = order.index(question.correct)
+    return DrawnQuestion(
+        id=question.id,
+        question=question.question,
+        options=tuple(question.options[i] for i in order),
+        correct_index=correct_index,
+        explanation=question.explanation
+    )
+
+
+def level_file_path(level: str, directory: str = QCM_DIR) -> str:
+    """Retourne le fichier des questions d'un niveau (autre.json si celui du niveau n'existe pas)."""
+    level_file = os.path.join(directory, f"{level}.json")
+    if not os.path.exists(level_file):
+        level_file = os.path.join(directory, "autre.json")
+    return level_file
+
+
+def log_path(level: str, directory: str = QCM_DIR) -> str:
+    """Retourne le journal des modifications d'un niveau."""
+    return os.path.join(directory, f"{level}.jsonl")
+
+
+def read_log(path: str, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Lit les enregistrements d'un journal à partir d'une position.
+
+    Une dernière ligne incomplète (écriture en cours ou interrompue) n'est pas lue ;
+    une ligne illisible est ignorée.
+
+    Returns:
+        Un tuple (enregistrements, position de la fin de la dernière ligne lue)
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    records = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = jsonio.loads(line)
+        except jsonio.JSONDecodeError:
+            logger.warning(f"Enregistrement illisible ignoré dans {path}")
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records, offset + end
+
+
+def apply_records(entries: Dict[Any, Any], records: Iterable[Dict[str, Any]],
+                  convert: Callable[[Any], Any]) -> None:
+    """
+    Applique des enregistrements du journal aux questions d'un niveau.
+
+    Un ajout d'une question déjà présente et une suppression d'une question absente
+    sont sans effet : rejouer un journal déjà intégré à l'instantané ne change rien.
+
+    Args:
+        entries: Les questions du niveau par identifiant (modifié sur place)
+        records: Les enregistrements ({"op": "add", "id", "question"} ou {"op": "del", "id"})
+        convert: Conversion d'une question du journal (None pour l'ignorer)
+    """
+    for record in records:
+        op, key = record.get('op'), record.get('id')
+        if op == 'add' and key not in entries:
+            value = convert(record.get('question'))
+            if value is not None:
+                entries[key] = value
+        elif op == 'del':
+            entries.pop(key, None)
+
+
+def parse_level_questions(data: Any) -> List[Question]:
+    """
+    Extrait la liste des questions du contenu d'un fichier de niveau.
+
+    Le fichier contient soit directement un tableau de questions, soit un objet dont
+    le premier tableau est la liste des questions (ex. {"Troisième": [...]}).
+    """
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+    return []
+
+
+class QuestionBank:
+    """
+    Questions QCM de tous les niveaux, indexées par niveau et par thème.
+
+    Les listes retournées sont des tuples partagés entre les requêtes : les questions
+    ne doivent pas être modifiées (les copier avant de mélanger leurs options).
+
+    Args:
+        levels: Les niveaux scolaires de la banque
+        directory: Répertoire des fichiers de questions
+        refresh_interval: Délai minimal entre deux vérifications des fichiers (secondes)
+    """
+
+    def __init__(self, levels: Iterable[str], directory: str = QCM_DIR,
+                 refresh_interval: float = QCM_BANK_REFRESH_INTERVAL):
+        self.levels = list(levels)
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        # Fichier -> (signature, questions), un fichier partagé n'est lu qu'une fois
+        self._files: Dict[str, Tuple[Optional[Tuple[int, int, int]], Tuple[BankQuestion, ...]]] = {}
+        # Niveau -> (fichier, questions du fichier, première ligne du journal, position lue,
+        # questions par identifiant)
+        self._levels: Dict[str, Tuple[str, Tuple[BankQuestion, ...], bytes, int, Dict[str, BankQuestion]]] = {}
+        self._questions: Dict[str, Tuple[BankQuestion, ...]] = {level: () for level in self.levels}
+        self._themes: Dict[str, Dict[Optional[str], Tuple[BankQuestion, ...]]] = {level: {} for level in self.levels}
+        self._by_id: Dict[str, BankQuestion] = {}
+
+    def invalidate(self) -> None:
+        """Force la vérification des fichiers au prochain accès (à appeler après une écriture)."""
+        self._checked_at = None
+
+    def _read_file(self, path: str, previous: Tuple[BankQuestion, ...]) -> Tuple[BankQuestion, ...]:
+        try:
+            raw = parse_level_questions(jsonio.load(path))
+            questions = tuple(q for q in map(compact_question, raw) if q is not None)
+            if len(questions) < len(raw):
+                logger.warning(f"{len(raw) - len(questions)} question(s) mal formée(s) ignorée(s) dans {path}")
+            return questions
+        except jsonio.JSONDecodeError:
+            logger.error(f"Erreur de décodage JSON dans {path}")
+        except OSError as e:
+            logger.error(f"Erreur lors de la lecture de {path}: {e}")
+        # Fichier illisible (écriture en cours, erreur de syntaxe) : garder les questions connues
+        return previous
+
+    def refresh(self) -> None:
+        """Relit les fichiers modifiés depuis la dernière vérification."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+                return
+            paths = {level: level_file_path(level, self.directory) for level in self.levels}
+            files = {}
+            for path in set(paths.values()):
+                try:
+                    st = os.stat(path)
+                    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+                except OSError:
+                    signature = None
+                known_signature, questions = self._files.get(path, (None, ()))
+                if signature is None:
+                    questions = ()
+                elif signature != known_signature:
+                    questions = self._read_file(path, questions)
+                files[path] = (signature, questions)
+            changed = False
+            for level, path in paths.items():
+                changed |= self._refresh_level(level, path, files[path][1])
+            if changed:
+                self._by_id = {question.id: question
+                               for questions in self._questions.values() for question in questions}
+            self._files = files
+            self._checked_at = time.monotonic()
+
+    def _refresh_level(self, level: str, path: str, base: Tuple[BankQuestion, ...]) -> bool:
+        """Applique le journal d'un niveau à son fichier ; retourne True si le niveau a changé."""
+        journal = log_path(level, self.directory)
+        state = self._levels.get(level)
+        try:
+            size = os.path.getsize(journal)
+        except OSError:
+            size = 0
+        if state is not None and state[0] == path and state[1] is base and state[3] == size:
+            return False
+        header = b''
+        if size:
+            try:
+                # Le compactage commence chaque nouveau journal par une ligne unique
+                with open(journal, 'rb') as f:
+                    header = f.readline()
+            except OSError:
+                size = 0
+        if (state is not None and state[0] == path and state[1] is base
+                and state[2] == header and state[3] <= size):
+            # Seules les lignes ajoutées depuis la dernière lecture sont lues
+            entries, offset = state[4], state[3]
+        else:
+            # Fichier modifié ou journal remplacé (compactage) : reconstruction complète
+            entries, offset = {question.id: question for question in base}, 0
+        if size > offset:
+            try:
+                records, offset = read_log(journal, offset)
+                apply_records(entries, records, compact_question)
+            except OSError as e:
+                logger.error(f"Erreur lors de la lecture de {journal}: {e}")
+        self._levels[level] = (path, base, header, offset, entries)
+        questions = tuple(entries.values())
+        if questions == self._questions[level]:
+            return False
+        self._index(level, questions)
+        return True
+
+    def _index(self, level: str, questions: Tuple[BankQuestion, ...]) -> None:
+        themes: Dict[Optional[str], List[BankQuestion]] = {}
+        for question in questions:
+            themes.setdefault(question.theme, []).append(question)
+        self._themes[level] = {theme: tuple(items) for theme, items in themes.items()}
+        self._questions[level] = questions
+
+    def questions(self, level: str) -> Tuple[BankQuestion, ...]:
+        """Retourne les questions d'un niveau (tuple vide si le niveau est inconnu)."""
+        self.refresh()
+        return self._questions.get(level, ())
+
+    def themes(self, level: str) -> List[str]:
+        """Retourne les thèmes d'un niveau (les questions sans thème ne sont pas comptées)."""
+        self.refresh()
+        return [theme for theme in self._themes.get(level, {}) if theme is not None]
+
+    def by_theme(self, level: str, theme: Optional[str]) -> Tuple[BankQuestion, ...]:
+        """Retourne les questions d'un thème (None pour les questions sans thème)."""
+        self.refresh()
+        return self._themes.get(level, {}).get(theme, ())
+
+    def counts(self) -> Dict[str, int]:
+        """Retourne le nombre de questions de chaque niveau."""
+        self.refresh()
+        return {level: len(questions) for level, questions in self._questions.items()}
+
+    def get(self, question_id: str) -> Optional[BankQuestion]:
+        """Retourne une question d'après son identifiant (None si elle n'existe plus)."""
+        self.refresh()
+        return self._by_id.get(question_id)
+
+    def draw(self, level: str, count: int, seed: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Tire des questions d'un niveau sans les copier.
+
+        Args:
+            level: Le niveau scolaire
+            count: Le nombre de questions (limité au nombre disponible)
+            seed: La graine du tirage (aléatoire si absente)
+
+        Returns:
+            Un tuple (identifiants des questions, graine) à passer à build()
+        """
+        if seed is None:
+            seed = random.getrandbits(32)
+        questions = self.questions(level)
+        indices = random.Random(seed).sample(range(len(questions)), min(count, len(questions)))
+        return [questions[i].id for i in indices], seed
+
+    def build(self, ids: Sequence[str], seed: int) -> List[DrawnQuestion]:
+        """
+        Reconstruit les questions d'un tirage, options mélangées d'après la graine.
+
+        Le même couple (identifiants, graine) donne toujours les mêmes questions dans le
+        même ordre ; une question supprimée ou modifiée depuis le tirage (son identifiant
+        change) est omise sans changer l'ordre des options des autres. Les réponses doivent
+        donc être associées aux questions par identifiant et non par position.
+        """
+        rng = random.Random(seed)
+        drawn = []
+        for question_id in ids:
+            draw = rng.random()
+            question = self.get(question_id)
+            if question is not None:
+                drawn.append(shuffle_options(question, draw))
+        return drawn
@@ -0,0 +1,292 @@
+"""
+Module de détection des questions QCM en quasi-double.
+
+Les questions générées par l'IA reformulent souvent des questions déjà présentes
+("Que signifie HTML ?" et "Que signifie l'acronyme HTML ?"). Chaque question est
+réduite à l'ensemble des mots de son énoncé et de sa bonne réponse, résumé par une
+signature MinHash : la proportion de valeurs égales entre deux signatures estime la
+similarité de Jaccard des deux ensembles. Les options ne sont pas comparées : des
+questions différentes partagent souvent la même liste d'options (int, float, str...).
+Les signatures sont rangées par bandes dans des tables de hachage (LSH) : une nouvelle
+question n'est comparée qu'aux questions qui partagent au moins une bande avec elle, et
+non à toute la banque.
+
+Les littéraux de l'énoncé (code entre accents graves, chaînes entre guillemets,
+nombres, opérateurs) doivent être identiques : "Quel est le type de 3.5 ?" et "Quel est
+le type de "3" ?" ne sont jamais des doublons, quelle que soit leur similarité.
+
+Les signatures sont calculées avec numpy s'il est installé (toute une liste de
+questions en une seule opération), sinon en Python avec les mêmes valeurs.
+"""
+
+import os
+import re
+import random
+import hashlib
+import threading
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from exercise_catalog import normalize_keyword
+
+# Similarité estimée à partir de laquelle une question est considérée comme un doublon
+QCM_DUPLICATE_THRESHOLD = float(os.getenv("QCM_DUPLICATE_THRESHOLD", 0.7))
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+# Mots ignorés dans la comparaison (articles, mots interrogatifs...)
+STOP_WORDS = {
+    "le", "la", "les", "l", "un", "une", "des", "de", "du", "d", "en", "et", "est",
+    "que", "qu", "quel", "quelle", "quels", "quelles", "qui", "a", "au", "aux", "ce",
+    "cet", "cette", "on", "se", "s", "y",
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]+")
+# Code entre accents graves, chaînes ("3", '3' mais pas l'apostrophe de "l'acronyme",
+# « print »), nombres isolés et opérateurs (le tiret de "mot-clé" n'en est pas un)
+_LITERAL_PATTERN = re.compile(
+    r"`[^`]*`|\"[^\"]*\"|(?<!\w)'[^']*'|«[^»]*»|(?<!\w)\d+(?:\.\d+)?(?!\w)"
+    r"|\*\*|//|[=!<>]=|<<|>>|[+*/%<>=&|^~@]|(?<![^\W\d])-(?![^\W\d])"
+)
+_PUNCTUATION = set("?.,:;!'\"`’«»()")
+_PRIME = (1 << 61) - 1
+_UINT64 = (1 << 64) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fonctions de hachage fixes : les signatures restent comparables d'un processus à l'autre.
+# (a * x + b) est calculé sur 64 bits avec dépassement, comme le fait numpy.
+_random = random.Random(0x5143)
+_A = [_random.randrange(1, _PRIME) for _ in range(MINHASH_PERMUTATIONS)]
+_B = [_random.randrange(0, _PRIME) for _ in range(MINHASH_PERMUTATIONS)]
+if np is not None:
+    _A_ARRAY = np.array(_A, dtype=np.uint64)[:, None]
+    _B_ARRAY = np.array(_B, dtype=np.uint64)[:, None]
+
+Signature = Tuple[int, ...]
+Literals = FrozenSet[str]
+
+
+def question_tokens(question: str, answer: str = '') -> Set[str]:
+    """
+    Retourne l'ensemble des mots d'une question et de sa bonne réponse.
+
+    Les mots sont mis en minuscules et sans accents, les mots vides et la ponctuation
+    sont ignorés, les nombres et opérateurs ("5", "//") sont conservés.
+    """
+    tokens = set()
+    for text in (question, answer):
+        for token in _TOKEN_PATTERN.findall(normalize_keyword(text)):
+            if token not in STOP_WORDS and not set(token) <= _PUNCTUATION:
+                tokens.add(token)
+    return tokens
+
+
+def question_literals(question: str) -> Literals:
+    """
+    Retourne les littéraux d'un énoncé (code, chaînes, nombres, opérateurs).
+
+    Les espaces sont ignorés : `5 // 2` et `5//2` sont le même littéral.
+    """
+    return frozenset(''.join(match.split()) for match in _LITERAL_PATTERN.findall(question))
+
+
+def _token_hash(token: str) -> int:
+    # hash() dépend du processus (PYTHONHASHSEED) : empreinte stable sur 32 bits
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+def minhash_many(token_sets: Sequence[Set[str]]) -> List[Signature]:
+    """
+    Calcule les signatures MinHash de plusieurs ensembles de mots.
+
+    Args:
+        token_sets: Les ensembles de mots
+
+    Returns:
+        Une signature (MINHASH_PERMUTATIONS entiers) par ensemble
+    """
+    hashes = [[_token_hash(token) for token in tokens] for tokens in token_sets]
+    if np is None:
+        return [tuple(min((((a * x + b) & _UINT64) % _PRIME & _MAX_HASH for x in values), default=_MAX_HASH)
+                      for a, b in zip(_A, _B)) for values in hashes]
+
+    signatures: List[Signature] = [(_MAX_HASH,) * MINHASH_PERMUTATIONS] * len(hashes)
+    filled = [i for i, values in enumerate(hashes) if values]
+    if filled:
+        values = np.fromiter((x for i in filled for x in hashes[i]), dtype=np.uint64)
+        starts = np.cumsum([0] + [len(hashes[i]) for i in filled[:-1]])
+        # Une ligne par fonction de hachage, une colonne par mot, minimum par question
+        permuted = (_A_ARRAY * values + _B_ARRAY) % np.uint64(_PRIME) & np.uint64(_MAX_HASH)
+        minima = np.minimum.reduceat(permuted, starts, axis=1)
+        for column, i in enumerate(filled):
+            signatures[i] = tuple(minima[:, column].tolist())
+    return signatures
+
+
+def minhash(tokens: Set[str]) -> Signature:
+    """Calcule la signature MinHash d'un ensemble de mots."""
+    return minhash_many([tokens])[0]
+
+
+def similarity(first: Signature, second: Signature) -> float:
+    """Estime la similarité de Jaccard de deux ensembles à partir de leurs signatures."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+class Duplicate(NamedTuple):
+    """Question écartée car trop proche d'une question existante."""
+    question: str
+    duplicate_of: str
+    similarity: float
+
+
+class DuplicateIndex:
+    """
+    Index LSH des signatures d'un ensemble de questions.
+
+    Args:
+        threshold: Similarité à partir de laquelle deux questions sont des doublons
+        bands: Nombre de bandes de la signature (plus de bandes détecte des paires moins
+            similaires, au prix de plus de comparaisons)
+    """
+
+    def __init__(self, threshold: float = QCM_DUPLICATE_THRESHOLD, bands: int = LSH_BANDS):
+        if MINHASH_PERMUTATIONS % bands:
+            raise ValueError("Le nombre de bandes doit diviser MINHASH_PERMUTATIONS")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = MINHASH_PERMUTATIONS // bands
+        self._signatures: Dict[Hashable, Signature] = {}
+        self._labels: Dict[Hashable, str] = {}
+        self._literals: Dict[Hashable, Literals] = {}
+        self._buckets: List[Dict[Signature, Set[Hashable]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._signatures
+
+    def keys(self) -> Set[Hashable]:
+        """Retourne les clés des questions indexées."""
+        return set(self._signatures)
+
+    def _band_keys(self, signature: Signature) -> Iterable[Tuple[int, Signature]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def add(self, key: Hashable, signature: Signature, label: str = '',
+            literals: Literals = frozenset()) -> None:
+        """Ajoute une question à l'index (label : texte affiché dans les rapports)."""
+        if key in self._signatures:
+            self.remove(key)
+        self._signatures[key] = signature
+        self._labels[key] = label
+        self._literals[key] = literals
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """Retire une question de l'index."""
+        signature = self._signatures.pop(key, None)
+        self._labels.pop(key, None)
+        self._literals.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def query(self, signature: Signature,
+              literals: Literals = frozenset()) -> Optional[Tuple[Hashable, str, float]]:
+        """
+        Cherche la question indexée la plus proche d'une signature.
+
+        Seules les questions qui ont exactement les mêmes littéraux sont comparées.
+
+        Returns:
+            (clé, label, similarité) de la plus proche au-dessus du seuil, ou None
+        """
+        candidates: Set[Hashable] = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        best = None
+        for key in candidates:
+            if self._literals[key] != literals:
+                continue
+            score = similarity(signature, self._signatures[key])
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (key, self._labels[key], score)
+        return best
+
+
+class BankDeduplicator:
+    """
+    Filtre les nouvelles questions d'un niveau par rapport à la banque QCM.
+
+    Un index est tenu par niveau ; il est resynchronisé avec la banque quand celle-ci
+    change (seules les signatures des nouvelles questions sont calculées).
+
+    Args:
+        bank: La banque de questions (qcm_bank.QuestionBank)
+        threshold: Similarité à partir de laquelle une question est un doublon
+    """
+
+    def __init__(self, bank: Any, threshold: float = QCM_DUPLICATE_THRESHOLD):
+        self.bank = bank
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, DuplicateIndex] = {}
+        self._synced: Dict[str, Any] = {}
+
+    def _index(self, level: str) -> DuplicateIndex:
+        index = self._indexes.setdefault(level, DuplicateIndex(self.threshold))
+        questions = self.bank.questions(level)
+        if self._synced.get(level) is not questions:
+            current = {question.id: question for question in questions}
+            for key in index.keys() - current.keys():
+                index.remove(key)
+            missing = [question for key, question in current.items() if key not in index]
+            signatures = minhash_many([question_tokens(q.question, q.options[q.correct]) for q in missing])
+            for question, signature in zip(missing, signatures):
+                index.add(question.id, signature, question.question, question_literals(question.question))
+            self._synced[level] = questions
+        return index
+
+    def filter(self, level: str, questions: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Duplicate]]:
+        """
+        Écarte les questions trop proches de la banque ou d'une question du même lot.
+
+        Args:
+            level: Le niveau scolaire
+            questions: Les nouvelles questions (format des fichiers JSON)
+
+        Returns:
+            Un tuple (questions retenues, doublons écartés)
+        """
+        signatures = minhash_many([question_tokens(q.get('question', ''), str(q.get('correct', '')))
+                                   for q in questions])
+        kept, rejected = [], []
+        # Les questions retenues sont comparées à la suite du lot sans entrer dans l'index
+        # de la banque, qui ne change qu'une fois les questions enregistrées
+        batch = DuplicateIndex(self.threshold)
+        with self._lock:
+            index = self._index(level)
+            for position, (question, signature) in enumerate(zip(questions, signatures)):
+                text = question.get('question', '')
+                literals = question_literals(text)
+                match = index.query(signature, literals) or batch.query(signature, literals)
+                if match is not None:
+                    rejected.append(Duplicate(text, match[1], round(match[2], 2)))
+                    continue
+                batch.add(position, signature, text, literals)
+                kept.append(question)
+        return kept, rejected
@@ -5,33 +5,34 @@ Ce module contient les fonctions pour générer des questions QCM à partir de l
 les sauvegarder dans un fichier JSON et les charger pour les utiliser dans l'application.
 """
 
-import os
-import json
 import random
-from ai_providers import get_ai_provider
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ai_providers import get_ai_provider, is_error_response
+from ai_metrics import call_site
+import jsonio
+from json_stream import ObjectStreamParser
 from prompts import get_qcm_prompt
+from qcm_bank import QuestionBank
+from qcm_dedup import BankDeduplicator
+from qcm_settings import qcm_settings
+from qcm_store import QuestionStore
 
 # Constantes
 QCM_FILE_PATH = 'exercices/qcm_questions.json'
-QCM_SETTINGS_PATH = 'exercices/qcm_settings.json'
+# Nombre maximal d'énoncés déjà générés rappelés dans le prompt des tours suivants
+QCM_AVOID_LIMIT = 30
 
 def load_qcm_settings():
     """
-    Charge la configuration des QCM depuis le fichier JSON.
+    Retourne la configuration des QCM (depuis le cache de qcm_settings.py).
     
     Returns:
-        Un dictionnaire contenant la configuration ou None si le fichier n'existe pas
+        Un dictionnaire contenant la configuration (valeurs par défaut si le fichier
+        n'existe pas)
     """
-    try:
-        if os.path.exists(QCM_SETTINGS_PATH):
-            with open(QCM_SETTINGS_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except json.JSONDecodeError:
-        print(f"Erreur de décodage JSON dans {QCM_SETTINGS_PATH}")
-    except Exception as e:
-        print(f"Erreur lors du chargement des paramètres QCM: {e}")
-    
-    return None
+    return qcm_settings.get().to_dict()
+
 THEMES = {
     'Troisième': ['Variables et types', 'Conditions', 'Boucles', 'Listes', 'Fonctions de base'],
     'SNT': ['Internet', 'Web', 'Réseaux sociaux', 'Données structurées', 'Informatique embarquée'],
@@ -40,67 +41,159 @@ THEMES = {
     'Terminale Générale': ['Structures de données', 'Bases de données', 'Architectures matérielles', 'Langages et programmation', 'Algorithmique avancée', 'Programmation orientée objet']
 }
 
-def load_qcm_questions():
+# Banque de questions partagée par toutes les requêtes (relue seulement si un fichier change)
+question_bank = QuestionBank(THEMES.keys())
+
+# Écriture des questions par journal en ajout seul (exercices/<niveau>.jsonl)
+question_store = QuestionStore(question_bank)
+
+# Détection des quasi-doublons parmi les questions générées
+deduplicator = BankDeduplicator(question_bank)
+
+def remove_duplicates(level, questions):
     """
-    Charge les questions QCM depuis les fichiers JSON par niveau.
+    Écarte les questions trop proches d'une question de la banque ou du même lot.
+    
+    Args:
+        level: Le niveau scolaire
+        questions: Les nouvelles questions
     
     Returns:
-        Un dictionnaire contenant les questions par niveau
+        Un tuple (questions retenues, doublons écartés)
     """
-    questions = {level: [] for level in THEMES.keys()}
+    kept, rejected = deduplicator.filter(level, questions)
+    for duplicate in rejected:
+        print(f"QCM {level} : quasi-doublon écarté ({duplicate.similarity:.0%}) "
+              f"« {duplicate.question} » ~ « {duplicate.duplicate_of} »")
+    return kept, rejected
+
+def load_qcm_questions():
+    """
+    Retourne les questions QCM de chaque niveau depuis la banque en mémoire.
     
-    for level in THEMES.keys():
-        level_file = f"exercices/{level}.json"
-        
-        # Si le fichier spécifique au niveau n'existe pas, utiliser autre.json
-        if not os.path.exists(level_file):
-            level_file = "exercices/autre.json"
-            
-        if os.path.exists(level_file):
-            try:
-                with open(level_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Gérer soit un tableau direct soit un objet avec sous-tableaux
-                    if isinstance(data, list):  
-                        level_questions = data
-                    elif isinstance(data, dict):
-                        # Prendre le premier tableau trouvé dans le dictionnaire
-                        for key in data:
-                            if isinstance(data[key], list):
-                                level_questions = data[key]
-                                break
-                        else:
-                            level_questions = []
-                    else:
-                        level_questions = []
-                        
-                    questions[level] = level_questions
-            except json.JSONDecodeError:
-                print(f"Erreur de décodage JSON dans {level_file}")
+    Les questions sont converties au format des fichiers JSON (les questions mal
+    formées, écartées par la banque, ne sont pas retournées).
     
-    return questions
+    Returns:
+        Un dictionnaire contenant les questions par niveau
+    """
+    return {level: [question.to_dict() for question in question_bank.questions(level)]
+            for level in THEMES.keys()}
 
 def save_qcm_questions(questions):
     """
-    Sauvegarde les questions QCM dans les fichiers JSON par niveau.
+    Sauvegarde les questions QCM par niveau.
+    
+    Seules les différences avec la banque (questions ajoutées ou supprimées) sont
+    écrites, à la fin du journal du niveau.
     
     Args:
         questions: Un dictionnaire contenant les questions par niveau
     """
     for level, level_questions in questions.items():
-        level_file = f"exercices/{level}.json"
-        
         # Si le niveau est valide et il y a des questions à sauvegarder
         if level in THEMES and level_questions:
             try:
-                # Créer le répertoire si nécessaire
-                os.makedirs(os.path.dirname(level_file), exist_ok=True)
-                
-                with open(level_file, 'w', encoding='utf-8') as f:
-                    json.dump(level_questions, f, ensure_ascii=False, indent=2)
+                question_store.replace(level, level_questions)
             except Exception as e:
                 print(f"Erreur lors de la sauvegarde des questions pour {level}: {e}")
 
+def validate_question(question):
+    """
+    Vérifie qu'une question respecte le format attendu.
+    
+    Args:
+        question: La question à vérifier
+    
+    Returns:
+        True si la question contient un énoncé, au moins deux options, une bonne
+        réponse présente dans les options et une explication
+    """
+    if not isinstance(question, dict):
+        return False
+    options = question.get('options')
+    return (
+        isinstance(question.get('question'), str) and question['question'].strip() != ''
+        and isinstance(options, list) and len(options) >= 2
+        and all(isinstance(option, str) for option in options)
+        and question.get('correct') in options
+        and isinstance(question.get('explanation'), str)
+    )
+
+def extract_questions(response):
+    """
+    Extrait les questions valides d'une réponse de l'IA.
+    
+    Chaque objet est analysé séparément : une question mal formée est écartée sans
+    faire perdre les autres.
+    
+    Args:
+        response: Le texte renvoyé par l'IA (tableau JSON éventuellement entouré de texte)
+    
+    Returns:
+        La liste des questions valides
+        
+    Raises:
+        ValueError: Si aucun objet JSON n'est trouvé dans la réponse
+    """
+    parser = ObjectStreamParser()
+    questions = [q for q in parser.feed(response) if validate_question(q)]
+    
+    if not parser.parsed and not parser.invalid:
+        raise ValueError("Format JSON non trouvé dans la réponse")
+    
+    return questions
+
+def generate_theme_questions(level, theme, ai_provider, on_question=None, avoid=None):
+    """
+    Génère des questions QCM pour un niveau et un thème.
+    
+    La réponse est lue en streaming : chaque question est validée dès que son objet
+    JSON est complet, et les questions invalides sont écartées individuellement.
+    
+    Args:
+        level: Le niveau scolaire
+        theme: Le thème des questions
+        ai_provider: Le fournisseur d'IA à utiliser
+        on_question: Fonction appelée avec chaque question valide dès sa réception
+        avoid: Les énoncés de questions déjà générées, à ne pas reproduire
+    
+    Returns:
+        La liste des questions valides générées, chacune annotée de son thème
+        
+    Raises:
+        RuntimeError: Si le fournisseur d'IA renvoie une erreur
+        ValueError: Si la réponse ne contient aucun objet JSON
+    """
+    prompt = get_qcm_prompt(level, theme, avoid)
+    parser = ObjectStreamParser()
+    questions = []
+    response = []
+    
+    with call_site('qcm'):
+        for chunk in ai_provider.stream_text(prompt):
+            response.append(chunk)
+            for question in parser.feed(chunk):
+                if not validate_question(question):
+                    continue
+                question['theme'] = theme
+                questions.append(question)
+                if on_question:
+                    on_question(question)
+    
+    if not parser.parsed and not parser.invalid:
+        response = ''.join(response)
+        if is_error_response(response):
+            raise RuntimeError(' '.join(re.sub(r'<[^>]*>', ' ', response).split()))
+        raise ValueError("Format JSON non trouvé dans la réponse")
+    
+    rejected = parser.parsed + parser.invalid - len(questions)
+    if rejected or parser.incomplete:
+        print(f"QCM {level} / {theme} : {len(questions)} question(s) retenue(s), "
+              f"{rejected} écartée(s){', réponse tronquée' if parser.incomplete else ''}")
+    
+    return questions
+
 def add_questions_to_level(level, count=3, ai_provider_name=None):
     """
     Ajoute des questions QCM pour un niveau donné.
@@ -116,52 +209,123 @@ def add_questions_to_level(level, count=3, ai_provider_name=None):
     if level not in THEMES:
         return 0
     
-    # Charger les questions existantes
-    all_questions = load_qcm_questions()
-    
-    # Initialiser le niveau s'il n'existe pas
-    if level not in all_questions:
-        all_questions[level] = []
-    
     # Sélectionner un thème aléatoire pour ce niveau
     theme = random.choice(THEMES[level])
     
     # Obtenir le fournisseur d'IA
-    ai_provider = get_ai_provider(ai_provider_name)
-    
-    # Générer le prompt pour l'IA
-    prompt = get_qcm_prompt(level, theme)
+    ai_provider = get_ai_provider(ai_provider_name) if ai_provider_name else get_ai_provider()
     
-    # Générer les questions avec l'IA
-    response = ai_provider.generate_text(prompt)
-    
-    # Extraire les questions du format JSON
+    # Générer et extraire les questions
     try:
-        # Trouver le début et la fin du JSON dans la réponse
-        start_idx = response.find('[')
-        end_idx = response.rfind(']') + 1
-        
-        if start_idx >= 0 and end_idx > start_idx:
-            json_str = response[start_idx:end_idx]
-            new_questions = json.loads(json_str)
-            
-            # Ajouter les questions au niveau
-            all_questions[level].extend(new_questions)
-            
-            # Sauvegarder les questions
-            save_qcm_questions(all_questions)
-            
-            return len(new_questions)
-        else:
-            print(f"Format JSON non trouvé dans la réponse pour le niveau {level}")
-            return 0
-    except json.JSONDecodeError as e:
+        new_questions = generate_theme_questions(level, theme, ai_provider)
+    except (ValueError, jsonio.JSONDecodeError) as e:
         print(f"Erreur de décodage JSON pour le niveau {level}: {e}")
-        print(f"Réponse: {response}")
         return 0
     except Exception as e:
         print(f"Erreur lors de l'ajout de questions pour le niveau {level}: {e}")
         return 0
+    
+    # Écarter les reformulations de questions existantes
+    new_questions, _ = remove_duplicates(level, new_questions)
+    
+    if new_questions:
+        # Ajouter uniquement les nouvelles questions au journal du niveau
+        try:
+            question_store.add(level, new_questions)
+        except Exception as e:
+            print(f"Erreur lors de la sauvegarde des questions pour {level}: {e}")
+            return 0
+    
+    return len(new_questions)
+
+def bulk_generate_questions(levels=None, rounds=1, concurrency=4, ai_provider_name=None, progress=None,
+                            duplicates=None):
+    """
+    Génère des questions QCM en parallèle pour chaque couple (niveau, thème).
+    
+    Les générations sont réparties sur un groupe de threads limité à `concurrency`
+    appels simultanés. Les tours d'un même couple s'enchaînent : chaque tour part
+    après le précédent, avec un prompt qui rappelle les questions déjà obtenues, pour
+    ne pas envoyer deux fois le même prompt en même temps. Les réponses sont extraites
+    et validées dès leur arrivée, puis (quasi-doublons écartés) ajoutées au journal de
+    leur niveau.
+    
+    Args:
+        levels: Les niveaux à compléter (tous les niveaux par défaut)
+        rounds: Le nombre de générations par couple (niveau, thème)
+        concurrency: Le nombre maximum d'appels simultanés à l'IA
+        ai_provider_name: Le nom du fournisseur d'IA à utiliser
+        progress: Fonction appelée après chaque génération avec
+            (terminées, total, niveau, thème, questions ajoutées, erreur)
+        duplicates: Liste complétée avec les quasi-doublons écartés (niveau, Duplicate)
+    
+    Returns:
+        Un dictionnaire {niveau: {thème: nombre de questions ajoutées}}, sans les
+        quasi-doublons écartés
+    """
+    levels = [level for level in (levels or THEMES.keys()) if level in THEMES]
+    ai_provider = get_ai_provider(ai_provider_name) if ai_provider_name else get_ai_provider()
+    
+    pairs = [(level, theme) for level in levels for theme in THEMES[level]]
+    total = len(pairs) * max(0, rounds)
+    new_questions = {level: [] for level in levels}
+    report = {level: {theme: 0 for theme in THEMES[level]} for level in levels}
+    asked = {pair: [] for pair in pairs}
+    remaining = {pair: max(0, rounds) for pair in pairs}
+    done = 0
+    
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {}
+        
+        def submit(pair):
+            remaining[pair] -= 1
+            avoid = asked[pair][-QCM_AVOID_LIMIT:]
+            future = executor.submit(generate_theme_questions, pair[0], pair[1], ai_provider, avoid=avoid)
+            futures[future] = pair
+        
+        for pair in pairs:
+            if remaining[pair] > 0:
+                submit(pair)
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                level, theme = pair = futures.pop(future)
+                error = None
+                try:
+                    questions = future.result()
+                except Exception as e:
+                    questions = []
+                    error = str(e)
+                new_questions[level].extend(questions)
+                report[level][theme] += len(questions)
+                asked[pair].extend(question['question'] for question in questions)
+                done += 1
+                if progress:
+                    progress(done, total, level, theme, len(questions), error)
+                # Tour suivant du couple, construit sur les questions déjà obtenues
+                if remaining[pair] > 0:
+                    submit(pair)
+    
+    # Écarter les quasi-doublons (banque existante et questions du même lot)
+    for level in levels:
+        kept, rejected = remove_duplicates(level, new_questions[level])
+        kept_ids = {id(question) for question in kept}
+        for question in new_questions[level]:
+            if id(question) not in kept_ids:
+                report[level][question['theme']] -= 1
+        new_questions[level] = kept
+        if duplicates is not None:
+            duplicates.extend((level, duplicate) for duplicate in rejected)
+    
+    # Ajouter les nouvelles questions au journal de chaque niveau modifié
+    for level, questions in new_questions.items():
+        if questions:
+            try:
+                question_store.add(level, questions)
+            except Exception as e:
+                print(f"Erreur lors de la sauvegarde des questions pour {level}: {e}")
+    
+    return report
 
 def get_random_questions(level, count=10):
     """
@@ -174,16 +338,15 @@ def get_random_questions(level, count=10):
     Returns:
         Une liste de questions
     """
-    all_questions = load_qcm_questions()
+    questions = question_bank.questions(level)
     
-    if level not in all_questions or not all_questions[level]:
+    if not questions:
         return []
     
     # Sélectionner des questions aléatoires
-    questions = all_questions[level]
     selected = random.sample(questions, min(count, len(questions)))
     
-    return selected
+    return [question.to_dict() for question in selected]
 
 def clear_questions(level=None):
     """
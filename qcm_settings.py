@@ -0,0 +1,149 @@
+"""
+Module des paramètres des QCM (exercices/qcm_settings.json).
+
+Les paramètres sont lus une fois puis gardés en mémoire : le fichier n'est relu que
+si sa date de modification ou sa taille a changé, et cette vérification n'a lieu
+qu'une fois toutes les QCM_SETTINGS_REFRESH_INTERVAL secondes. Les modifications
+passent par update(), qui écrit le fichier de façon atomique sous verrou et met le
+cache à jour immédiatement ; les autres workers voient le changement de date du
+fichier à leur vérification suivante.
+"""
+
+import os
+import logging
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import jsonio
+from exercise_store import FileLock, atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Paramètres du cache (valeurs de .env si disponibles)
+QCM_SETTINGS_PATH = os.getenv("QCM_SETTINGS_PATH", os.path.join('exercices', 'qcm_settings.json'))
+QCM_SETTINGS_REFRESH_INTERVAL = float(os.getenv("QCM_SETTINGS_REFRESH_INTERVAL", 1))
+
+# Nombre de questions par défaut d'un défi, par niveau scolaire
+DEFAULT_QUESTIONS_PAR_NIVEAU = {
+    'Troisième': 10,
+    'SNT': 10,
+    'Prépa NSI': 10,
+    'Première Générale': 6,
+    'Terminale Générale': 6
+}
+DEFAULT_QUESTION_COUNT = 10
+
+
+class QcmSettings(NamedTuple):
+    """Paramètres des QCM (nombre de questions d'un défi par niveau)."""
+    questions_par_niveau: Dict[str, int]
+
+    def question_count(self, level: str) -> int:
+        """Retourne le nombre de questions d'un défi pour un niveau."""
+        return self.questions_par_niveau.get(level, DEFAULT_QUESTION_COUNT)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Retourne les paramètres au format du fichier JSON."""
+        return {'questions_par_niveau': dict(self.questions_par_niveau)}
+
+
+def parse_settings(data: Any) -> QcmSettings:
+    """
+    Convertit le contenu du fichier en paramètres typés.
+
+    Les niveaux absents ou dont la valeur n'est pas un entier positif prennent la
+    valeur par défaut.
+    """
+    counts = dict(DEFAULT_QUESTIONS_PAR_NIVEAU)
+    values = data.get('questions_par_niveau') if isinstance(data, dict) else None
+    if isinstance(values, dict):
+        for level, value in values.items():
+            try:
+                count = int(value)
+            except (TypeError, ValueError):
+                logger.warning(f"Nombre de questions invalide pour {level}: {value!r}")
+                continue
+            if count >= 0:
+                counts[level] = count
+    return QcmSettings(counts)
+
+
+DEFAULT_SETTINGS = parse_settings(None)
+
+
+class SettingsStore:
+    """
+    Accès aux paramètres des QCM avec cache validé par la date du fichier.
+
+    Args:
+        path: Chemin du fichier des paramètres
+        refresh_interval: Délai minimal entre deux vérifications du fichier (secondes)
+    """
+
+    def __init__(self, path: str = QCM_SETTINGS_PATH,
+                 refresh_interval: float = QCM_SETTINGS_REFRESH_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._settings = DEFAULT_SETTINGS
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._checked_at: Optional[float] = None
+
+    def get(self) -> QcmSettings:
+        """Retourne les paramètres courants (valeurs par défaut si le fichier n'existe pas)."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return self._settings
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+                signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            except OSError:
+                signature = None
+            if signature is None:
+                self._settings = DEFAULT_SETTINGS
+            elif signature != self._signature:
+                try:
+                    self._settings = parse_settings(jsonio.load(self.path))
+                except jsonio.JSONDecodeError:
+                    logger.error(f"Erreur de décodage JSON dans {self.path}")
+                except OSError as e:
+                    logger.error(f"Erreur lors du chargement des paramètres QCM: {e}")
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            return self._settings
+
+    def update(self, questions_par_niveau: Dict[str, Any]) -> QcmSettings:
+        """
+        Modifie le nombre de questions par niveau et enregistre le fichier.
+
+        Args:
+            questions_par_niveau: Nouvelles valeurs (les niveaux absents sont conservés)
+
+        Returns:
+            Les nouveaux paramètres
+
+        Raises:
+            ValueError: Si une valeur n'est pas un entier positif
+        """
+        counts = {}
+        for level, value in questions_par_niveau.items():
+            count = int(value)
+            if count < 0:
+                raise ValueError(f"Nombre de questions négatif pour {level}")
+            counts[level] = count
+        with self._file_lock:
+            self._checked_at = None
+            current = self.get()
+            settings = QcmSettings(dict(current.questions_par_niveau, **counts))
+            st = atomic_write(self.path, jsonio.dumps(settings.to_dict()))
+            with self._lock:
+                self._settings = settings
+                self._signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+                self._checked_at = time.monotonic()
+        return settings
+
+
+qcm_settings = SettingsStore()
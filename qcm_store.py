@@ -0,0 +1,172 @@
+"""
+Module d'écriture des questions QCM.
+
+Les modifications d'un niveau ne réécrivent pas son fichier : elles sont ajoutées à
+la fin de son journal (exercices/<niveau>.jsonl), une ligne JSON par question ajoutée
+({"op": "add", "id": ..., "question": {...}}) ou supprimée ({"op": "del", "id": ...}).
+L'identifiant d'une question est l'empreinte de son contenu (qcm_bank.question_id).
+Ajouter des questions ne coûte donc que l'écriture des nouvelles lignes, et un arrêt
+brutal ne peut perdre que la ligne en cours d'écriture.
+
+Quand le journal d'un niveau dépasse QCM_LOG_COMPACT_SIZE octets, il est intégré en
+arrière-plan au fichier du niveau (instantané écrit de façon atomique), puis vidé. Un
+arrêt entre ces deux étapes est sans conséquence : rejouer un journal déjà intégré ne
+change pas les questions.
+"""
+
+import os
+import uuid
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Set
+
+import jsonio
+from exercise_store import FileLock, atomic_write
+from qcm_bank import (QCM_DIR, apply_records, compact_question, level_file_path, log_path,
+                      parse_level_questions, question_id, read_log)
+
+logger = logging.getLogger(__name__)
+
+# Taille du journal d'un niveau à partir de laquelle il est compacté (octets)
+QCM_LOG_COMPACT_SIZE = int(os.getenv("QCM_LOG_COMPACT_SIZE", 64 * 1024))
+
+
+def _record_id(question: Dict[str, Any]) -> str:
+    return question_id(question.get('question', ''), question.get('options', []), question.get('correct', ''))
+
+
+class QuestionStore:
+    """
+    Écriture des questions QCM par journal en ajout seul, avec compactage en arrière-plan.
+
+    Args:
+        bank: La banque de questions (qcm_bank.QuestionBank), invalidée après chaque écriture
+        directory: Répertoire des fichiers de questions
+        compact_size: Taille du journal déclenchant le compactage (octets)
+    """
+
+    def __init__(self, bank: Any, directory: str = QCM_DIR, compact_size: int = QCM_LOG_COMPACT_SIZE):
+        self.bank = bank
+        self.directory = directory
+        self.compact_size = compact_size
+        self._locks: Dict[str, FileLock] = {}
+        self._locks_guard = threading.Lock()
+        self._compacting: Set[str] = set()
+        self._threads: List[threading.Thread] = []
+
+    def _lock(self, level: str) -> FileLock:
+        with self._locks_guard:
+            if level not in self._locks:
+                self._locks[level] = FileLock(f"{log_path(level, self.directory)}.lock")
+            return self._locks[level]
+
+    def _append(self, level: str, records: List[Dict[str, Any]]) -> int:
+        """Ajoute des enregistrements au journal d'un niveau (synchronisé sur disque)."""
+        if not records:
+            return 0
+        path = log_path(level, self.directory)
+        content = b''.join(jsonio.dumps(record, compact=True) + b'\n' for record in records)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock(level):
+            with open(path, 'a+b') as f:
+                # Une écriture interrompue a pu laisser une ligne incomplète : la terminer
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        content = b'\n' + content
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+        self.bank.invalidate()
+        if size >= self.compact_size:
+            self.schedule_compaction(level)
+        return len(records)
+
+    def add(self, level: str, questions: Iterable[Dict[str, Any]]) -> int:
+        """
+        Ajoute des questions à un niveau (les questions déjà présentes sont ignorées).
+
+        Returns:
+            Le nombre de questions ajoutées
+        """
+        known = {question.id for question in self.bank.questions(level)}
+        records = []
+        for question in questions:
+            key = _record_id(question)
+            if key not in known:
+                known.add(key)
+                records.append({'op': 'add', 'id': key, 'question': question})
+        return self._append(level, records)
+
+    def delete(self, level: str, ids: Iterable[str]) -> int:
+        """
+        Supprime des questions d'un niveau (enregistrements de suppression).
+
+        Returns:
+            Le nombre de questions supprimées
+        """
+        known = {question.id for question in self.bank.questions(level)}
+        return self._append(level, [{'op': 'del', 'id': key} for key in dict.fromkeys(ids) if key in known])
+
+    def replace(self, level: str, questions: List[Dict[str, Any]]) -> int:
+        """
+        Remplace les questions d'un niveau en n'écrivant que les différences.
+
+        Returns:
+            Le nombre d'enregistrements ajoutés au journal
+        """
+        wanted = {_record_id(question): question for question in questions}
+        current = [question.id for question in self.bank.questions(level)]
+        records = [{'op': 'del', 'id': key} for key in current if key not in wanted]
+        current_ids = set(current)
+        records += [{'op': 'add', 'id': key, 'question': question}
+                    for key, question in wanted.items() if key not in current_ids]
+        return self._append(level, records)
+
+    def compact(self, level: str) -> None:
+        """Intègre le journal d'un niveau à son fichier, puis vide le journal."""
+        journal = log_path(level, self.directory)
+        with self._lock(level):
+            records, _ = read_log(journal) if os.path.exists(journal) else ([], 0)
+            if not any(record.get('op') in ('add', 'del') for record in records):
+                return
+            base_path = level_file_path(level, self.directory)
+            base = parse_level_questions(jsonio.load(base_path)) if os.path.exists(base_path) else []
+            # Les questions mal formées du fichier sont conservées telles quelles
+            entries = {}
+            for position, question in enumerate(base):
+                valid = compact_question(question) is not None
+                entries[_record_id(question) if valid else ('invalid', position)] = question
+            apply_records(entries, records, lambda q: q if compact_question(q) is not None else None)
+            atomic_write(os.path.join(self.directory, f"{level}.json"), jsonio.dumps(list(entries.values())))
+            # Nouveau journal marqué d'une ligne unique : les lecteurs voient qu'il a été remplacé
+            atomic_write(journal, jsonio.dumps({'op': 'compact', 'id': uuid.uuid4().hex}, compact=True) + b'\n')
+        self.bank.invalidate()
+        logger.info(f"QCM {level} : journal compacté ({len(records)} enregistrement(s))")
+
+    def schedule_compaction(self, level: str) -> None:
+        """Lance le compactage d'un niveau en arrière-plan (sauf s'il est déjà en cours)."""
+        with self._locks_guard:
+            if level in self._compacting:
+                return
+            self._compacting.add(level)
+
+        def run():
+            try:
+                self.compact(level)
+            except Exception as e:
+                logger.error(f"Erreur lors du compactage des questions pour {level}: {e}")
+            finally:
+                with self._locks_guard:
+                    self._compacting.discard(level)
+
+        thread = threading.Thread(target=run, name=f"qcm-compact-{level}", daemon=True)
+        self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+        thread.start()
+
+    def wait(self) -> None:
+        """Attend la fin des compactages en cours (avant l'arrêt d'un script)."""
+        for thread in list(self._threads):
+            thread.join()
@@ -0,0 +1,280 @@
+"""
+Module de limitation du débit des appels aux fournisseurs d'IA.
+
+Chaque fournisseur dispose de deux seaux à jetons (token buckets) : un pour les requêtes
+par minute et un pour les tokens par minute. Une requête qui dépasse le quota attend
+son tour dans une file bornée, dans l'ordre d'arrivée, au lieu d'être envoyée puis
+rejetée par l'API avec une erreur 429. Si la file est pleine ou si l'attente dépasse le
+délai maximal, la requête est refusée immédiatement.
+
+Lorsque fcntl est disponible (Linux, macOS), l'état des seaux est conservé dans un
+fichier d'état protégé par un verrou fichier et partagé par tous les processus d'une
+même machine (workers gunicorn) : le quota s'applique à la machine et non à chaque
+worker. Sans fcntl (Windows), chaque processus dispose de son propre quota.
+
+Les quotas se configurent dans .env (0 ou absent pour ne pas limiter) :
+    RATE_LIMIT_MISTRAL_RPM=60
+    RATE_LIMIT_MISTRAL_TPM=500000
+"""
+
+import os
+import time
+import logging
+import tempfile
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows : quotas propres à chaque processus
+    fcntl = None
+
+import jsonio
+from ai_metrics import registry, Counter, Gauge, Histogram
+
+# Paramètres de la file d'attente (valeurs de .env si disponibles)
+RATE_LIMIT_QUEUE_SIZE = int(os.getenv("RATE_LIMIT_QUEUE_SIZE", 50))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 30))
+RATE_LIMIT_DIR = os.getenv(
+    "RATE_LIMIT_DIR", os.path.join(tempfile.gettempdir(), "pyteurcol-rate-limit"))
+
+logger = logging.getLogger(__name__)
+
+# Intervalle maximal entre deux vérifications d'annulation pendant l'attente
+_CHECK_INTERVAL = 0.25
+
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+
+RATE_LIMIT_QUEUE_DEPTH = registry.register(Gauge(
+    "ai_rate_limit_queue_depth", "Requêtes en attente de quota par fournisseur", ("provider",)))
+RATE_LIMIT_WAIT = registry.register(Histogram(
+    "ai_rate_limit_wait_seconds", "Attente de quota avant l'envoi des requêtes", ("provider",), WAIT_BUCKETS))
+RATE_LIMIT_REJECTED = registry.register(Counter(
+    "ai_rate_limit_rejected_total", "Requêtes refusées faute de quota par motif", ("provider", "reason")))
+
+
+class RateLimitExceededError(Exception):
+    """Exception levée quand une requête ne peut pas obtenir de quota à temps."""
+
+    def __init__(self, provider_name: str, reason: str):
+        self.provider_name = provider_name
+        self.reason = reason
+        super().__init__(
+            f"Le service {provider_name} reçoit trop de demandes en ce moment. "
+            "Veuillez réessayer dans quelques instants."
+        )
+
+
+class TokenBucket:
+    """
+    Seau à jetons rempli en continu jusqu'à sa capacité.
+
+    Args:
+        per_minute: Jetons ajoutés par minute (capacité du seau), 0 pour illimité
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.time()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """
+        Temps d'attente avant que `amount` jetons soient disponibles.
+
+        Une demande supérieure à la capacité est ramenée à la capacité pour ne pas
+        bloquer indéfiniment.
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float) -> None:
+        """Retire des jetons du seau (le solde peut devenir négatif pour une demande trop grande)."""
+        if not self.unlimited:
+            self.tokens -= amount
+
+    def to_state(self) -> Dict[str, float]:
+        """Retourne l'état du seau pour le fichier d'état partagé."""
+        return {"tokens": self.tokens, "updated": self.updated}
+
+    def load_state(self, state: Dict[str, float]) -> None:
+        """Reprend l'état écrit par un autre processus."""
+        self.tokens = min(self.capacity, float(state["tokens"]))
+        self.updated = float(state["updated"])
+
+
+class RateLimiter:
+    """
+    Limiteur de débit d'un fournisseur (requêtes et tokens par minute) avec file d'attente.
+
+    Args:
+        name: Nom du fournisseur
+        requests_per_minute: Quota de requêtes par minute (0 pour illimité)
+        tokens_per_minute: Quota de tokens par minute (0 pour illimité)
+        max_queue: Nombre maximal de requêtes en attente
+        max_wait: Attente maximale d'une requête en secondes
+        shared_dir: Répertoire du fichier d'état partagé entre processus
+            (None pour un quota propre au processus courant)
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_queue: int = RATE_LIMIT_QUEUE_SIZE, max_wait: float = RATE_LIMIT_MAX_WAIT,
+                 shared_dir: Optional[str] = RATE_LIMIT_DIR):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.shared_dir = shared_dir if fcntl is not None else None
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        if self.shared_dir and not self.unlimited:
+            try:
+                os.makedirs(self.shared_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Quota partagé entre processus désactivé ({self.shared_dir}): {e}")
+                self.shared_dir = None
+
+    @property
+    def unlimited(self) -> bool:
+        return self.requests.unlimited and self.tokens.unlimited
+
+    def _take(self, tokens: int) -> float:
+        """
+        Consomme le quota d'une requête s'il est disponible.
+
+        Returns:
+            0 si le quota a été consommé, sinon le temps d'attente avant qu'il le soit
+        """
+        if not self.shared_dir:
+            return self._take_local(tokens)
+        state_path = os.path.join(self.shared_dir, f"{self.name}.json")
+        with open(state_path, "a+") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                content = state_file.read()
+                if content:
+                    try:
+                        state = jsonio.loads(content)
+                        self.requests.load_state(state["requests"])
+                        self.tokens.load_state(state["tokens"])
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning(f"État de quota illisible ({state_path}), état local conservé: {e}")
+                wait = self._take_local(tokens)
+                if wait <= 0:
+                    state_file.seek(0)
+                    state_file.truncate()
+                    state_file.write(jsonio.dumps(
+                        {"requests": self.requests.to_state(), "tokens": self.tokens.to_state()},
+                        compact=True).decode("utf-8"))
+                    state_file.flush()
+                return wait
+            finally:
+                fcntl.flock(state_file, fcntl.LOCK_UN)
+
+    def _take_local(self, tokens: int) -> float:
+        """Consomme le quota dans les seaux du processus (voir `_take`)."""
+        now = time.time()
+        wait = max(self.requests.time_until(1, now), self.tokens.time_until(tokens, now))
+        if wait <= 0:
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+        return wait
+
+    def _reject(self, reason: str) -> None:
+        RATE_LIMIT_REJECTED.inc(provider=self.name, reason=reason)
+        raise RateLimitExceededError(self.name, reason)
+
+    def acquire(self, tokens: int = 0, max_wait: Optional[float] = None,
+                check: Optional[Callable[[], None]] = None) -> float:
+        """
+        Attend le quota nécessaire à une requête, dans l'ordre d'arrivée.
+
+        Args:
+            tokens: Nombre de tokens estimé de la requête (prompt et réponse)
+            max_wait: Attente maximale en secondes (par défaut celle du limiteur)
+            check: Fonction appelée pendant l'attente, qui peut lever une exception
+                pour l'interrompre (annulation d'une requête couverte par exemple)
+
+        Returns:
+            Le temps d'attente en secondes
+
+        Raises:
+            RateLimitExceededError: Si la file est pleine ou si le quota n'est pas
+                disponible avant la fin du délai
+        """
+        if self.unlimited:
+            return 0.0
+
+        start = time.monotonic()
+        deadline = start + (self.max_wait if max_wait is None else max_wait)
+        ticket = object()
+
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._reject("queue_full")
+            self._queue.append(ticket)
+            RATE_LIMIT_QUEUE_DEPTH.set(len(self._queue), provider=self.name)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._queue[0] is ticket:
+                        wait = self._take(tokens)
+                        if wait <= 0:
+                            waited = now - start
+                            RATE_LIMIT_WAIT.observe(waited, provider=self.name)
+                            return waited
+                        if now + wait > deadline:
+                            self._reject("deadline")
+                    elif now >= deadline:
+                        self._reject("deadline")
+                    if check is not None:
+                        check()
+                    timeout = deadline - now if wait is None else wait
+                    self._cond.wait(min(timeout, _CHECK_INTERVAL) if check is not None else timeout)
+            finally:
+                self._queue.remove(ticket)
+                RATE_LIMIT_QUEUE_DEPTH.set(len(self._queue), provider=self.name)
+                self._cond.notify_all()
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider_name: str) -> RateLimiter:
+    """
+    Retourne le limiteur de débit d'un fournisseur (créé à la demande).
+
+    Les quotas sont lus dans RATE_LIMIT_<FOURNISSEUR>_RPM et RATE_LIMIT_<FOURNISSEUR>_TPM.
+
+    Args:
+        provider_name: Nom du fournisseur d'IA
+
+    Returns:
+        Le limiteur partagé par tous les appels à ce fournisseur
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider_name)
+        if limiter is None:
+            prefix = f"RATE_LIMIT_{provider_name.upper()}"
+            limiter = _rate_limiters[provider_name] = RateLimiter(
+                provider_name,
+                float(os.getenv(f"{prefix}_RPM", 0)),
+                float(os.getenv(f"{prefix}_TPM", 0)))
+        return limiter
@@ -0,0 +1,329 @@
+"""
+Module de gestion des nouvelles tentatives pour les appels aux API d'IA.
+
+Ce module fournit une logique de nouvelle tentative commune à tous les fournisseurs
+(LocalAI, Gemini, Mistral) : attente exponentielle avec gigue, prise en compte de
+l'en-tête Retry-After, absence de nouvelle tentative sur les codes non récupérables,
+disjoncteur (circuit breaker) et limitation du débit (voir rate_limit.py) par fournisseur.
+"""
+
+import os
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+import requests
+
+import ai_metrics
+from rate_limit import get_rate_limiter, RateLimitExceededError
+
+logger = logging.getLogger(__name__)
+
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Paramètres de l'attente exponentielle (valeurs de .env si disponibles)
+DEFAULT_BACKOFF_MAX = float(os.getenv("DEFAULT_BACKOFF_MAX", 30))
+
+# Paramètres du disjoncteur
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
+
+
+class CircuitOpenError(Exception):
+    """Exception levée quand le disjoncteur d'un fournisseur est ouvert."""
+
+    def __init__(self, provider_name: str, retry_in: float):
+        self.provider_name = provider_name
+        self.retry_in = retry_in
+        super().__init__(
+            f"Le service {provider_name} est temporairement indisponible. "
+            f"Nouvel essai possible dans {int(retry_in) + 1} s."
+        )
+
+
+class RequestCancelledError(Exception):
+    """Exception levée quand une requête est annulée avant une nouvelle tentative."""
+
+
+# Événement d'annulation propre à chaque thread (utilisé par les requêtes couvertes)
+_cancellation = threading.local()
+
+
+def set_cancel_event(event: Optional[threading.Event]) -> None:
+    """
+    Associe un événement d'annulation aux requêtes émises par le thread courant.
+
+    Quand l'événement est déclenché, `send_with_retry` abandonne avant la tentative
+    suivante et interrompt l'attente en cours. Une requête HTTP déjà partie n'est pas
+    interrompue.
+
+    Args:
+        event: L'événement d'annulation, ou None pour le retirer
+    """
+    _cancellation.event = event
+
+
+def get_cancel_event() -> Optional[threading.Event]:
+    """Retourne l'événement d'annulation du thread courant (None si ses requêtes ne sont pas annulables)."""
+    return getattr(_cancellation, "event", None)
+
+
+def _check_cancelled(provider_name: str) -> None:
+    """Lève RequestCancelledError si la requête du thread courant a été annulée."""
+    event = getattr(_cancellation, "event", None)
+    if event is not None and event.is_set():
+        raise RequestCancelledError(f"Requête à {provider_name} annulée")
+
+
+def _wait(delay: float) -> None:
+    """Attend `delay` secondes, ou moins si la requête du thread courant est annulée."""
+    event = getattr(_cancellation, "event", None)
+    if event is None:
+        time.sleep(delay)
+    else:
+        event.wait(delay)
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états (fermé, ouvert, semi-ouvert) pour un fournisseur.
+
+    Après `failure_threshold` échecs consécutifs, le disjoncteur s'ouvre et les appels
+    échouent immédiatement pendant `reset_timeout` secondes. Un seul appel d'essai est
+    ensuite autorisé : s'il réussit le disjoncteur se referme, sinon il se rouvre. Une
+    erreur client (4xx non retentée) ne compte ni comme un succès ni comme un échec.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """État courant du disjoncteur."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        """
+        Vérifie qu'un appel est autorisé.
+
+        Raises:
+            CircuitOpenError: Si le disjoncteur est ouvert
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self._state == self.OPEN and elapsed >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_progress = False
+            if self._state == self.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self) -> None:
+        """Enregistre un appel réussi et referme le disjoncteur."""
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Disjoncteur {self.name} refermé")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_progress = False
+
+    def record_neutral(self) -> None:
+        """Enregistre un appel sans effet sur l'état (erreur client) et libère l'appel d'essai."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        """Enregistre un échec et ouvre le disjoncteur si le seuil est atteint."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Disjoncteur {self.name} ouvert après {self._failures} échec(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider_name: str) -> CircuitBreaker:
+    """
+    Retourne le disjoncteur associé à un fournisseur (créé à la demande).
+
+    Args:
+        provider_name: Nom du fournisseur d'IA
+
+    Returns:
+        Le disjoncteur partagé par tous les appels à ce fournisseur
+    """
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(provider_name)
+        if breaker is None:
+            breaker = _circuit_breakers[provider_name] = CircuitBreaker(provider_name)
+        return breaker
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """Indique si un code HTTP justifie une nouvelle tentative."""
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convertit la valeur d'un en-tête Retry-After en nombre de secondes.
+
+    Args:
+        value: Valeur de l'en-tête (nombre de secondes ou date HTTP)
+
+    Returns:
+        Le délai en secondes, ou None si l'en-tête est absent ou invalide
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def compute_backoff(attempt: int, base_delay: float,
+                    max_delay: float = DEFAULT_BACKOFF_MAX) -> float:
+    """
+    Calcule le délai d'attente avant la tentative suivante ("full jitter").
+
+    Args:
+        attempt: Numéro de la tentative qui vient d'échouer (0 pour la première)
+        base_delay: Délai de base en secondes
+        max_delay: Délai maximum en secondes
+
+    Returns:
+        Un délai aléatoire entre 0 et min(max_delay, base_delay * 2**attempt)
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def send_with_retry(provider_name: str, send: Callable[[], requests.Response],
+                    retry_count: int, retry_delay: float,
+                    max_delay: float = DEFAULT_BACKOFF_MAX, tokens: int = 0) -> requests.Response:
+    """
+    Exécute une requête HTTP avec limitation du débit, nouvelles tentatives et disjoncteur.
+
+    Les erreurs réseau et les codes de `RETRYABLE_STATUS_CODES` sont retentés avec une
+    attente exponentielle avec gigue, ou le délai imposé par Retry-After. Les autres
+    réponses (succès ou erreur client) sont renvoyées immédiatement. Chaque tentative
+    attend d'abord le quota du fournisseur (requêtes et tokens par minute).
+
+    Args:
+        provider_name: Nom du fournisseur (sert de clé au disjoncteur)
+        send: Fonction sans argument qui envoie la requête
+        retry_count: Nombre de nouvelles tentatives autorisées
+        retry_delay: Délai de base entre les tentatives en secondes
+        max_delay: Délai maximum entre deux tentatives en secondes
+        tokens: Nombre de tokens estimé de la requête (prompt et réponse) pour le quota
+
+    Returns:
+        La dernière réponse HTTP obtenue
+
+    Raises:
+        CircuitOpenError: Si le disjoncteur du fournisseur est ouvert
+        RateLimitExceededError: Si le quota du fournisseur n'est pas disponible à temps
+        RequestCancelledError: Si la requête a été annulée (voir `set_cancel_event`)
+        requests.exceptions.RequestException: Si la dernière tentative échoue sur une erreur réseau
+    """
+    breaker = get_circuit_breaker(provider_name)
+    limiter = get_rate_limiter(provider_name)
+    attempt = 0
+
+    while True:
+        _check_cancelled(provider_name)
+        # Attendre le quota du fournisseur, sauf si le disjoncteur refusera l'appel
+        if breaker.state != CircuitBreaker.OPEN:
+            try:
+                limiter.acquire(tokens, check=lambda: _check_cancelled(provider_name))
+            except RateLimitExceededError:
+                ai_metrics.record_attempt_error("rate_limited")
+                raise
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            ai_metrics.record_attempt_error("circuit_open")
+            raise
+        retry_after = None
+        attempt_start = time.monotonic()
+        try:
+            response = send()
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            ai_metrics.record_attempt_error(
+                "timeout" if isinstance(e, requests.exceptions.Timeout) else "network")
+            logger.warning(f"Erreur réseau lors de la requête à {provider_name}: {e}")
+            if attempt >= retry_count or breaker.state == CircuitBreaker.OPEN:
+                raise
+        except BaseException:
+            # Toute autre exception compte comme un échec : l'appel d'essai est libéré
+            breaker.record_failure()
+            raise
+        else:
+            if not is_retryable_status(response.status_code):
+                if response.status_code < 400:
+                    breaker.record_success()
+                else:
+                    # Erreur client : le service répond, mais la requête est en cause
+                    breaker.record_neutral()
+                if response.status_code == 200:
+                    elapsed = getattr(response, "elapsed", None)
+                    ai_metrics.record_first_token(
+                        attempt_start, elapsed.total_seconds() if elapsed is not None else None)
+                else:
+                    ai_metrics.record_attempt_error(response.status_code)
+                return response
+            breaker.record_failure()
+            ai_metrics.record_attempt_error(response.status_code)
+            logger.warning(f"Réponse {response.status_code} de {provider_name} (tentative {attempt + 1})")
+            if attempt >= retry_count or breaker.state == CircuitBreaker.OPEN:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > max_delay:
+                logger.warning(f"Retry-After de {retry_after:.0f} s pour {provider_name}, abandon")
+                return response
+            # Réponse abandonnée : rendre sa connexion au pool (réponses en streaming)
+            response.close()
+
+        delay = retry_after if retry_after is not None else compute_backoff(attempt, retry_delay, max_delay)
+        logger.info(f"Nouvelle tentative vers {provider_name} dans {delay:.2f} s")
+        _wait(delay)
+        ai_metrics.record_retry()
+        attempt += 1
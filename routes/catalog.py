@@ -0,0 +1,145 @@
+"""
+Routes de l'API JSON du catalogue des exercices.
+
+Ce module permet aux pages de charger uniquement la partie du catalogue dont elles ont
+besoin (un niveau scolaire, un thème, une recherche) au lieu de recevoir tout le
+catalogue dans le HTML. Chaque réponse porte un ETag dérivé de l'empreinte du contenu du
+catalogue (le même dans tous les workers et d'un redémarrage à l'autre, et différent dès
+que le contenu change, même modifié hors de l'application) : un navigateur qui renvoie
+cet ETag (If-None-Match) reçoit une réponse 304 vide tant que le catalogue n'a pas changé.
+"""
+
+import os
+from flask import request, jsonify, make_response
+from utils import get_exercise_catalog
+
+# Durée pendant laquelle le navigateur réutilise une réponse sans la revalider (secondes)
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60))
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+
+def paginate(items, page=None, per_page=None):
+    """
+    Découpe une liste en pages d'après les paramètres page et per_page de la requête.
+
+    Args:
+        items: La liste complète
+        page: Numéro de page (à partir de 1), lu dans la requête si absent
+        per_page: Taille de page, lue dans la requête si absente
+
+    Returns:
+        Un dictionnaire (items, page, per_page, total, pages)
+    """
+    page = max(1, page or request.args.get('page', 1, type=int) or 1)
+    per_page = per_page or request.args.get('per_page', DEFAULT_PER_PAGE, type=int) or DEFAULT_PER_PAGE
+    per_page = min(max(1, per_page), MAX_PER_PAGE)
+    total = len(items)
+    start = (page - 1) * per_page
+    return {
+        'items': items[start:start + per_page],
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page
+    }
+
+
+def catalog_response(catalog, build):
+    """
+    Construit une réponse JSON conditionnelle pour un contenu du catalogue.
+
+    Args:
+        catalog: Le catalogue utilisé pour la réponse
+        build: Fonction retournant le contenu (appelée seulement si le client n'a pas
+            déjà cette version)
+
+    Returns:
+        La réponse (304 si l'ETag du client correspond au contenu courant)
+    """
+    etag = f'catalog-{catalog.digest[:16]}'
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        payload = build()
+        if isinstance(payload, tuple):
+            return make_response(jsonify(payload[0]), payload[1])
+        response = make_response(jsonify(dict(payload, version=catalog.version)))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={CATALOG_CACHE_MAX_AGE}'
+    return response
+
+
+def init_routes(app):
+    """
+    Initialise les routes de l'API du catalogue.
+
+    Args:
+        app: L'application Flask
+    """
+
+    @app.route('/api/catalog')
+    def api_catalog():
+        """Route listant les niveaux scolaires avec leur nombre de thèmes et d'exercices."""
+        catalog = get_exercise_catalog()
+
+        def build():
+            niveaux = [{
+                'niveau': niveau,
+                'themes': len(catalog.themes(niveau)),
+                'exercices': sum(len(catalog.difficulties(niveau, theme)) for theme in catalog.themes(niveau))
+            } for niveau in catalog.niveaux()]
+            return {'niveaux': niveaux}
+
+        return catalog_response(catalog, build)
+
+    @app.route('/api/catalog/search')
+    def api_catalog_search():
+        """Route de recherche d'exercices par mots-clés (paramètres q et niveau), paginée."""
+        catalog = get_exercise_catalog()
+
+        def build():
+            query = request.args.get('q', '')
+            if not query.strip():
+                return {'error': 'Paramètre q manquant'}, 400
+            entries = catalog.search(query, request.args.get('niveau'))
+            page = paginate([entry._asdict() for entry in entries])
+            page['exercices'] = page.pop('items')
+            return page
+
+        return catalog_response(catalog, build)
+
+    @app.route('/api/catalog/<niveau>')
+    def api_catalog_niveau(niveau):
+        """Route listant les thèmes d'un niveau scolaire et leurs niveaux de difficulté, paginée."""
+        catalog = get_exercise_catalog()
+
+        def build():
+            if not catalog.has_niveau(niveau):
+                return {'error': 'Ce niveau scolaire n\'existe pas'}, 404
+            themes = [{'thème': theme, 'niveaux': catalog.difficulties(niveau, theme)}
+                      for theme in catalog.themes(niveau)]
+            page = paginate(themes)
+            page['themes'] = page.pop('items')
+            return dict(page, niveau=niveau)
+
+        return catalog_response(catalog, build)
+
+    @app.route('/api/catalog/<niveau>/<path:theme>')
+    def api_catalog_theme(niveau, theme):
+        """Route retournant les exercices d'un thème."""
+        catalog = get_exercise_catalog()
+
+        def build():
+            if not catalog.has_theme(niveau, theme):
+                return {'error': 'Ce thème n\'existe pas pour ce niveau scolaire'}, 404
+            exercices = [{
+                'niveau': entry.difficulte,
+                'description': entry.description,
+                'debutant': entry.debutant
+            } for entry in (catalog.get(niveau, theme, difficulte)
+                            for difficulte in catalog.difficulties(niveau, theme))]
+            return {'niveau': niveau, 'thème': theme, 'niveaux': exercices}
+
+        return catalog_response(catalog, build)
@@ -5,9 +5,10 @@ Ce module contient les routes pour l'éditeur de data.json, qui permet de gérer
 les données des exercices.
 """
 
-import json
 from flask import render_template, request, jsonify
-from utils import _cached_load_exercise_data
+from utils import get_exercise_catalog
+from exercise_store import exercise_store, CatalogError, VersionConflictError
+from catalog_history import catalog_history, HistoryError
 
 def init_routes(app):
     """
@@ -19,13 +20,20 @@ def init_routes(app):
     
     @app.route('/data-editor')
     def data_editor():
-        """Route pour afficher l'éditeur de data.json."""
+        """Route pour afficher l'éditeur de data.json (les données sont chargées par /data-editor/data)."""
         try:
-            with open('exercices/data.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return render_template('data_editor.html', data=data)
+            return render_template('data_editor.html', version=exercise_store.version)
         except Exception as e:
-            return render_template('data_editor.html', error=str(e), data={})
+            return render_template('data_editor.html', error=str(e))
+
+    @app.route('/data-editor/data')
+    def editor_data():
+        """Route pour récupérer les données et la version sur laquelle l'éditeur construit ses modifications."""
+        try:
+            catalog = get_exercise_catalog()
+            return jsonify({'version': catalog.version, 'data': catalog.data})
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
 
     @app.route('/data-editor/save', methods=['POST'])
     def save_data():
@@ -37,14 +45,92 @@ def init_routes(app):
             if not isinstance(data, dict):
                 return jsonify({'error': 'Format de données invalide'}), 400
             
-            # Sauvegarder les données
-            with open('exercices/data.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            # Invalider le cache après modification
-            _cached_load_exercise_data.cache_clear()
+            # Sauvegarder les données (écriture atomique, cache mis à jour)
+            exercise_store.replace(data)
             
             return jsonify({'success': True})
+        except CatalogError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/data-editor/patch', methods=['POST'])
+    def patch_data():
+        """
+        Route pour appliquer une modification partielle de data.json (JSON Patch, RFC 6902).
+
+        Corps attendu : {"base_version": 12, "operations": [{"op": "replace", "path": "...", "value": ...}]}
+        Le patch est refusé (409) si les données ont changé depuis base_version.
+        """
+        try:
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict) or not isinstance(payload.get('operations'), list):
+                return jsonify({'error': 'Format de données invalide'}), 400
+            base_version = payload.get('base_version')
+            if not isinstance(base_version, int) or isinstance(base_version, bool):
+                return jsonify({'error': 'Version de base manquante ou invalide'}), 400
+            
+            exercise_store.apply_patch(payload['operations'], base_version)
+            
+            return jsonify({'success': True, 'version': exercise_store.version})
+        except VersionConflictError as e:
+            return jsonify({'error': str(e), 'version': e.current_version}), 409
+        except CatalogError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/data-editor/history')
+    def history():
+        """Route pour lister les versions enregistrées du catalogue."""
+        try:
+            return jsonify({'version': exercise_store.version, 'versions': catalog_history.entries()})
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/data-editor/history/<int:version>')
+    def history_version(version):
+        """Route pour récupérer les données d'une version du catalogue."""
+        try:
+            return jsonify({'version': version, 'data': catalog_history.rebuild(version)})
+        except HistoryError as e:
+            return jsonify({'error': str(e)}), 404
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/data-editor/history/diff')
+    def history_diff():
+        """Route pour comparer deux versions du catalogue (opérations JSON Patch de from à to)."""
+        try:
+            from_version = request.args.get('from', type=int)
+            to_version = request.args.get('to', type=int, default=exercise_store.version)
+            if from_version is None:
+                return jsonify({'error': 'Paramètres manquants'}), 400
+            return jsonify({'from': from_version, 'to': to_version,
+                            'operations': catalog_history.diff(from_version, to_version)})
+        except HistoryError as e:
+            return jsonify({'error': str(e)}), 404
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/data-editor/rollback', methods=['POST'])
+    def rollback():
+        """Route pour ramener le catalogue à une version antérieure."""
+        try:
+            version = request.json.get('version')
+            base_version = request.json.get('base_version')
+            if not isinstance(version, int) or isinstance(version, bool):
+                return jsonify({'error': 'Version invalide'}), 400
+            
+            exercise_store.rollback(version, base_version)
+            
+            return jsonify({'success': True, 'version': exercise_store.version})
+        except HistoryError as e:
+            return jsonify({'error': str(e)}), 404
+        except VersionConflictError as e:
+            return jsonify({'error': str(e), 'version': e.current_version}), 409
+        except CatalogError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -57,22 +143,12 @@ def init_routes(app):
             if not niveau or not isinstance(niveau, str):
                 return jsonify({'error': 'Niveau invalide'}), 400
             
-            # Charger les données existantes
-            with open('exercices/data.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Vérifier si le niveau existe déjà
-            if niveau in data:
-                return jsonify({'error': 'Ce niveau existe déjà'}), 400
-            
-            # Ajouter le nouveau niveau
-            data[niveau] = []
-            
-            # Sauvegarder les données
-            with open('exercices/data.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Ajouter le nouveau niveau (erreur si le niveau existe déjà)
+            exercise_store.add_niveau(niveau)
             
             return jsonify({'success': True})
+        except CatalogError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -86,30 +162,12 @@ def init_routes(app):
             if not niveau or not theme or not isinstance(niveau, str) or not isinstance(theme, str):
                 return jsonify({'error': 'Données invalides'}), 400
             
-            # Charger les données existantes
-            with open('exercices/data.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Vérifier si le niveau existe
-            if niveau not in data:
-                return jsonify({'error': 'Ce niveau n\'existe pas'}), 400
-            
-            # Vérifier si le thème existe déjà
-            for t in data[niveau]:
-                if t.get('thème') == theme:
-                    return jsonify({'error': 'Ce thème existe déjà pour ce niveau'}), 400
-            
-            # Ajouter le nouveau thème
-            data[niveau].append({
-                'thème': theme,
-                'niveaux': []
-            })
-            
-            # Sauvegarder les données
-            with open('exercices/data.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Ajouter le nouveau thème (erreur si le niveau n'existe pas ou si le thème existe déjà)
+            exercise_store.add_theme(niveau, theme)
             
             return jsonify({'success': True})
+        except CatalogError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -133,44 +191,12 @@ def init_routes(app):
             except:
                 return jsonify({'error': 'Le niveau de difficulté doit être un nombre'}), 400
             
-            # Charger les données existantes
-            with open('exercices/data.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Vérifier si le niveau scolaire existe
-            if niveau_scolaire not in data:
-                return jsonify({'error': 'Ce niveau scolaire n\'existe pas'}), 400
-            
-            # Trouver le thème
-            theme_found = False
-            for t in data[niveau_scolaire]:
-                if t.get('thème') == theme:
-                    theme_found = True
-                    
-                    # Vérifier si le niveau de difficulté existe déjà
-                    for n in t.get('niveaux', []):
-                        if n.get('niveau') == niveau_difficulte:
-                            return jsonify({'error': 'Ce niveau de difficulté existe déjà pour ce thème'}), 400
-                    
-                    # Ajouter le nouvel exercice
-                    t['niveaux'].append({
-                        'niveau': niveau_difficulte,
-                        'description': description,
-                        'debutant': debutant  # Ajouter le paramètre débutant
-                    })
-                    
-                    # Trier les niveaux par ordre croissant
-                    t['niveaux'] = sorted(t['niveaux'], key=lambda x: x.get('niveau', 0))
-                    break
-            
-            if not theme_found:
-                return jsonify({'error': 'Ce thème n\'existe pas pour ce niveau scolaire'}), 400
-            
-            # Sauvegarder les données
-            with open('exercices/data.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Ajouter l'exercice au thème (les exercices restent triés par difficulté)
+            exercise_store.add_exercice(niveau_scolaire, theme, niveau_difficulte, description, debutant)
             
             return jsonify({'success': True})
+        except CatalogError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -190,20 +216,14 @@ def init_routes(app):
             except:
                 return jsonify({'success': False, 'error': 'Le niveau de difficulté doit être un nombre'}), 400
             
-            # Charger les données existantes
-            with open('exercices/data.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Chercher l'exercice
-            for t in data.get(niveau, []):
-                if t.get('thème') == theme:
-                    for n in t.get('niveaux', []):
-                        if n.get('niveau') == niveau_difficulte:
-                            return jsonify({
-                                'success': True,
-                                'description': n.get('description', ''),
-                                'debutant': n.get('debutant', False)
-                            })
+            # Chercher l'exercice dans le catalogue indexé
+            entry = get_exercise_catalog().get(niveau, theme, niveau_difficulte)
+            if entry is not None:
+                return jsonify({
+                    'success': True,
+                    'description': entry.description,
+                    'debutant': entry.debutant
+                })
             
             return jsonify({'success': False, 'error': 'Exercice non trouvé'}), 404
         except Exception as e:
@@ -229,45 +249,11 @@ def init_routes(app):
             except:
                 return jsonify({'error': 'Le niveau de difficulté doit être un nombre'}), 400
             
-            # Charger les données existantes
-            with open('exercices/data.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Vérifier si le niveau scolaire existe
-            if niveau_scolaire not in data:
-                return jsonify({'error': 'Ce niveau scolaire n\'existe pas'}), 400
-            
-            # Trouver le thème et mettre à jour l'exercice
-            theme_found = False
-            exercice_found = False
-            
-            for t in data[niveau_scolaire]:
-                if t.get('thème') == theme:
-                    theme_found = True
-                    
-                    # Trouver l'exercice par son niveau de difficulté
-                    for i, n in enumerate(t.get('niveaux', [])):
-                        if n.get('niveau') == niveau_difficulte:
-                            exercice_found = True
-                            # Mettre à jour la description
-                            t['niveaux'][i]['description'] = description
-                            # Mettre à jour le paramètre débutant si fourni
-                            if debutant is not None:
-                                t['niveaux'][i]['debutant'] = debutant
-                            break
-                    
-                    break
-            
-            if not theme_found:
-                return jsonify({'error': 'Ce thème n\'existe pas pour ce niveau scolaire'}), 400
-            
-            if not exercice_found:
-                return jsonify({'error': 'Cet exercice n\'existe pas pour ce thème'}), 400
-            
-            # Sauvegarder les données
-            with open('exercices/data.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            # Mettre à jour l'exercice (le paramètre débutant n'est modifié que s'il est fourni)
+            exercise_store.update_exercice(niveau_scolaire, theme, niveau_difficulte, description, debutant)
             
             return jsonify({'success': True})
+        except CatalogError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
@@ -6,38 +6,19 @@ de tester leurs compétences en programmation Python avec des QCM et des exercic
 """
 
 import os
+import sys
 import random
 import time
-import json
 from flask import render_template, request, jsonify, session, redirect, url_for
-from utils import load_exercise_data
-from ai_providers import get_ai_provider
-from prompts import get_exercise_prompt
+from utils import get_exercise_catalog
 from code_execution import execute_python_code
-import sys
-import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from qcm_generator import load_qcm_questions, add_questions_to_level, THEMES, QCM_FILE_PATH, load_qcm_settings
+from qcm_generator import question_bank
+from qcm_settings import qcm_settings
 
 # Constantes
 VALID_LEVELS = ['Troisième', 'SNT', 'Prépa NSI', 'Première Générale', 'Terminale Générale']
 
-# Charger la configuration des QCM
-qcm_settings = load_qcm_settings()
-print(f"Chargement des paramètres QCM depuis qcm_generator.load_qcm_settings(): {qcm_settings}")  # Debug
-if not qcm_settings:
-    print("Utilisation des valeurs par défaut pour les QCM")
-    qcm_settings = {
-        "questions_par_niveau": {
-            'Troisième': 10,
-            'SNT': 10,
-            'Prépa NSI': 10,
-            'Première Générale': 6,
-            'Terminale Générale': 6
-        }
-    }
-QCM_COUNT_BY_LEVEL = qcm_settings['questions_par_niveau']
-QCM_COUNT = 10  # Valeur par défaut
 EXERCISE_WEIGHT = 0.25  # 25% du score total
 QCM_WEIGHT = 0.75  # 75% du score total
 CHALLENGE_TIME = 300  # 5 minutes en secondes
@@ -86,7 +67,7 @@ def init_routes(app):
         if 'defis_data' not in session:
             return redirect(url_for('defis'))
         
-        defis_data = session['defis_data']
+        defis_data = with_qcm_questions(session['defis_data'])
         start_time = session.get('defis_start_time', time.time())
         elapsed_time = time.time() - start_time
         remaining_time = max(0, CHALLENGE_TIME - elapsed_time)
@@ -104,12 +85,12 @@ def init_routes(app):
         if 'defis_data' not in session:
             return redirect(url_for('defis'))
         
-        defis_data = session['defis_data']
+        defis_data = with_qcm_questions(session['defis_data'])
         
-        # Récupérer les réponses aux QCM
+        # Récupérer les réponses aux QCM (un champ par identifiant de question)
         qcm_answers = {}
-        for i in range(len(defis_data['qcm_questions'])):
-            answer_key = f'q{i}'
+        for question in defis_data['qcm_questions']:
+            answer_key = answer_field(question)
             qcm_answers[answer_key] = request.form.get(answer_key)
         
         # Récupérer le code de l'exercice
@@ -147,7 +128,7 @@ def init_routes(app):
 def generate_challenge(level):
     """
     Génère un défi complet (QCM + exercice) pour un niveau donné.
-    Rafraîchit la configuration des QCM à chaque appel.
+    Le nombre de questions vient de la configuration des QCM en cache.
     
     Args:
         level: Le niveau scolaire
@@ -155,109 +136,82 @@ def generate_challenge(level):
     Returns:
         Un dictionnaire contenant les données du défi
     """
-    global QCM_COUNT_BY_LEVEL
-    # Recharger la configuration à chaque génération de défi
-    qcm_settings = load_qcm_settings()
-    if qcm_settings:
-        QCM_COUNT_BY_LEVEL = qcm_settings['questions_par_niveau']
-    # Charger les données des exercices
-    data = load_exercise_data()
+    # Catalogue indexé des exercices
+    catalog = get_exercise_catalog()
     
     # Déterminer le nombre de questions QCM pour ce niveau
-    qcm_count = QCM_COUNT_BY_LEVEL.get(level, QCM_COUNT)
-    
-    # Générer les questions QCM
-    qcm_questions = generate_qcm_questions(level, data, qcm_count)
+    qcm_count = qcm_settings.get().question_count(level)
     
-    # Si aucune question QCM n'est disponible, créer une liste vide
-    if qcm_questions is None:
-        qcm_questions = []
+    # Tirer les questions QCM (seuls leurs identifiants et la graine sont conservés)
+    qcm_ids, qcm_seed = generate_qcm_questions(level, catalog, qcm_count)
     
     # Sélectionner un exercice pratique
-    exercise = select_exercise(level, data)
+    exercise = select_exercise(level, catalog)
     
     return {
         'level': level,
-        'qcm_questions': qcm_questions,
+        'qcm_ids': qcm_ids,
+        'qcm_seed': qcm_seed,
         'exercise': exercise,
         'time_limit': CHALLENGE_TIME
     }
 
-def generate_qcm_questions(level, data, count):
+def generate_qcm_questions(level, catalog, count):
     """
-    Génère des questions QCM pour un niveau donné en utilisant la configuration.
+    Tire les questions QCM d'un défi pour un niveau donné.
     
     Args:
         level: Le niveau scolaire
-        data: Les données des exercices
-        count: Le nombre de questions à générer (peut être spécifié ou utiliser la valeur par défaut)
+        catalog: Le catalogue des exercices
+        count: Le nombre de questions à tirer (limité au nombre disponible)
     
     Returns:
-        Une liste de questions QCM (peut être vide)
+        Un tuple (identifiants des questions, graine) : les questions, options
+        mélangées, sont reconstruites avec question_bank.build(identifiants, graine)
     """
-    global QCM_COUNT_BY_LEVEL
-    questions = []
+    qcm_ids, qcm_seed = question_bank.draw(level, count)
+    if not qcm_ids:
+        print(f"Avertissement: Aucune question trouvée pour le niveau {level}")
+    return qcm_ids, qcm_seed
+
+def with_qcm_questions(defis_data):
+    """
+    Complète les données d'un défi avec ses questions QCM reconstruites.
     
-    try:
-        # Charger les questions depuis les fichiers par niveau
-        all_questions = load_qcm_questions()
-        
-        if not all_questions:
-            print("Avertissement: Aucune question trouvée dans les fichiers QCM")
-            return questions
-        
-        # Vérifier si le niveau existe et contient des questions
-        if level not in all_questions or not all_questions[level]:
-            print(f"Avertissement: Aucune question trouvée pour le niveau {level}")
-            return questions
-        
-        # Sélectionner des questions aléatoires pour ce niveau
-        level_questions = all_questions[level]
-        
-        # Limiter le nombre de questions si nécessaire
-        selected_questions = random.sample(level_questions, min(count, len(level_questions)))
-        
-        # Formater les questions pour l'affichage
-        for q in selected_questions:
-            options = q['options']
-            correct = q['correct']
-            
-            # Créer une copie pour éviter de modifier l'original
-            question = {
-                'question': q['question'],
-                'options': options.copy(),
-                'correct': correct,
-                'explanation': q['explanation']
-            }
-            
-            # Mélanger les options
-            random.shuffle(question['options'])
-            
-            # Mettre à jour l'index de la bonne réponse
-            question['correct_index'] = question['options'].index(correct)
-            
-            questions.append(question)
+    Args:
+        defis_data: Les données du défi (avec qcm_ids et qcm_seed)
     
-    except Exception as e:
-        print(f"Erreur lors de la génération des questions QCM: {str(e)}")
+    Returns:
+        Une copie des données avec la liste qcm_questions
+    """
+    qcm_questions = question_bank.build(defis_data.get('qcm_ids', []), defis_data.get('qcm_seed', 0))
+    return dict(defis_data, qcm_questions=qcm_questions)
+
+def answer_field(question):
+    """
+    Retourne le nom du champ de formulaire de la réponse à une question.
     
-    return questions
+    Le nom dépend de l'identifiant de la question et non de sa position : si une
+    question du tirage a été supprimée ou modifiée depuis, elle n'est plus reconstruite
+    et les réponses aux autres questions restent associées à la bonne question.
+    """
+    return f'q_{question.id}'
 
-def select_exercise(level, data):
+def select_exercise(level, catalog):
     """
     Sélectionne un exercice aléatoire pour un niveau donné.
     
     Args:
         level: Le niveau scolaire
-        data: Les données des exercices
+        catalog: Le catalogue des exercices
     
     Returns:
         Un dictionnaire contenant les informations de l'exercice
     """
-    # Récupérer les thèmes et descriptions pour le niveau
-    level_data = data.get(level, [])
+    # Thèmes précalculés du niveau (seuls ceux qui contiennent des exercices)
+    themes = [theme for theme in catalog.themes(level) if catalog.difficulties(level, theme)]
     
-    if not level_data:
+    if not themes:
         # Créer un exercice par défaut si aucune donnée n'est disponible
         return {
             'theme': 'Algorithmes de base',
@@ -266,21 +220,15 @@ def select_exercise(level, data):
             'debutant': level in ['Troisième', 'SNT', 'Prépa NSI']
         }
     
-    # Sélectionner un thème aléatoire
-    theme_data = random.choice(level_data)
-    theme = theme_data.get('thème', '')
-    
-    # Sélectionner un niveau aléatoire
-    niveau_data = random.choice(theme_data.get('niveaux', []))
-    description = niveau_data.get('description', '')
-    niveau = niveau_data.get('niveau', 1)
-    debutant = niveau_data.get('debutant', False)
+    # Sélectionner un thème aléatoire, puis un niveau aléatoire
+    theme = random.choice(themes)
+    entry = catalog.get(level, theme, random.choice(catalog.difficulties(level, theme)))
     
     return {
-        'theme': theme,
-        'description': description,
-        'niveau': niveau,
-        'debutant': debutant
+        'theme': entry.theme,
+        'description': entry.description,
+        'niveau': entry.difficulte,
+        'debutant': entry.debutant
     }
 
 def calculate_score(defis_data, qcm_answers, exercise_code):
@@ -300,23 +248,22 @@ def calculate_score(defis_data, qcm_answers, exercise_code):
     qcm_score = 0
     qcm_details = []
     
-    for i, question in enumerate(defis_data['qcm_questions']):
-        answer_key = f'q{i}'
-        user_answer = qcm_answers.get(answer_key)
+    for question in defis_data['qcm_questions']:
+        user_answer = qcm_answers.get(answer_field(question))
         
         if user_answer is not None:
-            correct_option = question['options'][question['correct_index']]
+            correct_option = question.options[question.correct_index]
             is_correct = (user_answer == correct_option)
             
             if is_correct:
                 qcm_score += 1
             
             qcm_details.append({
-                'question': question['question'],
+                'question': question.question,
                 'user_answer': user_answer,
                 'correct_answer': correct_option,
                 'is_correct': is_correct,
-                'explanation': question['explanation']
+                'explanation': question.explanation
             })
     
     # Normaliser le score des QCM (sur 100)
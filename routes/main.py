@@ -6,13 +6,16 @@ la page des exercices, le bac à sable, etc.
 """
 
 from flask import render_template, request, jsonify, session, redirect, url_for
-from ai_providers import get_ai_provider
+from ai_providers import get_ai_provider, is_error_response
+from ai_metrics import call_site
 from prompts import get_exercise_prompt
-from utils import find_exercise_description, load_exercise_data
+from utils import find_exercise_description, get_exercise_catalog
 from code_execution import execute_python_code, AsyncCodeExecutor
+from exercise_pool import exercise_pool
+from evaluation_cache import evaluation_cache
 
 # Constantes
-VALID_PROVIDERS = ['localai', 'gemini', 'mistral']
+VALID_PROVIDERS = ['localai', 'gemini', 'mistral', 'auto']
 DEFAULT_PROVIDER = 'mistral'
 
 # Initialiser le gestionnaire d'exécution
@@ -26,6 +29,9 @@ def init_routes(app):
         app: L'application Flask
     """
     
+    # Démarrer le remplissage de la réserve d'énoncés (si EXERCISE_POOL_SIZE > 0)
+    exercise_pool.start()
+    
     @app.route('/')
     def index():
         """Route principale affichant la page d'accueil."""
@@ -42,8 +48,9 @@ def init_routes(app):
         if 'ai_provider' not in session:
             session['ai_provider'] = DEFAULT_PROVIDER
         
-        data = load_exercise_data()
-        return render_template('index.html', data=data, ai_provider=session['ai_provider'])
+        # Seuls les thèmes du niveau affiché sont envoyés, les autres sont chargés par /api/catalog
+        themes = get_exercise_catalog().themes('Troisième')
+        return render_template('index.html', themes=themes, ai_provider=session['ai_provider'])
 
     @app.route('/sandbox')
     def sandbox():
@@ -81,18 +88,27 @@ def init_routes(app):
         # Trouver la description correspondante et si c'est un exercice pour débutant
         description, debutant = find_exercise_description(niveau, theme, difficulte)
         
-        # Obtenir le fournisseur d'IA approprié
-        ai_provider = get_ai_provider(session.get('ai_provider', DEFAULT_PROVIDER))
-        
-        # Générer l'énoncé avec le fournisseur d'IA
-        prompt = get_exercise_prompt(niveau, theme, difficulte, description, debutant)
-        response = ai_provider.generate_text(prompt)
+        # Utiliser un énoncé pré-généré s'il y en a un en réserve
+        provider_name = session.get('ai_provider', DEFAULT_PROVIDER)
+        response = exercise_pool.pop(niveau, theme, difficulte, description, debutant)
+        prompt_tokens = None
+        
+        if response is not None:
+            provider_name = exercise_pool.provider_name
+        else:
+            # Obtenir le fournisseur d'IA approprié
+            ai_provider = get_ai_provider(provider_name)
+            
+            # Générer l'énoncé avec le fournisseur d'IA
+            prompt = get_exercise_prompt(niveau, theme, difficulte, description, debutant)
+            with call_site('exercise'):
+                response, prompt_tokens = ai_provider.generate_text_with_usage(prompt)
         
         # Stocker l'exercice généré dans la session pour le téléchargement ultérieur
         session['last_exercise'] = {
             'enonce': response,
             'description_originale': description,
-            'provider': session.get('ai_provider', DEFAULT_PROVIDER),
+            'provider': provider_name,
             'debutant': debutant,
             'niveau': niveau,
             'theme': theme,
@@ -102,8 +118,9 @@ def init_routes(app):
         return jsonify({
             'enonce': response,
             'description_originale': description,
-            'provider': session.get('ai_provider', DEFAULT_PROVIDER),
-            'debutant': debutant
+            'provider': provider_name,
+            'debutant': debutant,
+            'prompt_tokens': prompt_tokens
         })
 
 
@@ -117,12 +134,26 @@ def init_routes(app):
         # Obtenir le fournisseur d'IA approprié
         ai_provider = get_ai_provider(session.get('ai_provider', DEFAULT_PROVIDER))
         
-        # Évaluer le code avec le fournisseur d'IA
-        response = ai_provider.evaluate_code(code, enonce)
+        # Réutiliser l'évaluation d'une soumission équivalente par le même modèle si elle existe
+        cache_key = evaluation_cache.make_key(code, enonce, ai_provider.name, getattr(ai_provider, 'model', ''))
+        response = evaluation_cache.get(cache_key)
+        cached = response is not None
+        prompt_tokens = None
+        
+        if not cached:
+            # Évaluer le code avec le fournisseur d'IA
+            with call_site('evaluation'):
+                prompt = ai_provider.evaluation_prompt(code, enonce)
+                response, prompt_tokens = ai_provider.generate_text_with_usage(prompt)
+            
+            if not is_error_response(response):
+                evaluation_cache.put(cache_key, response)
         
         return jsonify({
             'evaluation': response,
-            'provider': session.get('ai_provider', DEFAULT_PROVIDER)
+            'provider': session.get('ai_provider', DEFAULT_PROVIDER),
+            'cached': cached,
+            'prompt_tokens': prompt_tokens
         })
 
 
@@ -0,0 +1,35 @@
+"""
+Routes d'exposition des métriques des appels aux fournisseurs d'IA.
+
+Ce module expose les métriques collectées par ai_metrics au format texte Prometheus
+(par défaut) ou en JSON (paramètre format=json), ainsi que l'état des fournisseurs
+connu de la surveillance en arrière-plan.
+"""
+
+from flask import request, jsonify, Response
+from ai_metrics import registry
+from provider_health import health_checker
+
+def init_routes(app):
+    """
+    Initialise les routes des métriques.
+    
+    Args:
+        app: L'application Flask
+    """
+    
+    # Démarrer la surveillance de l'état des fournisseurs (si HEALTH_CHECK_ENABLED)
+    health_checker.start()
+    
+    @app.route('/metrics')
+    def metrics():
+        """Route exposant les métriques du processus courant."""
+        if request.args.get('format') == 'json':
+            return jsonify(registry.to_dict())
+        
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+    
+    @app.route('/health')
+    def health():
+        """Route retournant l'état des fournisseurs (dernière vérification, sans appel réseau)."""
+        return jsonify(health_checker.statuses())
@@ -0,0 +1,204 @@
+"""
+Module de regroupement des requêtes identiques simultanées ("single-flight").
+
+Quand plusieurs requêtes identiques arrivent en même temps (par exemple une classe
+entière qui ouvre le même exercice), un seul appel est réellement effectué et son
+résultat est partagé avec toutes les requêtes en attente.
+
+Le regroupement fonctionne entre les threads d'un même processus et, lorsque fcntl est
+disponible (Linux, macOS), entre les processus d'une même machine (workers gunicorn) grâce
+à un verrou fichier et à un fichier de résultat partagé.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows : regroupement limité aux threads du processus
+    fcntl = None
+
+import jsonio
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_DIR = os.getenv(
+    "SINGLEFLIGHT_DIR", os.path.join(tempfile.gettempdir(), "pyteurcol-singleflight"))
+SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", 120))
+SINGLEFLIGHT_RESULT_TTL = float(os.getenv("SINGLEFLIGHT_RESULT_TTL", 300))
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Construit une clé de regroupement stable à partir des paramètres d'une requête.
+
+    Returns:
+        Un condensat SHA-256 hexadécimal
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """Appel en cours partagé par plusieurs threads."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Regroupe les appels identiques simultanés en un seul appel.
+
+    Args:
+        shared_dir: Répertoire des verrous et résultats partagés entre processus
+            (None pour limiter le regroupement au processus courant)
+        wait_timeout: Attente maximale du résultat d'un autre processus en secondes
+        result_ttl: Durée de conservation des fichiers de résultat en secondes
+    """
+
+    def __init__(self, shared_dir: Optional[str] = SINGLEFLIGHT_DIR,
+                 wait_timeout: float = SINGLEFLIGHT_WAIT_TIMEOUT,
+                 result_ttl: float = SINGLEFLIGHT_RESULT_TTL):
+        self.shared_dir = shared_dir if fcntl is not None else None
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        if self.shared_dir:
+            try:
+                os.makedirs(self.shared_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"Regroupement inter-processus désactivé ({self.shared_dir}): {e}")
+                self.shared_dir = None
+
+    def do(self, key: str, fn: Callable[[], Any],
+           is_shareable: Callable[[Any], bool] = lambda result: True) -> Tuple[Any, bool]:
+        """
+        Exécute `fn` une seule fois pour tous les appelants simultanés de même clé.
+
+        Args:
+            key: Clé identifiant la requête (voir `make_key`)
+            fn: Fonction sans argument qui effectue l'appel réel
+            is_shareable: Indique si un résultat peut être transmis aux autres processus
+                (les messages d'erreur, par exemple, ne le sont pas)
+
+        Returns:
+            Un tuple (résultat, partagé) où partagé vaut True si le résultat provient
+            de l'appel d'un autre thread ou d'un autre processus
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        shared = False
+        try:
+            if self.shared_dir:
+                call.result, shared = self._do_across_processes(key, fn, is_shareable)
+            else:
+                call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, shared
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        """Chemins du verrou et du fichier de résultat pour une clé."""
+        return (os.path.join(self.shared_dir, f"{key}.lock"),
+                os.path.join(self.shared_dir, f"{key}.json"))
+
+    def _do_across_processes(self, key: str, fn: Callable[[], Any],
+                             is_shareable: Callable[[Any], bool]) -> Tuple[Any, bool]:
+        """Exécute `fn` sous verrou fichier, ou réutilise le résultat d'un autre processus."""
+        lock_path, result_path = self._paths(key)
+        started = time.time()
+
+        with open(lock_path, "a+") as lock_file:
+            # Tentative non bloquante : si elle échoue, un autre processus calcule déjà
+            acquired = self._try_lock(lock_file)
+            if not acquired:
+                deadline = time.monotonic() + self.wait_timeout
+                while not acquired and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    acquired = self._try_lock(lock_file)
+                result = self._read_result(result_path, started)
+                if result is not None:
+                    if acquired:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    return result["value"], True
+            try:
+                value = fn()
+                if acquired and is_shareable(value):
+                    self._write_result(result_path, value)
+                return value, False
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._cleanup()
+
+    @staticmethod
+    def _try_lock(lock_file) -> bool:
+        """Tente de prendre le verrou exclusif sans bloquer."""
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _read_result(result_path: str, not_before: float) -> Optional[Dict[str, Any]]:
+        """Lit le résultat écrit par un autre processus après `not_before`."""
+        try:
+            if os.path.getmtime(result_path) < not_before - 1:
+                return None
+            return jsonio.load(result_path)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_result(result_path: str, value: Any) -> None:
+        """Écrit le résultat de manière atomique pour les autres processus."""
+        tmp_path = f"{result_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(jsonio.dumps({"value": value}, compact=True))
+            os.replace(tmp_path, result_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Impossible de partager le résultat {result_path}: {e}")
+
+    def _cleanup(self) -> None:
+        """Supprime les fichiers de résultat et de verrou périmés."""
+        limit = time.time() - self.result_ttl
+        try:
+            entries = list(os.scandir(self.shared_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+            except OSError:
+                pass
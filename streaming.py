@@ -0,0 +1,78 @@
+"""
+Module de lecture des réponses en streaming des fournisseurs d'IA.
+
+Les API compatibles OpenAI (LocalAI, Mistral) et Gemini (alt=sse) envoient la réponse
+sous forme d'événements "server-sent events" dont chaque ligne "data:" contient un
+fragment JSON. Ce module extrait le texte de ces fragments au fil de l'eau et publie
+la consommation de tokens transmise avec le dernier fragment.
+"""
+
+import logging
+from typing import Any, Dict, Iterator
+
+import ai_metrics
+import jsonio
+
+logger = logging.getLogger(__name__)
+
+
+def iter_sse_data(response) -> Iterator[Dict[str, Any]]:
+    """
+    Parcourt les événements d'une réponse SSE et retourne leurs données JSON.
+
+    Args:
+        response: Réponse requests ouverte avec stream=True
+
+    Returns:
+        Un itérateur sur les objets JSON des lignes "data:" (s'arrête sur [DONE])
+    """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            return
+        try:
+            yield jsonio.loads(payload)
+        except ValueError:
+            logger.warning(f"Fragment de streaming illisible ignoré: {payload[:100]}")
+
+
+def iter_openai_text(response) -> Iterator[str]:
+    """
+    Extrait le texte d'une réponse en streaming au format OpenAI (LocalAI, Mistral).
+
+    La consommation de tokens et la raison de fin du dernier fragment sont publiées
+    dans les métriques de l'appel en cours.
+    """
+    usage: Dict[str, Any] = {}
+    finish_reason = None
+    for chunk in iter_sse_data(response):
+        usage = chunk.get("usage") or usage
+        for choice in chunk.get("choices") or []:
+            finish_reason = choice.get("finish_reason") or finish_reason
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+    ai_metrics.record_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                            finish_reason == "length")
+
+
+def iter_gemini_text(response) -> Iterator[str]:
+    """
+    Extrait le texte d'une réponse en streaming de Gemini (streamGenerateContent, alt=sse).
+
+    La consommation de tokens et la raison de fin du dernier fragment sont publiées
+    dans les métriques de l'appel en cours.
+    """
+    usage: Dict[str, Any] = {}
+    finish_reason = None
+    for chunk in iter_sse_data(response):
+        usage = chunk.get("usageMetadata") or usage
+        for candidate in chunk.get("candidates") or []:
+            finish_reason = candidate.get("finishReason") or finish_reason
+            for part in (candidate.get("content") or {}).get("parts") or []:
+                if part.get("text"):
+                    yield part["text"]
+    ai_metrics.record_usage(usage.get("promptTokenCount"), usage.get("candidatesTokenCount"),
+                            finish_reason == "MAX_TOKENS")
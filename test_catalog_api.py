@@ -0,0 +1,80 @@
+"""
+Script de test des réponses conditionnelles de l'API du catalogue.
+
+Vérifie qu'un client qui renvoie l'ETag reçu obtient une réponse 304 vide tant que le
+catalogue n'a pas changé, et une nouvelle réponse dès que data.json est modifié, y
+compris hors de l'application.
+"""
+
+import os
+import copy
+import json
+import shutil
+import tempfile
+
+from flask import Flask
+
+import utils
+from routes import catalog
+
+DATA = {
+    'Troisième': [
+        {'thème': 'Boucles', 'niveaux': [{'niveau': 1, 'description': 'Compter', 'debutant': True}]}
+    ]
+}
+
+
+def write_data(data):
+    with open(utils.EXERCISE_DATA_PATH, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def make_client():
+    app = Flask(__name__)
+    catalog.init_routes(app)
+    return app.test_client()
+
+
+def reset_cache():
+    utils._exercise_data_cache.update(signature=None, digest=None, racy=False, data={}, version=0)
+
+
+def test_etag_and_not_modified():
+    cwd = os.getcwd()
+    directory = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(directory, 'exercices'))
+        os.chdir(directory)
+        write_data(DATA)
+        reset_cache()
+        client = make_client()
+
+        response = client.get('/api/catalog/Troisième')
+        assert response.status_code == 200
+        assert response.get_json()['themes'][0]['thème'] == 'Boucles'
+        etag = response.headers['ETag']
+        assert 'max-age' in response.headers['Cache-Control']
+
+        for url in ('/api/catalog', '/api/catalog/Troisième', '/api/catalog/Troisième/Boucles'):
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 304 and response.data == b''
+            assert response.headers['ETag'] == etag
+        assert client.get('/api/catalog/Seconde', headers={'If-None-Match': '"autre"'}).status_code == 404
+
+        # data.json modifié hors de l'application : l'ancien ETag ne correspond plus
+        data = copy.deepcopy(DATA)
+        data['Troisième'][0]['thème'] = 'Boucles for'
+        write_data(data)
+        response = client.get('/api/catalog/Troisième', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.get_json()['themes'][0]['thème'] == 'Boucles for'
+    finally:
+        os.chdir(cwd)
+        reset_cache()
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_etag_and_not_modified()
+    print("API du catalogue : OK")
@@ -0,0 +1,64 @@
+"""
+Script de test de l'historique des versions du catalogue.
+
+Vérifie qu'une version se reconstruit à l'identique, y compris après une modification
+de data.json faite hors de l'application entre deux écritures.
+"""
+
+import copy
+import shutil
+import tempfile
+
+from catalog_history import CatalogHistory
+
+
+def make_data(first_theme):
+    return {
+        'Troisième': [
+            {'thème': first_theme, 'niveaux': [{'niveau': 1, 'description': 'Afficher', 'debutant': True}]},
+            {'thème': 'Boucles', 'niveaux': [{'niveau': 1, 'description': 'Compter', 'debutant': True}]}
+        ]
+    }
+
+
+def test_rebuild_after_out_of_band_edit():
+    directory = tempfile.mkdtemp()
+    try:
+        history = CatalogHistory(directory, snapshot_interval=50)
+        v1 = make_data('Afficher des messages avec print')
+        v2 = copy.deepcopy(v1)
+        v2['Troisième'][1]['niveaux'][0]['description'] = 'Compter de 1 à 10'
+        history.record(1, 2, v1, v2)
+
+        # data.json modifié à la main : le numéro de version ne change pas
+        edited = copy.deepcopy(v2)
+        edited['Troisième'][0]['thème'] = 'Affichage'
+        v3 = copy.deepcopy(edited)
+        v3['Troisième'][1]['niveaux'].append({'niveau': 2, 'description': 'Somme', 'debutant': False})
+        history.record(2, 3, edited, v3)
+
+        assert history.rebuild(3) == v3
+        assert history.rebuild(3)['Troisième'][0]['thème'] == 'Affichage'
+        assert history.entries()[-1]['snapshot'] is False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_rebuild_chain_of_deltas():
+    directory = tempfile.mkdtemp()
+    try:
+        history = CatalogHistory(directory, snapshot_interval=50)
+        versions = [make_data(f'Thème {i}') for i in range(5)]
+        for version in range(1, 5):
+            history.record(version, version + 1, versions[version - 1], versions[version])
+        for version in range(1, 6):
+            assert history.rebuild(version) == versions[version - 1]
+        assert sum(entry['snapshot'] for entry in history.entries()) == 1
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_rebuild_after_out_of_band_edit()
+    test_rebuild_chain_of_deltas()
+    print("Historique du catalogue : OK")
@@ -0,0 +1,58 @@
+"""
+Script de test de la notation des QCM du mode Défis.
+
+Vérifie que les réponses restent associées à la bonne question quand une question
+du tirage est supprimée de la banque entre le tirage et la soumission.
+"""
+
+import shutil
+import tempfile
+
+import jsonio
+from qcm_bank import QuestionBank
+from qcm_store import QuestionStore
+from routes import defis
+
+LEVEL = 'Troisième'
+
+
+def make_question(number):
+    """Retourne une question dont la bonne réponse est 'bonne {number}'."""
+    return {
+        'question': f"Question {number} ?",
+        'options': [f"bonne {number}", f"fausse {number}", f"autre {number}"],
+        'correct': f"bonne {number}",
+        'explanation': f"Explication {number}"
+    }
+
+
+def test_deleted_question_between_draw_and_submit():
+    directory = tempfile.mkdtemp()
+    try:
+        jsonio.dump([make_question(i) for i in range(6)], f"{directory}/{LEVEL}.json")
+        bank = QuestionBank([LEVEL], directory, refresh_interval=0)
+        store = QuestionStore(bank, directory)
+
+        # Tirage, puis réponses correctes à toutes les questions affichées
+        ids, seed = bank.draw(LEVEL, 4, seed=1234)
+        shown = bank.build(ids, seed)
+        answers = {defis.answer_field(q): q.options[q.correct_index] for q in shown}
+
+        # La deuxième question du tirage est supprimée avant la soumission
+        store.delete(LEVEL, [ids[1]])
+        rebuilt = bank.build(ids, seed)
+        assert [q.id for q in rebuilt] == [ids[0]] + ids[2:]
+
+        defis_data = {'qcm_questions': rebuilt, 'exercise': {'niveau': 1}}
+        score, details = defis.calculate_score(defis_data, answers, '')
+        assert details['qcm_total'] == 3
+        assert details['qcm_score'] == 3
+        assert all(detail['is_correct'] for detail in details['qcm_details'])
+        assert [d['question'] for d in details['qcm_details']] == [q.question for q in rebuilt]
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_deleted_question_between_draw_and_submit()
+    print("Notation des défis : OK")
@@ -0,0 +1,94 @@
+"""
+Script de test du catalogue des exercices stocké en base SQLite.
+
+Vérifie l'aller-retour JSON → base → JSON et que deux processus (simulés par deux
+magasins sur la même base) ne peuvent pas modifier le catalogue à partir de la même
+version : le second batch() attend la fin du premier et lit la nouvelle version.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+import exercise_db
+from exercise_db import SQLExerciseStore
+
+DATA = {
+    'Troisième': [
+        {'thème': 'Boucles', 'niveaux': [
+            {'niveau': 1, 'description': 'Compter', 'debutant': True},
+            {'niveau': 2, 'description': 'Somme', 'debutant': False}
+        ]}
+    ],
+    'Seconde': []
+}
+
+
+def make_store(directory):
+    return SQLExerciseStore('sqlite:///' + os.path.join(directory, 'catalogue.db'))
+
+
+def setup_module(module=None):
+    # L'historique des versions n'a pas sa place dans ces tests
+    exercise_db.record_history = lambda *args: None
+
+
+def test_import_export_round_trip():
+    directory = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(directory, 'data.json'), 'w', encoding='utf-8') as f:
+            json.dump(DATA, f, ensure_ascii=False)
+        store = make_store(directory)
+        assert store.import_json(os.path.join(directory, 'data.json')) == 2
+        assert store.load() == DATA
+        assert store.export_json(os.path.join(directory, 'export.json')) == 2
+        with open(os.path.join(directory, 'export.json'), encoding='utf-8') as f:
+            assert json.load(f) == DATA
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_concurrent_batches_are_serialized():
+    directory = tempfile.mkdtemp()
+    try:
+        first, second = make_store(directory), make_store(directory)
+        first.replace(DATA)
+        base_version = first.version
+        inside, release = threading.Event(), threading.Event()
+
+        def hold_batch():
+            with first.batch():
+                first.add_theme('Seconde', 'Listes')
+                inside.set()
+                release.wait(5)
+
+        holder = threading.Thread(target=hold_batch)
+        holder.start()
+        inside.wait(5)
+        seen = []
+        reader = threading.Thread(target=lambda: seen.append(_version_in_batch(second)))
+        reader.start()
+        time.sleep(0.3)
+        # Le second batch attend le verrou d'écriture au lieu de lire l'ancienne version
+        assert not seen
+        release.set()
+        holder.join()
+        reader.join()
+        assert seen == [base_version + 1]
+    finally:
+        shutil.rmtree(directory)
+
+
+def _version_in_batch(store):
+    with store.batch():
+        return store.version
+
+
+if __name__ == "__main__":
+    setup_module()
+    test_import_export_round_trip()
+    test_concurrent_batches_are_serialized()
+    print("Catalogue SQLite : OK")
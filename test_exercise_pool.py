@@ -0,0 +1,92 @@
+"""
+Script de test de la réserve d'énoncés pré-générés.
+
+Vérifie que deux processus (simulés par deux réserves sur le même répertoire) partagent
+les énoncés, qu'un seul d'entre eux remplit la réserve, et qu'un énoncé généré pour une
+ancienne description n'est plus servi.
+"""
+
+import shutil
+import tempfile
+
+import exercise_pool
+from exercise_pool import ExercisePool
+
+CATALOG = [[('Troisième', 'Boucles', 1), 'Compter de 1 à 10', True]]
+
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_text(self, prompt):
+        self.calls += 1
+        return f"Énoncé {self.calls} : " + ("Compter de 1 à 10" if "Compter de 1 à 10" in prompt else "autre")
+
+
+class CatalogPool(ExercisePool):
+    @staticmethod
+    def catalog_entries():
+        for key, description, debutant in CATALOG:
+            yield key, description, debutant
+
+
+def make_pools(directory, provider):
+    exercise_pool.get_ai_provider = lambda name: provider
+    exercise_pool.EXERCISE_POOL_PAUSE = 0
+    return (CatalogPool(size=2, hours="", shared_dir=directory),
+            CatalogPool(size=2, hours="", shared_dir=directory))
+
+
+def test_pool_shared_between_processes():
+    directory = tempfile.mkdtemp()
+    try:
+        provider = FakeProvider()
+        first, second = make_pools(directory, provider)
+        assert first.fill_once() == 2
+        assert second.fill_once() == 0
+        assert provider.calls == 2
+        assert second.pop('Troisième', 'Boucles', 1, 'Compter de 1 à 10', True) == "Énoncé 1 : Compter de 1 à 10"
+        assert first.pop('Troisième', 'Boucles', 1, 'Compter de 1 à 10', True) == "Énoncé 2 : Compter de 1 à 10"
+        assert first.pop('Troisième', 'Boucles', 1, 'Compter de 1 à 10', True) is None
+        assert first.stats()['hits'] == 1 and first.stats()['misses'] == 1
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_single_filler():
+    directory = tempfile.mkdtemp()
+    try:
+        first, second = make_pools(directory, FakeProvider())
+        assert first._become_filler()
+        assert not second._become_filler()
+        first.stop()
+        assert second._become_filler()
+        second.stop()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_edited_description_is_not_served():
+    directory = tempfile.mkdtemp()
+    try:
+        first, _ = make_pools(directory, FakeProvider())
+        first.fill_once()
+        CATALOG[0][1] = 'Compter de 10 à 1'
+        try:
+            assert first.pop('Troisième', 'Boucles', 1, 'Compter de 10 à 1', True) is None
+            # Le remplissage suivant supprime les énoncés de l'ancienne description
+            first.fill_once()
+            assert first.stats()['entries'] == 1
+            assert first.pop('Troisième', 'Boucles', 1, 'Compter de 10 à 1', True).endswith("autre")
+        finally:
+            CATALOG[0][1] = 'Compter de 1 à 10'
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_pool_shared_between_processes()
+    test_single_filler()
+    test_edited_description_is_not_served()
+    print("Réserve d'exercices : OK")
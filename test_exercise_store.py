@@ -0,0 +1,125 @@
+"""
+Script de test du magasin des données des exercices (exercices/data.json).
+
+Vérifie le verrou entre processus, l'écriture atomique, et qu'un patch construit sur
+une version dépassée est refusé sans modifier les données, y compris après une
+modification de data.json faite hors de l'application.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+import utils
+from exercise_store import ExerciseStore, FileLock, VersionConflictError, atomic_write
+
+DATA = {
+    'Troisième': [
+        {'thème': 'Boucles', 'niveaux': [{'niveau': 1, 'description': 'Compter', 'debutant': True}]}
+    ]
+}
+
+
+def write_data(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+class CatalogDirectory:
+    """Répertoire temporaire contenant exercices/data.json, utilisé comme répertoire courant."""
+
+    def __enter__(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'exercices'))
+        write_data(DATA, os.path.join(self.directory, utils.EXERCISE_DATA_PATH))
+        os.chdir(self.directory)
+        self._reset_cache()
+        return ExerciseStore()
+
+    def __exit__(self, *exc_info):
+        os.chdir(self.cwd)
+        self._reset_cache()
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def _reset_cache():
+        utils._exercise_data_cache.update(signature=None, digest=None, racy=False, data={}, version=0)
+
+
+def test_base_version_conflict():
+    with CatalogDirectory() as store:
+        base_version = store.version
+        operation = {'op': 'replace', 'path': '/Troisième/0/niveaux/0/description', 'value': 'Compter de 1 à 10'}
+        store.apply_patch([operation], base_version)
+        assert store.version == base_version + 1
+
+        # Un second patch construit sur la même version est refusé
+        try:
+            store.apply_patch([{**operation, 'value': 'Compter de 10 à 1'}], base_version)
+            raise AssertionError("patch accepté sur une version dépassée")
+        except VersionConflictError as e:
+            assert e.current_version == base_version + 1
+        assert store.load()['Troisième'][0]['niveaux'][0]['description'] == 'Compter de 1 à 10'
+
+
+def test_out_of_band_edit_gets_new_version():
+    with CatalogDirectory() as store:
+        base_version = store.version
+        time.sleep(0.01)
+        edited = {'Troisième': [], 'Seconde': []}
+        write_data(edited, utils.EXERCISE_DATA_PATH)
+        assert store.load() == edited
+        assert store.version > base_version
+        try:
+            store.apply_patch([{'op': 'add', 'path': '/Première', 'value': []}], base_version)
+            raise AssertionError("patch accepté sur le contenu remplacé")
+        except VersionConflictError:
+            pass
+
+
+def test_atomic_write():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'data.json')
+        atomic_write(path, b'{"a": 1}')
+        os.chmod(path, 0o640)
+        st = atomic_write(path, b'{"a": 2}')
+        with open(path, 'rb') as f:
+            assert f.read() == b'{"a": 2}'
+        assert st.st_size == 8
+        assert os.stat(path).st_mode & 0o777 == 0o640
+        assert os.listdir(directory) == ['data.json']
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_file_lock_is_exclusive():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'data.json.lock')
+        # Deux verrous sur le même fichier se comportent comme ceux de deux processus
+        first, second = FileLock(path), FileLock(path)
+        events = []
+        with first:
+            with first:
+                pass  # Réentrant dans le même thread
+            waiter = threading.Thread(target=lambda: (second.acquire(), events.append('acquis'), second.release()))
+            waiter.start()
+            time.sleep(0.2)
+            assert events == []
+        waiter.join(5)
+        assert events == ['acquis']
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_base_version_conflict()
+    test_out_of_band_edit_gets_new_version()
+    test_atomic_write()
+    test_file_lock_is_exclusive()
+    print("Magasin des exercices : OK")
@@ -0,0 +1,88 @@
+"""
+Script de test du fournisseur "auto" (requêtes couvertes).
+
+Vérifie que la réponse rapide du principal est retenue sans requête couverte, qu'un
+principal lent est couvert par le secondaire puis annulé, qu'un échec du principal
+bascule immédiatement sur le secondaire, et que le délai de couverture suit les
+latences observées.
+"""
+
+import threading
+import time
+
+import retry
+from ai_providers import AIProvider, Config, HedgedProvider, is_error_response, latency_tracker
+
+
+class FakeProvider(AIProvider):
+    def __init__(self, name, delay=0.0, error=False):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def _generate_text(self, prompt, max_tokens=100, temperature=0.7):
+        self.calls += 1
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            try:
+                retry._check_cancelled(self.name)
+            except retry.RequestCancelledError:
+                self.cancelled.set()
+                raise
+            time.sleep(0.01)
+        if self.error:
+            return "<h1>Erreur</h1><p>Service indisponible</p>"
+        return f"Réponse de {self.name}"
+
+
+def setup_module(module=None):
+    Config.SINGLEFLIGHT_ENABLED = False
+    Config.HEDGE_DEFAULT_DELAY = 0.1
+    Config.HEDGE_PERCENTILE = 95
+    Config.HEDGE_MIN_SAMPLES = 5
+
+
+def test_fast_primary_is_not_hedged():
+    primary, secondary = FakeProvider("test-rapide"), FakeProvider("test-secours")
+    assert HedgedProvider(primary, secondary).generate_text("q") == "Réponse de test-rapide"
+    assert secondary.calls == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary, secondary = FakeProvider("test-lent", delay=2), FakeProvider("test-secours")
+    start = time.monotonic()
+    assert HedgedProvider(primary, secondary).generate_text("q") == "Réponse de test-secours"
+    assert time.monotonic() - start < 1
+    assert primary.cancelled.wait(1)
+
+
+def test_failed_primary_fails_over():
+    primary, secondary = FakeProvider("test-panne", error=True), FakeProvider("test-secours")
+    assert HedgedProvider(primary, secondary).generate_text("q") == "Réponse de test-secours"
+
+    # Les deux échouent : le message d'erreur du principal est renvoyé
+    primary, secondary = FakeProvider("test-panne", error=True), FakeProvider("test-panne-2", error=True)
+    text = HedgedProvider(primary, secondary).generate_text("q")
+    assert is_error_response(text) and "Service indisponible" in text
+
+
+def test_hedge_delay_follows_observed_latency():
+    provider = HedgedProvider(FakeProvider("test-mesure"), FakeProvider("test-secours"))
+    assert provider.hedge_delay() == Config.HEDGE_DEFAULT_DELAY
+    for latency in [0.2] * 4:
+        latency_tracker.record("test-mesure", latency)
+    assert provider.hedge_delay() == Config.HEDGE_DEFAULT_DELAY
+    for latency in [0.2] * 15 + [3.0]:
+        latency_tracker.record("test-mesure", latency)
+    assert provider.hedge_delay() == 3.0
+
+
+if __name__ == "__main__":
+    setup_module()
+    test_fast_primary_is_not_hedged()
+    test_slow_primary_is_hedged_and_cancelled()
+    test_failed_primary_fails_over()
+    test_hedge_delay_follows_observed_latency()
+    print("Requêtes couvertes : OK")
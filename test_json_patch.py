@@ -0,0 +1,105 @@
+"""
+Script de test de l'application des modifications JSON Patch (RFC 6902).
+
+Vérifie chaque opération, l'échappement des clés, la copie sur écriture (les parties
+non modifiées gardent leur identité), qu'un patch qui échoue ne modifie rien, et que
+le patch calculé par diff() reconstruit exactement le document d'arrivée.
+"""
+
+import copy
+import random
+
+from json_patch import JsonPatchError, apply_patch, diff
+
+DOCUMENT = {
+    'Troisième': [
+        {'thème': 'Boucles', 'niveaux': [{'niveau': 1, 'description': 'Compter', 'debutant': True}]}
+    ],
+    'Seconde': [
+        {'thème': 'Listes', 'niveaux': []}
+    ],
+    'a/b~c': 1
+}
+
+
+def expect_error(operations):
+    before = copy.deepcopy(DOCUMENT)
+    try:
+        apply_patch(DOCUMENT, operations)
+        raise AssertionError(f"patch accepté: {operations}")
+    except JsonPatchError:
+        pass
+    assert DOCUMENT == before
+
+
+def test_operations():
+    exercice = {'niveau': 2, 'description': 'Somme', 'debutant': False}
+    result = apply_patch(DOCUMENT, [
+        {'op': 'test', 'path': '/Troisième/0/thème', 'value': 'Boucles'},
+        {'op': 'add', 'path': '/Troisième/0/niveaux/-', 'value': exercice},
+        {'op': 'replace', 'path': '/Troisième/0/niveaux/0/description', 'value': 'Compter de 1 à 10'},
+        {'op': 'copy', 'from': '/Troisième/0/niveaux/1', 'path': '/Seconde/0/niveaux/0'},
+        {'op': 'move', 'from': '/a~1b~0c', 'path': '/Première'},
+        {'op': 'remove', 'path': '/Troisième/0/niveaux/1'},
+    ])
+    assert result == {
+        'Troisième': [
+            {'thème': 'Boucles', 'niveaux': [{'niveau': 1, 'description': 'Compter de 1 à 10', 'debutant': True}]}
+        ],
+        'Seconde': [{'thème': 'Listes', 'niveaux': [exercice]}],
+        'Première': 1
+    }
+    assert DOCUMENT['Troisième'][0]['niveaux'][0]['description'] == 'Compter'
+
+
+def test_copy_on_write():
+    result = apply_patch(DOCUMENT, [
+        {'op': 'replace', 'path': '/Troisième/0/niveaux/0/description', 'value': 'Compter de 1 à 10'}
+    ])
+    assert result['Seconde'] is DOCUMENT['Seconde']
+    assert result['Troisième'] is not DOCUMENT['Troisième']
+    assert result['Troisième'][0]['thème'] is DOCUMENT['Troisième'][0]['thème']
+
+
+def test_failed_patch_changes_nothing():
+    expect_error([{'op': 'replace', 'path': '/Troisième/0/thème', 'value': 'Listes'},
+                  {'op': 'test', 'path': '/Seconde/0/thème', 'value': 'Boucles'}])
+    expect_error([{'op': 'remove', 'path': '/Quatrième'}])
+    expect_error([{'op': 'add', 'path': '/Troisième/5', 'value': {}}])
+    expect_error([{'op': 'add', 'path': '/Troisième/01', 'value': {}}])
+    expect_error([{'op': 'move', 'from': '/Troisième', 'path': '/Troisième/0'}])
+    expect_error([{'op': 'replace', 'path': 'Troisième', 'value': []}])
+    expect_error([{'op': 'add', 'path': '/Seconde'}])
+    expect_error([{'op': 'rename', 'path': '/Seconde'}])
+
+
+def test_diff_round_trip():
+    new = copy.deepcopy(DOCUMENT)
+    new['Troisième'][0]['niveaux'].insert(0, {'niveau': 0, 'description': 'Afficher', 'debutant': True})
+    new['Troisième'][0]['niveaux'][1]['debutant'] = False
+    new['Seconde'] = []
+    new['a/b~c'] = '1'
+    del new['Troisième'][0]['thème']
+    new['Première'] = [{'thème': 'Fonctions', 'niveaux': []}]
+    for old, target in [(DOCUMENT, new), (new, DOCUMENT), (DOCUMENT, DOCUMENT), (DOCUMENT, [1, 2]), (1, True)]:
+        operations = diff(old, target)
+        result = apply_patch(old, operations)
+        assert result == target and type(result) is type(target), operations
+    assert diff(DOCUMENT, copy.deepcopy(DOCUMENT)) == []
+
+
+def test_diff_round_trip_on_lists():
+    rng = random.Random(1234)
+    for _ in range(200):
+        old = [rng.randrange(5) for _ in range(rng.randrange(8))]
+        new = [rng.randrange(5) for _ in range(rng.randrange(8))]
+        assert apply_patch(old, diff(old, new)) == new, (old, new)
+
+
+if __name__ == "__main__":
+    test_operations()
+    test_copy_on_write()
+    test_failed_patch_changes_nothing()
+    test_diff_round_trip()
+    test_diff_round_trip_on_lists()
+    print("JSON Patch : OK")
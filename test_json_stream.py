@@ -0,0 +1,77 @@
+"""
+Script de test de l'analyse incrémentale des objets JSON d'un flux de texte.
+
+Vérifie qu'un objet est retourné dès que son accolade fermante arrive, quel que soit
+le découpage du texte, que les défauts courants des réponses de l'IA sont corrigés, et
+qu'un objet invalide ou coupé est écarté sans faire perdre les autres.
+"""
+
+from json_stream import ObjectStreamParser, parse_object
+
+RESPONSE = (
+    "Voici les questions :\n```json\n[\n"
+    '  {"question": "Que vaut 2 ** 3 ?", "options": ["6", "8", "9"], "correct": "8"},\n'
+    '  {"question": "Quel symbole ouvre un bloc { en Python ?", "options": [":", "{"], "correct": ":"}\n'
+    "]\n```\nBonne révision !"
+)
+
+
+def feed_all(parser, chunks):
+    objects = []
+    for chunk in chunks:
+        objects.extend(parser.feed(chunk))
+    return objects
+
+
+def test_any_chunking_gives_the_same_objects():
+    expected = feed_all(ObjectStreamParser(), [RESPONSE])
+    assert [obj['correct'] for obj in expected] == ["8", ":"]
+    for size in (1, 2, 7, 50):
+        parser = ObjectStreamParser()
+        chunks = [RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)]
+        assert feed_all(parser, chunks) == expected
+        assert (parser.parsed, parser.invalid, parser.incomplete) == (2, 0, False)
+
+
+def test_object_returned_as_soon_as_closed():
+    parser = ObjectStreamParser()
+    assert parser.feed('[{"question": "A ?", "correct": "a"') == []
+    assert parser.incomplete
+    assert parser.feed('}, {"question": "B') == [{"question": "A ?", "correct": "a"}]
+    assert parser.incomplete
+
+
+def test_invalid_and_truncated_objects_are_dropped():
+    parser = ObjectStreamParser()
+    objects = feed_all(parser, [
+        '[{"question": "A ?", "correct": "a"},\n',
+        '{"question": "B ?", "correct": },\n',
+        '{"question": "C ?", "correct": "c"},\n',
+        '{"question": "D ?", "options": ["d", "e"',
+    ])
+    assert [obj['question'] for obj in objects] == ["A ?", "C ?"]
+    assert (parser.parsed, parser.invalid, parser.incomplete) == (2, 1, True)
+
+
+def test_nested_objects():
+    parser = ObjectStreamParser()
+    objects = parser.feed('{"question": "A ?", "meta": {"source": "ia"}}')
+    assert objects == [{"source": "ia"}, {"question": "A ?", "meta": {"source": "ia"}}]
+    assert not parser.incomplete
+
+
+def test_common_defects_are_repaired():
+    assert parse_object('{"a": 1, "b": [1, 2,],}') == {"a": 1, "b": [1, 2]}
+    assert parse_object('{"a": "x"\n "b": 2}') == {"a": "x", "b": 2}
+    assert parse_object('{"a": "ligne 1\nligne 2"}') == {"a": "ligne 1\nligne 2"}
+    assert parse_object("{'a': True, 'b': None}") == {"a": True, "b": None}
+    assert parse_object('{"a": }') is None
+
+
+if __name__ == "__main__":
+    test_any_chunking_gives_the_same_objects()
+    test_object_returned_as_soon_as_closed()
+    test_invalid_and_truncated_objects_are_dropped()
+    test_nested_objects()
+    test_common_defects_are_repaired()
+    print("Analyse incrémentale du JSON : OK")
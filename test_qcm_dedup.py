@@ -0,0 +1,63 @@
+"""
+Script de test de la détection des questions QCM en quasi-double.
+
+Vérifie que les reformulations d'une question sont écartées, et que des questions
+différentes qui partagent la même liste d'options sont toutes conservées.
+"""
+
+import shutil
+import tempfile
+
+import jsonio
+from qcm_bank import QuestionBank
+from qcm_dedup import BankDeduplicator
+
+LEVEL = 'Troisième'
+TYPES = ['int', 'float', 'str', 'bool']
+
+
+def make_question(text, options, correct):
+    return {'question': text, 'options': options, 'correct': correct, 'explanation': ''}
+
+
+def make_deduplicator(directory, questions):
+    jsonio.dump(questions, f"{directory}/{LEVEL}.json")
+    return BankDeduplicator(QuestionBank([LEVEL], directory, refresh_interval=0))
+
+
+def test_distinct_questions_with_same_options_are_kept():
+    directory = tempfile.mkdtemp()
+    try:
+        deduplicator = make_deduplicator(directory, [make_question("Quel est le type de 3.5 ?", TYPES, 'float')])
+        new = [
+            make_question('Quel est le type de "3" ?', TYPES, 'str'),
+            make_question("Quel est le type de 3 ?", TYPES, 'int'),
+            make_question("Quel est le type de True ?", TYPES, 'bool'),
+        ]
+        kept, rejected = deduplicator.filter(LEVEL, new)
+        assert kept == new, rejected
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_paraphrases_are_rejected():
+    directory = tempfile.mkdtemp()
+    try:
+        html = ['Hyper Text Markup Language', 'High Tech Modern Language', 'Home Tool Markup Language']
+        deduplicator = make_deduplicator(directory, [make_question("Que signifie HTML ?", html, html[0])])
+        new = [
+            make_question("Que signifie l'acronyme HTML ?", html, html[0]),
+            make_question("Quel mot-clé permet de définir une fonction en Python ?", ['def', 'func', 'lambda'], 'def'),
+            make_question("En Python, quel mot-clé sert à définir une fonction ?", ['def', 'function', 'define'], 'def'),
+        ]
+        kept, rejected = deduplicator.filter(LEVEL, new)
+        assert kept == [new[1]]
+        assert [duplicate.duplicate_of for duplicate in rejected] == ["Que signifie HTML ?", new[1]['question']]
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_distinct_questions_with_same_options_are_kept()
+    test_paraphrases_are_rejected()
+    print("Détection des doublons QCM : OK")
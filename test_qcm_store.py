@@ -0,0 +1,112 @@
+"""
+Script de test du journal en ajout seul des questions QCM et de son compactage.
+
+Vérifie que les ajouts et suppressions sont lus depuis le journal, que le compactage
+les intègre au fichier du niveau sans changer les questions (y compris quand le
+journal est rejoué après un arrêt entre les deux étapes), et qu'une ligne incomplète
+laissée par une écriture interrompue ne fait pas perdre les suivantes.
+"""
+
+import shutil
+import tempfile
+
+import jsonio
+from qcm_bank import QuestionBank, log_path
+from qcm_store import QuestionStore
+
+LEVEL = 'Troisième'
+
+
+def make_question(number):
+    return {
+        'question': f"Question {number} ?",
+        'options': [f"bonne {number}", f"fausse {number}"],
+        'correct': f"bonne {number}",
+        'explanation': ''
+    }
+
+
+def make_store(directory, questions, compact_size=10 ** 9):
+    jsonio.dump(questions, f"{directory}/{LEVEL}.json")
+    bank = QuestionBank([LEVEL], directory, refresh_interval=0)
+    return bank, QuestionStore(bank, directory, compact_size=compact_size)
+
+
+def texts(bank):
+    return sorted(question.question for question in bank.questions(LEVEL))
+
+
+def test_journal_then_compaction():
+    directory = tempfile.mkdtemp()
+    try:
+        bank, store = make_store(directory, [make_question(i) for i in range(3)])
+        assert store.add(LEVEL, [make_question(2), make_question(3)]) == 1
+        first = bank.questions(LEVEL)[0].id
+        assert store.delete(LEVEL, [first, 'inconnu']) == 1
+        expected = texts(bank)
+        assert expected == ["Question 1 ?", "Question 2 ?", "Question 3 ?"]
+        # Le fichier du niveau n'est pas réécrit avant le compactage
+        assert len(jsonio.load(f"{directory}/{LEVEL}.json")) == 3
+
+        store.compact(LEVEL)
+        assert sorted(q['question'] for q in jsonio.load(f"{directory}/{LEVEL}.json")) == expected
+        assert texts(bank) == expected
+        # Une banque neuve lit le même état depuis le seul fichier du niveau
+        assert texts(QuestionBank([LEVEL], directory, refresh_interval=0)) == expected
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_replaying_an_integrated_journal_changes_nothing():
+    directory = tempfile.mkdtemp()
+    try:
+        bank, store = make_store(directory, [make_question(i) for i in range(3)])
+        store.replace(LEVEL, [make_question(1), make_question(4)])
+        journal = log_path(LEVEL, directory)
+        with open(journal, 'rb') as f:
+            records = f.read()
+        store.compact(LEVEL)
+        expected = texts(bank)
+        assert expected == ["Question 1 ?", "Question 4 ?"]
+
+        # Arrêt simulé après l'écriture de l'instantané, avant le vidage du journal
+        with open(journal, 'wb') as f:
+            f.write(records)
+        assert texts(QuestionBank([LEVEL], directory, refresh_interval=0)) == expected
+        store.compact(LEVEL)
+        assert texts(QuestionBank([LEVEL], directory, refresh_interval=0)) == expected
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_interrupted_write_is_terminated():
+    directory = tempfile.mkdtemp()
+    try:
+        bank, store = make_store(directory, [make_question(0)])
+        with open(log_path(LEVEL, directory), 'wb') as f:
+            f.write(b'{"op": "add", "id": "coup')
+        store.add(LEVEL, [make_question(1)])
+        assert texts(bank) == ["Question 0 ?", "Question 1 ?"]
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_compaction_scheduled_past_threshold():
+    directory = tempfile.mkdtemp()
+    try:
+        bank, store = make_store(directory, [], compact_size=1)
+        store.add(LEVEL, [make_question(1)])
+        store.wait()
+        assert [q['question'] for q in jsonio.load(f"{directory}/{LEVEL}.json")] == ["Question 1 ?"]
+        with open(log_path(LEVEL, directory), 'rb') as f:
+            assert b'"compact"' in f.read()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_journal_then_compaction()
+    test_replaying_an_integrated_journal_changes_nothing()
+    test_interrupted_write_is_terminated()
+    test_compaction_scheduled_past_threshold()
+    print("Journal des questions QCM : OK")
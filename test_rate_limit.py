@@ -0,0 +1,83 @@
+"""
+Script de test de la limitation du débit des appels aux fournisseurs d'IA.
+
+Vérifie que le quota est consommé puis rechargé, que la file d'attente est bornée,
+et que deux processus (simulés par deux limiteurs du même fournisseur) se partagent
+un seul quota grâce au fichier d'état.
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+
+from rate_limit import RateLimiter, RateLimitExceededError
+
+
+def expect_rejection(limiter, reason, **kwargs):
+    try:
+        limiter.acquire(**kwargs)
+        raise AssertionError("requête acceptée malgré le quota épuisé")
+    except RateLimitExceededError as e:
+        assert e.reason == reason
+
+
+def test_requests_per_minute():
+    # 600 requêtes par minute : 10 jetons par seconde, capacité 600
+    limiter = RateLimiter("test-rpm", requests_per_minute=600, shared_dir=None)
+    limiter.requests.tokens = 1
+    assert limiter.acquire(max_wait=0) < 0.05
+    expect_rejection(limiter, "deadline", max_wait=0)
+    # Un jeton revient en 0,1 s
+    waited = limiter.acquire(max_wait=1)
+    assert 0.05 <= waited < 0.5
+
+
+def test_tokens_per_minute():
+    limiter = RateLimiter("test-tpm", tokens_per_minute=1000, shared_dir=None)
+    assert limiter.acquire(tokens=900, max_wait=0) < 0.05
+    expect_rejection(limiter, "deadline", tokens=500, max_wait=0)
+    # Une demande supérieure à la capacité attend un seau plein au lieu de bloquer
+    limiter.tokens.tokens = 1000
+    assert limiter.acquire(tokens=5000, max_wait=0) < 0.05
+
+
+def test_queue_full():
+    # 120 requêtes par minute : le seau vide redonne un jeton en 0,5 s
+    limiter = RateLimiter("test-queue", requests_per_minute=120, max_queue=1, shared_dir=None)
+    limiter.requests.tokens = 0
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(limiter.acquire(max_wait=2)))
+    waiter.start()
+    time.sleep(0.1)
+    expect_rejection(limiter, "queue_full", max_wait=2)
+    waiter.join()
+    assert waited and waited[0] >= 0.4
+
+
+def test_quota_shared_between_processes():
+    directory = tempfile.mkdtemp()
+    try:
+        first = RateLimiter("test-shared", requests_per_minute=2, shared_dir=directory)
+        second = RateLimiter("test-shared", requests_per_minute=2, shared_dir=directory)
+        first.acquire(max_wait=0)
+        second.acquire(max_wait=0)
+        # Chaque limiteur a encore des jetons localement, mais le quota de la machine est épuisé
+        expect_rejection(first, "deadline", max_wait=0)
+        expect_rejection(second, "deadline", max_wait=0)
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_unlimited():
+    limiter = RateLimiter("test-unlimited", shared_dir=None)
+    assert all(limiter.acquire(tokens=10**6, max_wait=0) == 0 for _ in range(100))
+
+
+if __name__ == "__main__":
+    test_requests_per_minute()
+    test_tokens_per_minute()
+    test_queue_full()
+    test_quota_shared_between_processes()
+    test_unlimited()
+    print("Limitation du débit : OK")
@@ -0,0 +1,163 @@
+"""
+Script de test des nouvelles tentatives et du disjoncteur des fournisseurs d'IA.
+
+Vérifie les transitions du disjoncteur (fermé, ouvert, semi-ouvert), que l'appel
+d'essai est libéré quelle que soit l'issue de l'appel, qu'une erreur client (4xx) ne
+referme ni n'ouvre le disjoncteur, et le calcul des attentes entre les tentatives
+(gigue, Retry-After).
+"""
+
+import time
+from email.utils import formatdate
+
+import requests
+
+import retry
+from retry import (CircuitBreaker, CircuitOpenError, compute_backoff, parse_retry_after,
+                   send_with_retry)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.elapsed = None
+
+    def close(self):
+        pass
+
+
+def sequence(*outcomes):
+    """Fonction d'envoi qui renvoie (ou lève) les résultats dans l'ordre et compte les appels."""
+    calls = []
+
+    def send():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return send, calls
+
+
+def make_breaker(name, threshold=2, reset_timeout=0.05):
+    breaker = retry._circuit_breakers[name] = CircuitBreaker(name, threshold, reset_timeout)
+    return breaker
+
+
+def send_status(name, status_code):
+    return send_with_retry(name, lambda: FakeResponse(status_code), retry_count=0, retry_delay=0)
+
+
+def test_state_machine():
+    breaker = make_breaker("test-states")
+    assert breaker.state == CircuitBreaker.CLOSED
+    send_status("test-states", 500)
+    assert breaker.state == CircuitBreaker.CLOSED
+    send_status("test-states", 503)
+    assert breaker.state == CircuitBreaker.OPEN
+    try:
+        send_status("test-states", 200)
+        raise AssertionError("appel accepté par un disjoncteur ouvert")
+    except CircuitOpenError:
+        pass
+
+    # Après le délai : un seul appel d'essai, qui rouvre le disjoncteur s'il échoue
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    send_status("test-states", 500)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Un essai réussi referme le disjoncteur
+    time.sleep(0.06)
+    assert send_status("test-states", 200).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_trial_released_after_unexpected_exception():
+    breaker = make_breaker("test-exception", threshold=1)
+    send_status("test-exception", 500)
+    time.sleep(0.06)
+
+    def broken():
+        raise ValueError("réponse inattendue")
+
+    try:
+        send_with_retry("test-exception", broken, retry_count=0, retry_delay=0)
+        raise AssertionError("exception non propagée")
+    except ValueError:
+        pass
+    assert breaker.state == CircuitBreaker.OPEN
+    # L'essai suivant est de nouveau possible après le délai
+    time.sleep(0.06)
+    assert send_status("test-exception", 200).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_error_is_neutral():
+    breaker = make_breaker("test-4xx", threshold=2)
+    send_status("test-4xx", 500)
+    send_status("test-4xx", 400)
+    # Le 400 n'a pas remis le compteur à zéro : un second échec ouvre le disjoncteur
+    send_status("test-4xx", 500)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Pendant l'essai, un 4xx ne referme pas le disjoncteur mais libère l'essai
+    time.sleep(0.06)
+    assert send_status("test-4xx", 404).status_code == 404
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert send_status("test-4xx", 200).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retries_until_success():
+    make_breaker("test-retries", threshold=10)
+    send, calls = sequence(FakeResponse(503), requests.exceptions.ConnectionError("coupure"), FakeResponse(200))
+    assert send_with_retry("test-retries", send, retry_count=3, retry_delay=0.01).status_code == 200
+    assert len(calls) == 3
+
+    # Une erreur client n'est pas retentée
+    send, calls = sequence(FakeResponse(400), FakeResponse(200))
+    assert send_with_retry("test-retries", send, retry_count=3, retry_delay=0.01).status_code == 400
+    assert len(calls) == 1
+
+    # Dernière tentative épuisée : la dernière réponse est renvoyée
+    send, calls = sequence(FakeResponse(500), FakeResponse(502))
+    assert send_with_retry("test-retries", send, retry_count=1, retry_delay=0.01).status_code == 502
+
+
+def test_retry_after():
+    make_breaker("test-retry-after", threshold=10)
+    send, calls = sequence(FakeResponse(429, {"Retry-After": "0.2"}), FakeResponse(200))
+    start = time.monotonic()
+    assert send_with_retry("test-retry-after", send, retry_count=1, retry_delay=0).status_code == 200
+    assert time.monotonic() - start >= 0.2
+
+    # Un Retry-After plus long que le délai maximal abandonne sans attendre
+    send, calls = sequence(FakeResponse(429, {"Retry-After": "120"}), FakeResponse(200))
+    start = time.monotonic()
+    assert send_with_retry("test-retry-after", send, retry_count=3, retry_delay=0, max_delay=10).status_code == 429
+    assert len(calls) == 1 and time.monotonic() - start < 1
+
+    assert parse_retry_after("  3 ") == 3
+    assert parse_retry_after("demain") is None
+    assert 55 <= parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0
+
+
+def test_backoff_bounds():
+    for attempt in range(8):
+        delays = [compute_backoff(attempt, 0.5, max_delay=4) for _ in range(200)]
+        assert all(0 <= delay <= min(4, 0.5 * 2 ** attempt) for delay in delays)
+    # La gigue répartit les attentes au lieu de synchroniser les clients
+    assert len({round(compute_backoff(3, 1), 6) for _ in range(20)}) > 1
+
+
+if __name__ == "__main__":
+    test_state_machine()
+    test_trial_released_after_unexpected_exception()
+    test_client_error_is_neutral()
+    test_retries_until_success()
+    test_retry_after()
+    test_backoff_bounds()
+    print("Disjoncteur et nouvelles tentatives : OK")
@@ -0,0 +1,105 @@
+"""
+Script de test du regroupement des requêtes identiques simultanées (single-flight).
+
+Vérifie qu'un seul appel est effectué pour des appels simultanés de même clé, que les
+erreurs sont transmises aux appelants en attente sans être mémorisées, et que deux
+processus (simulés par deux instances sur le même répertoire) se partagent le
+résultat, sauf quand il n'est pas partageable.
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from singleflight import SingleFlight, make_key
+
+
+def slow_call(calls, value, delay=0.2):
+    def call():
+        calls.append(value)
+        time.sleep(delay)
+        return value
+    return call
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight(shared_dir=None)
+    calls = []
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: flight.do("clé", slow_call(calls, "réponse")), range(5)))
+    assert calls == ["réponse"]
+    assert [value for value, _ in results] == ["réponse"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+
+    # L'appel terminé n'est pas mémorisé : un nouvel appel est effectué
+    assert flight.do("clé", slow_call(calls, "suivante", 0)) == ("suivante", False)
+
+
+def test_errors_are_propagated():
+    flight = SingleFlight(shared_dir=None)
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError("panne")
+
+    errors = []
+
+    def caller(fn):
+        try:
+            flight.do("erreur", fn)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=caller, args=(failing,))
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=caller, args=(lambda: "jamais appelée",))
+    follower.start()
+    leader.join()
+    follower.join()
+    assert errors == ["panne", "panne"]
+
+
+def test_result_shared_between_processes():
+    directory = tempfile.mkdtemp()
+    try:
+        first, second = SingleFlight(directory), SingleFlight(directory)
+        calls = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(first.do, "partage", slow_call(calls, {"texte": "réponse"}))
+            time.sleep(0.05)
+            follower = executor.submit(second.do, "partage", slow_call(calls, {"texte": "autre"}))
+            assert leader.result() == ({"texte": "réponse"}, False)
+            assert follower.result() == ({"texte": "réponse"}, True)
+        assert len(calls) == 1
+
+        # Un résultat non partageable (message d'erreur) est recalculé par l'autre processus
+        calls = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(first.do, "erreur", slow_call(calls, "<h1>Erreur</h1>"),
+                                     lambda result: not result.startswith("<h1>"))
+            time.sleep(0.05)
+            follower = executor.submit(second.do, "erreur", slow_call(calls, "réponse"))
+            assert leader.result() == ("<h1>Erreur</h1>", False)
+            assert follower.result() == ("réponse", False)
+        assert len(calls) == 2
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_make_key():
+    assert make_key("mistral", "codestral", "prompt", 0.7) == make_key("mistral", "codestral", "prompt", 0.7)
+    assert make_key("mistral", "codestral", "prompt", 0.7) != make_key("gemini", "codestral", "prompt", 0.7)
+    assert make_key({"b": 1, "a": 2}) == make_key({"a": 2, "b": 1})
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_are_coalesced()
+    test_errors_are_propagated()
+    test_result_shared_between_processes()
+    test_make_key()
+    print("Regroupement des requêtes : OK")
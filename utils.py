@@ -4,40 +4,212 @@ Fonctions utilitaires pour l'application Flask.
 Ce module contient diverses fonctions utilitaires utilisées dans l'application.
 """
 
-import json
+import os
 import sys
+import time
+import hashlib
+import threading
 import traceback
 from io import StringIO
-from typing import Dict, Any
-from functools import lru_cache
-from datetime import datetime, timedelta
-
-# Cache pour les données d'exercice (expire après 5 minutes)
-@lru_cache(maxsize=1)
-def _cached_load_exercise_data() -> Dict[str, Any]:
-    """Version interne avec cache du chargement des données"""
+from typing import Dict, Any, Optional, Tuple
+
+import jsonio
+from exercise_catalog import ExerciseCatalog
+
+# Chemin du fichier des exercices
+EXERCISE_DATA_PATH = os.path.join('exercices', 'data.json')
+# Numéro de version des données et empreinte du contenu correspondant, partagés entre
+# les workers (écrits par exercise_store)
+EXERCISE_VERSION_PATH = EXERCISE_DATA_PATH + '.version'
+# Stockage du catalogue : "json" (exercices/data.json) ou "sqlite" (tables de la base, voir exercise_db.py)
+EXERCISE_BACKEND = os.getenv('EXERCISE_BACKEND', 'json').lower()
+
+# Un fichier modifié moins de 2 secondes avant sa lecture peut l'être à nouveau sans que
+# sa date change (résolution de certains systèmes de fichiers) : son contenu est alors
+# revérifié à la lecture suivante.
+_RACY_WINDOW_NS = 2_000_000_000
+
+# Cache des données d'exercice, validé par l'identité et la date de modification du fichier
+_exercise_data_cache: Dict[str, Any] = {'signature': None, 'digest': None, 'racy': False, 'data': {}, 'version': 0}
+_exercise_data_lock = threading.Lock()
+
+
+def content_digest(content: bytes) -> str:
+    """Empreinte du contenu de data.json."""
+    return hashlib.sha1(content).hexdigest()
+
+
+def read_persisted_version(path: str = EXERCISE_VERSION_PATH) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Lit le fichier de version de data.json ("<version> <empreinte>").
+
+    Returns:
+        Un tuple (numéro de version, empreinte du contenu de cette version), chaque
+        valeur valant None si elle est absente ou illisible
+    """
     try:
-        with open('exercices/data.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        # Utiliser print au lieu de app.logger car app n'est pas importé ici
-        print(f"Erreur lors du chargement des données d'exercice: {str(e)}")
-        return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            fields = f.read().split()
+    except OSError:
+        return None, None
+    try:
+        version = int(fields[0]) if fields else None
+    except ValueError:
+        return None, None
+    return version, fields[1] if len(fields) > 1 else None
+
+
+def format_persisted_version(version: int, digest: str) -> bytes:
+    """Contenu du fichier de version pour une version et l'empreinte de son contenu."""
+    return f"{version} {digest}\n".encode('utf-8')
+
+
+def _file_signature(st: os.stat_result) -> tuple:
+    """Identité et état d'un fichier : (périphérique, inode, date de modification, taille)."""
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
 
 def load_exercise_data() -> Dict[str, Any]:
     """
     Charge les données des exercices depuis le fichier JSON avec cache.
+
+    Chaque appel ne coûte qu'un stat du fichier : les données ne sont relues que si le
+    fichier a changé (inode, date de modification ou taille), et ne sont réanalysées
+    que si son contenu est différent. Un contenu qui ne correspond pas à l'empreinte du
+    fichier de version a été modifié hors de l'application : il reçoit un nouveau
+    numéro de version (voir ExerciseStore.adopt_external_change).
     
     Returns:
         Dictionnaire contenant les données des exercices
     """
-    # Invalider le cache après 5 minutes
-    if hasattr(load_exercise_data, '_last_load'):
-        if datetime.now() - load_exercise_data._last_load > timedelta(minutes=5):
-            _cached_load_exercise_data.cache_clear()
-    
-    load_exercise_data._last_load = datetime.now()
-    return _cached_load_exercise_data()
+    if EXERCISE_BACKEND == 'sqlite':
+        from exercise_store import exercise_store
+        return exercise_store.load()
+
+    cache = _exercise_data_cache
+    try:
+        st = os.stat(EXERCISE_DATA_PATH)
+    except OSError as e:
+        print(f"Erreur lors du chargement des données d'exercice: {str(e)}")
+        return cache['data']
+
+    signature = _file_signature(st)
+    if cache['signature'] == signature and not cache['racy']:
+        return cache['data']
+
+    with _exercise_data_lock:
+        if cache['signature'] == signature and not cache['racy']:
+            return cache['data']
+        try:
+            read_at = time.time_ns()
+            with open(EXERCISE_DATA_PATH, 'rb') as f:
+                content = f.read()
+                signature = _file_signature(os.fstat(f.fileno()))
+            digest = content_digest(content)
+            external = False
+            if digest != cache['digest']:
+                version, persisted_digest = read_persisted_version()
+                if persisted_digest == digest:
+                    cache['data'] = jsonio.loads(content)
+                    cache['digest'] = digest
+                    cache['version'] = version
+                else:
+                    external = True
+            if not external:
+                cache['signature'] = signature
+                cache['racy'] = signature[2] >= read_at - _RACY_WINDOW_NS
+                return cache['data']
+        except Exception as e:
+            # Utiliser print au lieu de app.logger car app n'est pas importé ici
+            print(f"Erreur lors du chargement des données d'exercice: {str(e)}")
+            # Conserver les dernières données valides et réessayer au prochain appel
+            cache['signature'] = None
+            return cache['data']
+
+    # Le verrou du magasin est toujours pris avant celui du cache (comme lors d'une écriture)
+    from exercise_store import exercise_store
+    try:
+        exercise_store.adopt_external_change(cache['version'])
+    except Exception as e:
+        print(f"Erreur lors du chargement des données d'exercice: {str(e)}")
+        with _exercise_data_lock:
+            cache['signature'] = None
+    return cache['data']
+
+
+def exercise_data_version() -> int:
+    """Retourne le numéro de version des données d'exercice en mémoire (incrémenté à chaque changement)."""
+    if EXERCISE_BACKEND == 'sqlite':
+        from exercise_store import exercise_store
+        return exercise_store.version
+    load_exercise_data()
+    return _exercise_data_cache['version']
+
+
+def publish_exercise_data(data: Dict[str, Any], content: bytes, st: os.stat_result, version: int) -> None:
+    """
+    Remplace les données d'exercice en cache par celles qui viennent d'être écrites.
+
+    Évite de relire et de réanalyser le fichier après une écriture de ce processus.
+
+    Args:
+        data: Les nouvelles données (qui ne doivent plus être modifiées ensuite)
+        content: Le contenu écrit dans le fichier
+        st: Le résultat de stat du fichier écrit
+        version: Le numéro de version enregistré avec ces données
+    """
+    with _exercise_data_lock:
+        cache = _exercise_data_cache
+        cache['data'] = data
+        cache['digest'] = content_digest(content)
+        cache['signature'] = _file_signature(st)
+        cache['racy'] = True
+        cache['version'] = version
+
+
+def invalidate_exercise_data() -> None:
+    """Invalide le cache des données d'exercice (à appeler après toute écriture de data.json)."""
+    with _exercise_data_lock:
+        _exercise_data_cache['signature'] = None
+
+
+def exercise_data_digest(data: Dict[str, Any]) -> str:
+    """
+    Retourne l'empreinte du contenu des données d'exercice.
+
+    Avec data.json, c'est l'empreinte du fichier déjà calculée au chargement ; avec la
+    base SQLite, celle des données sérialisées.
+    """
+    with _exercise_data_lock:
+        if _exercise_data_cache['data'] is data and _exercise_data_cache['digest'] is not None:
+            return _exercise_data_cache['digest']
+    return content_digest(jsonio.dumps(data, compact=True))
+
+
+# Catalogue indexé, reconstruit quand les données chargées changent
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_exercise_catalog() -> ExerciseCatalog:
+    """
+    Retourne le catalogue indexé des exercices pour la version courante des données.
+
+    Le catalogue n'est reconstruit que lorsque le cache des données a été invalidé ;
+    les recherches ne lisent donc jamais le fichier.
+
+    Returns:
+        Le catalogue des exercices
+    """
+    global _catalog
+    data = load_exercise_data()
+    catalog = _catalog
+    if catalog is not None and catalog.data is data:
+        return catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.data is not data:
+            _catalog = ExerciseCatalog(data, exercise_data_version(), exercise_data_digest(data))
+        return _catalog
 
 
 def find_exercise_description(niveau: str, theme: str, difficulte: int) -> tuple:
@@ -53,15 +225,10 @@ def find_exercise_description(niveau: str, theme: str, difficulte: int) -> tuple
         Tuple (description, debutant) où description est la description de l'exercice
         et debutant est un booléen indiquant si l'exercice est pour débutant
     """
-    exercise_data = load_exercise_data()
-    
-    for theme_data in exercise_data.get(niveau, []):
-        if theme_data.get('thème') == theme:
-            for niveau_data in theme_data.get('niveaux', []):
-                if niveau_data.get('niveau') == difficulte:
-                    return niveau_data.get('description', ''), niveau_data.get('debutant', False)
-    
-    return "", False
+    entry = get_exercise_catalog().get(niveau, theme, difficulte)
+    if entry is None:
+        return "", False
+    return entry.description, entry.debutant
 
 
 def safe_import(module_name):